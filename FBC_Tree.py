@@ -1,8 +1,13 @@
 import streamlit as st
 from PIL import Image
 import base64
-import pandas as pd
 from io import BytesIO  # Import necessário para BytesIO
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Início")
+
+from dados import CAMINHO_DADOS, obter_dataset
 
 # Configuração da página
 st.set_page_config(
@@ -87,22 +92,13 @@ if imagem_base64:
     """
     st.markdown(image_html, unsafe_allow_html=True)
 
-# Função para carregar os dados
-def carregar_dados(caminho):
-    try:
-        df = pd.read_excel(caminho)
-        df = df.loc[:, ~df.columns.str.contains("^Unnamed")]  # Remove colunas sem nome
-        if "ID" in df.columns:
-            df["ID"] = pd.to_numeric(df["ID"], errors="coerce", downcast="integer")  # Converte ID para inteiro
-            df = df.set_index("ID")  # Define ID como índice
-        return df
-    except FileNotFoundError:
-        st.error(f"Arquivo não encontrado: {caminho}")
-        return None
-
-# Carregar dados na sessão
-if "familia_df" not in st.session_state:
-    st.session_state["familia_df"] = carregar_dados("datasets/Dados_Genera_MyHeritage_Arvore.xlsx")
+# Carregar dados (compartilhados entre todas as sessões; a sessão guarda apenas a referência)
+try:
+    dataset = obter_dataset(CAMINHO_DADOS)
+    st.session_state["familia_df"] = dataset.df
+except FileNotFoundError:
+    st.error(f"Arquivo não encontrado: {CAMINHO_DADOS}")
+    st.session_state["familia_df"] = None
 
 if st.session_state["familia_df"] is not None:
     st.success("Dados carregados com sucesso! Navegue até a página 'Dados' para visualizar.")
@@ -134,3 +130,5 @@ footer {
 """
 st.markdown(footer, unsafe_allow_html=True)
 
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
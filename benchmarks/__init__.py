@@ -0,0 +1 @@
+"""Medições de desempenho das funções de parentesco e relatórios sobre árvores sintéticas."""
@@ -0,0 +1,309 @@
+"""
+Comparação diferencial entre as funções originais de parentesco (buscar_* e encontrar_parentesco_direto
+sobre o DataFrame) e um motor otimizado, na planilha real e em árvores sintéticas.
+
+Uso, a partir da raiz do projeto:
+    python -m benchmarks.diferencial
+    python -m benchmarks.diferencial --motor indice --tamanhos 2000 --pessoas 3 --pares 1
+
+Para cada categoria de parentesco, informa em quantas pessoas os conjuntos de IDs divergem, os IDs
+que faltam ou sobram no motor (com exemplos) e o tempo das funções originais; no total, o tempo do
+motor e o fator de aceleração. Os defeitos conhecidos das funções originais (DEFEITOS_CONHECIDOS) não
+contam como divergência, mas são informados à parte. O resultado é gravado em JSON em
+benchmarks/resultados/ e o comando termina com código 1 se houver alguma divergência.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import helpers
+from dados import CAMINHO_DADOS, carregar_planilha
+from indices import obter_familia_index
+from benchmarks.executar import PASTA_RESULTADOS, _amostrar_pessoas, _pares_aparentados, esfriar
+from benchmarks.gerador import gerar_arvore
+
+# Funções originais de cada categoria, na ordem do dicionário de encontrar_parentesco_direto
+FUNCOES_LEGADO = [
+    ('Pai/Mãe', helpers.buscar_pais),
+    ('filho(a)', helpers.buscar_filhos),
+    ('irmão(a)', helpers.buscar_irmaos),
+    ('sobrinho(a)', helpers.buscar_sobrinhos),
+    ('avô(ó)', helpers.buscar_avos),
+    ('tio(a)', helpers.buscar_tios),
+    ('primo(a) 1º Grau', helpers.buscar_primos_primeiro_grau),
+    ('filho(a) do(a) primo(a) de 1º grau', helpers.buscar_filhos_dos_primos_primeiro_grau),
+    ('bisavo(a)', helpers.buscar_bisavos),
+    ('Tio-Avô/Tia-Avó', helpers.buscar_tios_avos),
+    ('Primos de 1º Grau dos Pais', helpers.buscar_primos_primeiro_grau_dos_pais),
+    ('Primos de 2º Grau', helpers.buscar_primos_segundo_grau),
+    ('Filhos dos Primos de 2º Grau', helpers.buscar_filhos_dos_primos_segundo_grau),
+    ('Trisavós', helpers.buscar_trisavos),
+    ('Tio-bisavô/tia-bisavó', helpers.buscar_tios_bisavos),
+    ('Primos de 1º Grau do Avô/da Avó', helpers.buscar_primos_primeiro_grau_dos_avos),
+    ('Primos de 2º Grau do Pai/da Mãe', helpers.buscar_primos_segundo_grau_dos_pais),
+    ('Primos de 3º Grau', helpers.buscar_primos_terceiro_grau),
+    ('Filhos dos Primos de 3º Grau', helpers.buscar_filhos_dos_primos_terceiro_grau),
+    ('Tetravós', helpers.buscar_tetravos),
+    ('Tio-trisavô/Tia-trisavó', helpers.buscar_tios_trisavos),
+    ('Primos de 1º Grau do Bisavô/da Bisavó', helpers.buscar_primos_primeiro_grau_dos_bisavos),
+    ('Primos de 2º Grau do Avô/da Avó', helpers.buscar_primos_segundo_grau_dos_avos),
+    ('Primos de 3º Grau do Pai/da Mãe', helpers.buscar_primos_terceiro_grau_dos_pais),
+    ('Primos de 4º Grau', helpers.buscar_primos_quarto_grau),
+    ('Filhos dos Primos de 4º Grau', helpers.buscar_filhos_dos_primos_quarto_grau),
+    ('Pentavós', helpers.buscar_pentavos),
+    ('Tio-tetravô/Tia-tetravó', helpers.buscar_tios_tetravos),
+    ('Primos de 1º Grau do Trisavô/da Trisavó', helpers.buscar_primos_primeiro_grau_dos_trisavos),
+    ('Primos de 2º Grau do Bisavô/da Bisavó', helpers.buscar_primos_segundo_grau_dos_bisavos),
+    ('Primos de 3º Grau do Avô/da Avó', helpers.buscar_primos_terceiro_grau_dos_avos),
+    ('Primos de 4º Grau do Pai/da Mãe', helpers.buscar_primos_quarto_grau_dos_pais),
+    ('Primos de 5º Grau', helpers.buscar_primos_quinto_grau),
+    ('Filhos dos Primos de 5º Grau', helpers.buscar_filhos_dos_primos_quinto_grau),
+]
+
+# Motores comparados com as funções originais: (df, pessoa_id) -> {categoria: parentes}
+MOTORES = {
+    # Uma única travessia por pessoa (calcular_camadas_parentesco)
+    "camadas": helpers.criar_dicionario_parentesco,
+    # As mesmas funções buscar_*, sobre o FamilyIndex em vez do DataFrame
+    "indice": lambda df, pessoa_id: {categoria: funcao(obter_familia_index(df), pessoa_id)
+                                     for categoria, funcao in FUNCOES_LEGADO},
+}
+
+TAMANHOS = [2_000, 10_000]
+
+# Pessoas comparadas categoria a categoria e pares comparados com encontrar_parentesco_direto
+PESSOAS = 20
+PARES = 5
+
+# Defeitos conhecidos das funções originais, aceitos na comparação e informados à parte
+DEFEITOS_CONHECIDOS = {
+    # Com colapso de pedigree, a própria pessoa aparece numa categoria dela (na planilha, os IDs 7937,
+    # 934 e 7883 nos primos de 4º e 5º grau e nos filhos deles); o motor nunca lista a pessoa
+    "autoinclusao": "a própria pessoa listada entre os parentes",
+    # Com colapso de pedigree, o mesmo parente chega por dois caminhos e algumas funções
+    # (buscar_bisavos, buscar_primos_segundo_grau) não removem a repetição; a comparação é por conjunto
+    "duplicatas": "o mesmo parente repetido na lista da categoria",
+}
+
+# Exemplos de divergência guardados por categoria
+MAX_EXEMPLOS = 5
+
+
+def lista_ids(valor):
+    """
+    IDs válidos (> 0) de um valor do dicionário de parentesco, na ordem e com repetições, em qualquer dos
+    formatos usados pelas funções: lista de registros {'ID': ...}, dicionário de IDs (pais, avós) ou
+    dicionário de listas (tios).
+    """
+    itens = valor.values() if isinstance(valor, dict) else valor
+    ids = []
+    for item in itens:
+        if isinstance(item, (list, dict)) and not (isinstance(item, dict) and "ID" in item):
+            ids += lista_ids(item)
+            continue
+        pessoa_id = item.get("ID") if isinstance(item, dict) else item
+        if pessoa_id is not None and pd.notna(pessoa_id) and pessoa_id > 0:
+            ids.append(int(pessoa_id))
+    return ids
+
+
+def ids_parentes(valor):
+    """Conjunto dos IDs de lista_ids(valor)."""
+    return set(lista_ids(valor))
+
+
+class ComparacaoCategorias:
+    """
+    Acumula, por categoria, as divergências entre os resultados originais e os do motor e, à parte,
+    as pessoas em que apareceu cada defeito conhecido das funções originais.
+    """
+
+    def __init__(self):
+        self.categorias = {
+            categoria: {
+                "comparacoes": 0, "divergentes": 0, "faltando": 0, "sobrando": 0, "legado_ms": 0.0, "exemplos": [],
+                "conhecidos": {defeito: [] for defeito in DEFEITOS_CONHECIDOS},
+            }
+            for categoria, _ in FUNCOES_LEGADO
+        }
+
+    def registrar(self, pessoa_id, categoria, esperado, obtido, legado_ms=0.0):
+        item = self.categorias[categoria]
+        item["comparacoes"] += 1
+        item["legado_ms"] += legado_ms
+        # Só as listas contam repetições: nos dicionários de pais e avós, o mesmo ID em dois papéis é legítimo
+        repetidos = isinstance(esperado, list) and len(lista_ids(esperado)) > len(ids_parentes(esperado))
+        esperado, obtido = ids_parentes(esperado), ids_parentes(obtido)
+        if repetidos:
+            item["conhecidos"]["duplicatas"].append(pessoa_id)
+        if pessoa_id in esperado and pessoa_id not in obtido:
+            item["conhecidos"]["autoinclusao"].append(pessoa_id)
+            esperado.discard(pessoa_id)
+        if esperado != obtido:
+            faltando, sobrando = sorted(esperado - obtido), sorted(obtido - esperado)
+            item["divergentes"] += 1
+            item["faltando"] += len(faltando)
+            item["sobrando"] += len(sobrando)
+            if len(item["exemplos"]) < MAX_EXEMPLOS:
+                item["exemplos"].append({"pessoa": pessoa_id, "faltando": faltando[:20], "sobrando": sobrando[:20]})
+
+    @property
+    def divergencias(self):
+        return sum(item["divergentes"] for item in self.categorias.values())
+
+    @property
+    def conhecidos(self):
+        """Por defeito conhecido: em quantas comparações apareceu e em quais pessoas."""
+        resumo = {}
+        for defeito in DEFEITOS_CONHECIDOS:
+            pessoas = [pessoa_id for item in self.categorias.values() for pessoa_id in item["conhecidos"][defeito]]
+            resumo[defeito] = {"ocorrencias": len(pessoas), "pessoas": sorted(set(pessoas))}
+        return resumo
+
+    def resultado(self):
+        for item in self.categorias.values():
+            item["legado_ms"] = round(item["legado_ms"], 3)
+        return self.categorias
+
+
+def _cronometrar(funcao, *argumentos):
+    t0 = time.perf_counter()
+    resultado = funcao(*argumentos)
+    return resultado, (time.perf_counter() - t0) * 1000
+
+
+def comparar(df, pessoas, pares, motor):
+    """
+    Compara as funções originais (sobre o DataFrame) com o motor: categoria a categoria para cada pessoa
+    e, para cada par, encontrar_parentesco_direto inteiro. Os resultados memorizados são descartados
+    antes de cada chamada ao motor, então os tempos dele são sempre de primeira consulta.
+    """
+    por_pessoa = ComparacaoCategorias()
+    legado_ms = motor_ms = 0.0
+    for pessoa_id in pessoas:
+        esfriar(df)
+        obtido, tempo = _cronometrar(motor, df, pessoa_id)
+        motor_ms += tempo
+        for categoria, funcao in FUNCOES_LEGADO:
+            esperado, tempo = _cronometrar(funcao, df, pessoa_id)
+            legado_ms += tempo
+            por_pessoa.registrar(pessoa_id, categoria, esperado, obtido.get(categoria, []), tempo)
+
+    por_par = ComparacaoCategorias()
+    direto_legado_ms = direto_motor_ms = 0.0
+    for id1, id2 in pares:
+        esperado, tempo = _cronometrar(helpers.encontrar_parentesco_direto, df, id1, id2)
+        direto_legado_ms += tempo
+        esfriar(df)
+        obtido, tempo = _cronometrar(lambda: (motor(df, id1), motor(df, id2)))
+        direto_motor_ms += tempo
+        for pessoa_id, esperado_pessoa, obtido_pessoa in zip((id1, id2), esperado, obtido):
+            for categoria, _ in FUNCOES_LEGADO:
+                por_par.registrar(pessoa_id, categoria, esperado_pessoa[categoria], obtido_pessoa.get(categoria, []))
+
+    return {
+        "pessoas": len(pessoas),
+        "pares": [list(par) for par in pares],
+        "categorias": por_pessoa.resultado(),
+        "divergencias": por_pessoa.divergencias,
+        "conhecidos": por_pessoa.conhecidos,
+        "legado_ms": round(legado_ms, 3),
+        "motor_ms": round(motor_ms, 3),
+        "aceleracao": round(legado_ms / motor_ms, 1) if motor_ms else None,
+        "encontrar_parentesco_direto": {
+            "categorias": {categoria: item for categoria, item in por_par.resultado().items() if item["divergentes"]},
+            "divergencias": por_par.divergencias,
+            "conhecidos": por_par.conhecidos,
+            "legado_ms": round(direto_legado_ms, 3),
+            "motor_ms": round(direto_motor_ms, 3),
+            "aceleracao": round(direto_legado_ms / direto_motor_ms, 1) if direto_motor_ms else None,
+        },
+    }
+
+
+def _resumo(nome, resultado):
+    print(f"{nome}: {resultado['divergencias']} divergência(s) em {resultado['pessoas']} pessoa(s); "
+          f"aceleração {resultado['aceleracao']}x", file=sys.stderr)
+    for categoria, item in resultado["categorias"].items():
+        if item["divergentes"]:
+            print(f"  {categoria}: {item['divergentes']}/{item['comparacoes']} "
+                  f"(faltando {item['faltando']}, sobrando {item['sobrando']})", file=sys.stderr)
+    direto = resultado["encontrar_parentesco_direto"]
+    print(f"  encontrar_parentesco_direto: {direto['divergencias']} divergência(s); "
+          f"aceleração {direto['aceleracao']}x", file=sys.stderr)
+    for defeito, descricao in DEFEITOS_CONHECIDOS.items():
+        conhecido = resultado["conhecidos"][defeito]
+        if conhecido["ocorrencias"]:
+            print(f"  defeito conhecido ({descricao}): {conhecido['ocorrencias']} vez(es), "
+                  f"pessoas {', '.join(map(str, conhecido['pessoas'][:MAX_EXEMPLOS]))}"
+                  f"{'...' if len(conhecido['pessoas']) > MAX_EXEMPLOS else ''}", file=sys.stderr)
+
+
+def executar(motor="camadas", caminho=CAMINHO_DADOS, tamanhos=TAMANHOS, pessoas=PESSOAS, pares=PARES, semente=0):
+    """Executa a comparação na planilha real (se existir) e nas árvores sintéticas; retorna o resultado em JSON."""
+    funcao_motor = MOTORES[motor]
+    rng = np.random.default_rng(semente)
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "motor": motor,
+        "parametros": {"pessoas": pessoas, "pares": pares, "semente": semente},
+        "defeitos_conhecidos": DEFEITOS_CONHECIDOS,
+        "conjuntos": {},
+    }
+
+    if caminho and os.path.exists(caminho):
+        df = carregar_planilha(caminho)
+        # Os matches da lista das páginas, que são as pessoas consultadas de fato
+        matches = [pessoa_id for pessoa_id in helpers.ids_lista if pessoa_id in df.index]
+        escolhidos = [int(pessoa_id) for pessoa_id in rng.choice(matches, min(pessoas, len(matches)), replace=False)]
+        pares_reais = [(escolhidos[k], escolhidos[k + 1]) for k in range(min(pares, len(escolhidos) - 1))]
+        resultado["conjuntos"]["planilha"] = comparar(df, escolhidos, pares_reais, funcao_motor)
+        _resumo("planilha", resultado["conjuntos"]["planilha"])
+
+    for tamanho in tamanhos:
+        arvore = gerar_arvore(tamanho, semente=semente)
+        escolhidos = _amostrar_pessoas(arvore, rng, pessoas)
+        pares_gerados = _pares_aparentados(obter_familia_index(arvore.df), escolhidos[:pares], rng)
+        nome = f"sintetica_{tamanho}"
+        resultado["conjuntos"][nome] = comparar(arvore.df, escolhidos, pares_gerados, funcao_motor)
+        resultado["conjuntos"][nome]["arvore"] = arvore.estatisticas
+        _resumo(nome, resultado["conjuntos"][nome])
+
+    resultado["divergencias"] = sum(
+        conjunto["divergencias"] + conjunto["encontrar_parentesco_direto"]["divergencias"]
+        for conjunto in resultado["conjuntos"].values()
+    )
+    return resultado
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Compara as funções originais de parentesco com um motor otimizado.")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default="camadas")
+    parser.add_argument("--planilha", default=CAMINHO_DADOS, help="Planilha real (vazio para não usar)")
+    parser.add_argument("--tamanhos", type=int, nargs="*", default=TAMANHOS, help="Tamanhos das árvores sintéticas")
+    parser.add_argument("--pessoas", type=int, default=PESSOAS, help="Pessoas comparadas categoria a categoria")
+    parser.add_argument("--pares", type=int, default=PARES, help="Pares comparados com encontrar_parentesco_direto")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: benchmarks/resultados/diferencial_<data>.json)")
+    opcoes = parser.parse_args(argumentos)
+
+    resultado = executar(opcoes.motor, opcoes.planilha, opcoes.tamanhos, opcoes.pessoas, opcoes.pares, opcoes.semente)
+
+    saida = opcoes.saida
+    if not saida:
+        os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+        saida = os.path.join(PASTA_RESULTADOS, f"diferencial_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {saida}", file=sys.stderr)
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main()["divergencias"] else 0)
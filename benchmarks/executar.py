@@ -0,0 +1,388 @@
+"""
+Benchmark das funções de parentesco e relatórios de helpers.py e dos fluxos das páginas,
+sobre árvores sintéticas de vários tamanhos (ver benchmarks/gerador.py).
+
+Uso, a partir da raiz do projeto:
+    python -m benchmarks.executar
+    python -m benchmarks.executar --tamanhos 10000 100000 --amostras 30 --saida resultado.json
+    python -m benchmarks.executar --tamanhos 100000 --orcamento-memoria 512
+    python -m benchmarks.executar --tamanhos 10000 --colapso 0.2 --sem-pais 0.15 --filhos-por-casal 4
+
+Para cada tamanho, mede a latência (p50/p95/máx, em ms) e o pico de memória alocada durante a
+chamada (tracemalloc, em KiB). Os índices derivados são construídos uma vez (e medidos à parte);
+antes de cada chamada, os resultados memorizados (fechos de antepassados, matrizes e relatórios)
+são descartados, então cada medição corresponde ao primeiro clique para uma pessoa nova.
+O formato das árvores (colapso de pedigree, pais em branco e tamanho das famílias) é configurável;
+ver gerar_arvore.
+O orçamento de tempo é conferido entre as chamadas: uma chamada em andamento nunca é interrompida,
+então uma medição pode passar do orçamento pela duração de uma amostra. As versões legadas, que varrem
+o DataFrame a cada consulta, levam cerca de um minuto por amostra na árvore de 10 mil pessoas; use
+--limite-legado para não medi-las nos tamanhos maiores.
+Ao fim das medições de cada árvore, registra a memória residente do DataFrame, dos índices e dos
+caches (memoria.uso_memoria); com --orcamento-memoria (ou, sem a opção, FBC_ORCAMENTO_MEMORIA_MB),
+termina com código 1 se alguma árvore o ultrapassar.
+O resultado é gravado em JSON em benchmarks/resultados/.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import helpers
+from dados import normalizar_tabela
+from memoria import orcamento_mb, uso_memoria
+from indices import (
+    FamilyIndex,
+    IndiceBusca,
+    IndiceNomes,
+    MapaIdentificadores,
+    obter_familia_index,
+    obter_indice_busca,
+    obter_indice_nomes,
+)
+from benchmarks.gerador import gerar_arvore
+
+TAMANHOS = [10_000, 100_000, 1_000_000]
+
+# Pessoas consultadas por medição
+AMOSTRAS = 20
+
+# Tempo máximo (s) gasto em cada medição; ao ser ultrapassado, as amostras restantes são puladas
+# (conferido ao fim de cada chamada, que não é interrompida)
+ORCAMENTO_SEGUNDOS = 30.0
+
+# As versões que varrem o DataFrame a cada consulta só são medidas até este tamanho de árvore
+LIMITE_LEGADO = 10_000
+AMOSTRAS_LEGADO = 3
+
+# Formato das árvores geradas (os padrões de gerar_arvore): fração de casais entre primos, chance de
+# um vínculo de pai ou mãe ficar em branco e média de filhos por casal
+COLAPSO = 0.05
+SEM_PAIS = 0.05
+FILHOS_POR_CASAL = 3.0
+
+# Execuções da construção de cada índice
+REPETICOES_INDICES = 3
+
+# Tamanho da lista de matches dos relatórios, o mesmo da lista usada pelas páginas
+TAMANHO_LISTA = len(helpers.ids_lista)
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def esfriar(df):
+    """Descarta os resultados memorizados do conjunto de dados, mantendo os índices já construídos."""
+    indice = obter_familia_index(df)
+    indice._fechamentos.invalidar()  # Fechos de antepassados memorizados por pessoa
+    indice._matrizes.invalidar()
+    helpers.cache_relatorios(df).invalidar()
+    helpers.cache_pdfs(df).invalidar()
+
+
+def medir(funcao, entradas, preparar=None, orcamento=ORCAMENTO_SEGUNDOS):
+    """
+    Executa funcao(*entrada) para cada entrada, até esgotar o orçamento de tempo (ao menos uma vez).
+    O orçamento é conferido depois de cada chamada, que não é interrompida: a medição termina depois
+    da primeira chamada que o ultrapassa, por mais longa que ela seja.
+    Retorna as latências (ms) e o pico de memória alocada numa execução à parte, já que o
+    tracemalloc deixa as chamadas mais lentas; o pico é omitido quando as amostras já esgotaram o orçamento.
+    preparar() é chamado antes de cada execução, fora da medição.
+    """
+    tempos = []
+    inicio = time.perf_counter()
+    for entrada in entradas:
+        if preparar:
+            preparar()
+        t0 = time.perf_counter()
+        funcao(*entrada)
+        tempos.append(time.perf_counter() - t0)
+        if time.perf_counter() - inicio > orcamento:
+            break
+
+    pico = None
+    if time.perf_counter() - inicio <= orcamento:
+        if preparar:
+            preparar()
+        tracemalloc.start()
+        try:
+            funcao(*entradas[0])
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    ms = np.array(tempos) * 1000
+    return {
+        "amostras": len(tempos),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "media_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "pico_memoria_kb": round(pico / 1024, 1) if pico is not None else None,
+    }
+
+
+def _amostrar_pessoas(arvore, rng, quantidade):
+    """Pessoas das duas gerações mais novas com pai e mãe registrados (as que têm ascendência a consultar)."""
+    df = arvore.df
+    candidatas = df.index[
+        (arvore.geracoes >= arvore.geracoes.max() - 1)
+        & (df["Pai_ID"] > 0).to_numpy()
+        & (df["Mãe_ID"] > 0).to_numpy()
+    ]
+    return [int(pessoa_id) for pessoa_id in rng.choice(candidatas, min(quantidade, len(candidatas)), replace=False)]
+
+
+def _parentes_distantes(indice, pessoa_id, rng, geracoes=(3, 6)):
+    """Descendentes de antepassados da pessoa (entre as gerações informadas): primos e afins."""
+    ids, geracoes_ids, _ = indice.fechamento_antepassados(pessoa_id)
+    antepassados = ids[(geracoes_ids >= geracoes[0]) & (geracoes_ids <= geracoes[1])]
+    if not len(antepassados):
+        return []
+    escolhidos = rng.choice(antepassados, min(10, len(antepassados)), replace=False)
+    parentes = indice.descendentes(int(antepassado) for antepassado in escolhidos)
+    parentes.discard(pessoa_id)
+    return sorted(parentes)
+
+
+def _pares_aparentados(indice, pessoas, rng):
+    """Para cada pessoa, um parente distante dela (ou outra pessoa da amostra, se não houver)."""
+    pares = []
+    for posicao, pessoa_id in enumerate(pessoas):
+        parentes = _parentes_distantes(indice, pessoa_id, rng)
+        outro = int(rng.choice(parentes)) if parentes else pessoas[(posicao + 1) % len(pessoas)]
+        pares.append((pessoa_id, outro))
+    return pares
+
+
+def _lista_matches(indice, referencia, todos_ids, rng, tamanho=TAMANHO_LISTA):
+    """
+    Lista de matches no estilo da lista das páginas: a maior parte parentes distantes
+    da referência e o restante pessoas quaisquer da árvore.
+    """
+    parentes = _parentes_distantes(indice, referencia, rng)
+    quantidade_parentes = min(len(parentes), int(tamanho * 0.8))
+    lista = [int(pessoa_id) for pessoa_id in rng.choice(parentes, quantidade_parentes, replace=False)] if parentes else []
+    lista += [int(pessoa_id) for pessoa_id in rng.choice(todos_ids, tamanho - len(lista), replace=False)]
+    return [pessoa_id for pessoa_id in dict.fromkeys(lista) if pessoa_id != referencia]
+
+
+# Fluxos das páginas: o que cada página executa ao clicar no botão (sem a renderização do Streamlit)
+
+def fluxo_familia_extensa(df, pessoa_id):
+    return helpers.familia_extensa(obter_familia_index(df), pessoa_id)
+
+
+def fluxo_parentesco(df, id1, id2):
+    indice = obter_familia_index(df)
+    parentesco_1 = helpers.resolver_parentesco(indice, id1, id2)
+    parentesco_2 = helpers.resolver_parentesco(indice, id2, id1)
+    antepassados_id1 = helpers.coletar_todos_antepassados(indice, id1)
+    antepassados_id2 = helpers.coletar_todos_antepassados(indice, id2)
+    comuns = {antepassado: (antepassados_id1[antepassado], antepassados_id2[antepassado])
+              for antepassado in set(antepassados_id1) & set(antepassados_id2)}
+    ordenados = sorted(comuns.items(), key=lambda item: item[1][0] + item[1][1])
+    nomes = [helpers.buscar_nome_sobrenome_por_id(df, antepassado) for antepassado, _ in ordenados]
+    return parentesco_1, parentesco_2, nomes
+
+
+def fluxo_primeiros_ancestrais(df, id_referencia, ids_lista):
+    ids_comparacao = [id_ for id_ in ids_lista if id_ != id_referencia]
+    modelo = helpers.modelo_primeiros_ancestrais(df, id_referencia, ids_comparacao)
+    return modelo, helpers.pdf_primeiros_ancestrais(df, id_referencia, ids_comparacao)
+
+
+def fluxo_ancestrais_por_id(df, id_referencia, ids_lista):
+    modelo = helpers.modelo_ancestrais_por_ocorrencia(df, ids_lista, id_referencia)
+    return modelo, helpers.pdf_ancestrais_por_ocorrencia(df, ids_lista, id_referencia)
+
+
+def fluxo_ancestrais_todos(df, ids_lista):
+    texto = helpers.texto_relatorio_por_ocorrencia(helpers.modelo_ancestrais_por_ocorrencia(df, ids_lista))
+    return texto, helpers.pdf_ancestrais_por_ocorrencia(df, ids_lista)
+
+
+def fluxo_ramo_ids(df, ids_lista, id1, id2):
+    grupos = helpers.separar_ids_por_relacao_via_ancestrais(df, ids_lista, id1, id2)
+    return [[helpers.buscar_nome_sobrenome_por_id(df, pessoa_id) for pessoa_id in grupo] for grupo in grupos]
+
+
+def executar_tamanho(pessoas, semente=0, amostras=AMOSTRAS, orcamento=ORCAMENTO_SEGUNDOS, limite_legado=LIMITE_LEGADO,
+                     orcamento_memoria=None, colapso=COLAPSO, sem_pais=SEM_PAIS, filhos_por_casal=FILHOS_POR_CASAL):
+    """
+    Gera a árvore do tamanho informado e executa todas as medições sobre ela. `orcamento_memoria` (MB)
+    é comparado com a memória do DataFrame, dos índices e dos caches ao fim das medições.
+    `colapso`, `sem_pais` e `filhos_por_casal` são repassados a gerar_arvore.
+    """
+    rng = np.random.default_rng(semente)
+    medicoes = {}
+
+    t0 = time.perf_counter()
+    arvore = gerar_arvore(
+        pessoas, semente=semente, filhos_por_casal=filhos_por_casal, sem_pais=sem_pais, colapso=colapso, normalizar=False
+    )
+    geracao_s = time.perf_counter() - t0
+    medicoes["carga.normalizar_tabela"] = medir(normalizar_tabela, [(arvore.df,)], orcamento=orcamento)
+    arvore = arvore._replace(df=normalizar_tabela(arvore.df))
+    df = arvore.df
+
+    for nome, classe in [("familia", FamilyIndex), ("busca", IndiceBusca), ("nomes", IndiceNomes),
+                         ("identificadores", MapaIdentificadores)]:
+        medicoes[f"indice.{nome}"] = medir(classe, [(df,)] * REPETICOES_INDICES, orcamento=orcamento)
+
+    # Índices usados pelas páginas, construídos uma vez como no aplicativo
+    indice = obter_familia_index(df)
+    obter_indice_busca(df)
+    obter_indice_nomes(df)
+    helpers.buscar_identificador_por_id(df, int(df.index[0]))
+
+    pessoas_amostra = _amostrar_pessoas(arvore, rng, amostras)
+    pares = _pares_aparentados(indice, pessoas_amostra, rng)
+    todos_ids = df.index.to_numpy()
+    listas = [(pessoa_id, _lista_matches(indice, pessoa_id, todos_ids, rng)) for pessoa_id in pessoas_amostra]
+    individuais = [(pessoa_id,) for pessoa_id in pessoas_amostra]
+    preparar = lambda: esfriar(df)
+
+    casos = [
+        ("coletar_todos_antepassados", lambda p: helpers.coletar_todos_antepassados(indice, p), individuais),
+        ("buscar_primos_quinto_grau", lambda p: helpers.buscar_primos_quinto_grau(indice, p), individuais),
+        ("encontrar_parentesco_direto", lambda a, b: helpers.encontrar_parentesco_direto(indice, a, b), pares),
+        ("encontrar_parentesco_por_camadas", lambda a, b: helpers.encontrar_parentesco_por_camadas(indice, a, b), pares),
+        ("exibir_ancestrais_comuns_por_ocorrencia",
+         lambda ref, lista: helpers.exibir_ancestrais_comuns_por_ocorrencia(df, lista, ref), listas),
+        ("pagina.dados.busca", lambda texto: obter_indice_busca(df).filtrar(texto),
+         [(str(df.at[p, "Sobrenome"]),) for p in pessoas_amostra]),
+        ("pagina.busca_nome.candidatos", lambda texto: obter_indice_nomes(df).candidatos(texto),
+         [(str(df.at[p, "Nome Completo"])[:8],) for p in pessoas_amostra]),
+        ("pagina.familia_extensa", lambda p: fluxo_familia_extensa(df, p), individuais),
+        ("pagina.parentesco", lambda a, b: fluxo_parentesco(df, a, b), pares),
+        ("pagina.primeiros_ancestrais", lambda ref, lista: fluxo_primeiros_ancestrais(df, ref, lista), listas),
+        ("pagina.lista_ancestrais.por_id", lambda ref, lista: fluxo_ancestrais_por_id(df, ref, lista), listas),
+        ("pagina.lista_ancestrais.todos", lambda ref, lista: fluxo_ancestrais_todos(df, lista), listas),
+        ("pagina.ramo_ids", lambda par, lista: fluxo_ramo_ids(df, lista, *par),
+         [(par, lista) for par, (_, lista) in zip(pares, listas)]),
+    ]
+    if pessoas <= limite_legado:
+        # Versões originais, que varrem o DataFrame a cada consulta
+        casos += [
+            ("legado.buscar_primos_quinto_grau", lambda p: helpers.buscar_primos_quinto_grau(df, p),
+             individuais[:AMOSTRAS_LEGADO]),
+            ("legado.encontrar_parentesco_direto", lambda a, b: helpers.encontrar_parentesco_direto(df, a, b),
+             pares[:AMOSTRAS_LEGADO]),
+        ]
+
+    for nome, funcao, entradas in casos:
+        medicoes[nome] = medir(funcao, entradas, preparar=preparar, orcamento=orcamento)
+        print(f"  {nome}: p50 {medicoes[nome]['p50_ms']} ms, p95 {medicoes[nome]['p95_ms']} ms", file=sys.stderr)
+
+    # Memória com os caches cheios, como ao fim de uma sessão de uso: os fluxos das páginas outra vez, sem esfriar
+    for nome, funcao, entradas in casos:
+        if nome.startswith("pagina."):
+            limite = time.perf_counter() + orcamento
+            for argumentos in entradas:
+                if time.perf_counter() > limite:
+                    break
+                funcao(*argumentos)
+    memoria_mb = {grupo: round(valor / 2**20, 2) for grupo, valor in uso_memoria(df, sessoes=False).items()}
+    print(f"  memória: {memoria_mb['total']} MB (índices {memoria_mb['indice']} MB, caches {memoria_mb['cache']} MB)",
+          file=sys.stderr)
+
+    return {
+        "pessoas": pessoas,
+        "geracao_arvore_s": round(geracao_s, 3),
+        "arvore": arvore.estatisticas,
+        "memoria_df_mb": round(df.memory_usage(deep=True).sum() / 2**20, 2),
+        "memoria_mb": memoria_mb,
+        "dentro_orcamento_memoria": None if orcamento_memoria is None else memoria_mb["total"] <= orcamento_memoria,
+        "medicoes": medicoes,
+    }
+
+
+def executar(tamanhos=TAMANHOS, semente=0, amostras=AMOSTRAS, orcamento=ORCAMENTO_SEGUNDOS, limite_legado=LIMITE_LEGADO,
+             orcamento_memoria=None, colapso=COLAPSO, sem_pais=SEM_PAIS, filhos_por_casal=FILHOS_POR_CASAL):
+    """
+    Executa o benchmark para cada tamanho de árvore e retorna o resultado completo (serializável em JSON),
+    com a lista dos tamanhos que ultrapassaram o orçamento de memória em "orcamento_memoria_excedido".
+    """
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "parametros": {
+            "semente": semente,
+            "amostras": amostras,
+            "orcamento_s": orcamento,
+            "limite_legado": limite_legado,
+            "tamanho_lista": TAMANHO_LISTA,
+            "orcamento_memoria_mb": orcamento_memoria,
+            "colapso": colapso,
+            "sem_pais": sem_pais,
+            "filhos_por_casal": filhos_por_casal,
+        },
+        "arvores": [],
+        "orcamento_memoria_excedido": [],
+    }
+    for pessoas in tamanhos:
+        print(f"Árvore com {pessoas} pessoas", file=sys.stderr)
+        arvore = executar_tamanho(
+            pessoas, semente, amostras, orcamento, limite_legado, orcamento_memoria, colapso, sem_pais, filhos_por_casal
+        )
+        resultado["arvores"].append(arvore)
+        if arvore["dentro_orcamento_memoria"] is False:
+            resultado["orcamento_memoria_excedido"].append(pessoas)
+    return resultado
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark das funções de parentesco e relatórios.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS, help="Quantidade de pessoas de cada árvore")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--amostras", type=int, default=AMOSTRAS, help="Pessoas consultadas por medição")
+    parser.add_argument("--orcamento", type=float, default=ORCAMENTO_SEGUNDOS,
+                        help="Segundos por medição (conferido entre as chamadas; uma chamada longa não é interrompida)")
+    parser.add_argument("--limite-legado", type=int, default=LIMITE_LEGADO,
+                        help="Maior árvore em que as versões que varrem o DataFrame são medidas")
+    parser.add_argument("--colapso", type=float, default=COLAPSO,
+                        help="Fração dos casais formada por primos (colapso de pedigree)")
+    parser.add_argument("--sem-pais", type=float, default=SEM_PAIS,
+                        help="Chance de cada vínculo de pai ou mãe ficar em branco")
+    parser.add_argument("--filhos-por-casal", type=float, default=FILHOS_POR_CASAL, help="Média de filhos por casal")
+    parser.add_argument("--orcamento-memoria", type=float,
+                        help="Limite (MB) para o DataFrame, os índices e os caches de cada árvore "
+                             "(padrão: FBC_ORCAMENTO_MEMORIA_MB, o mesmo orçamento da página Memória)")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: benchmarks/resultados/benchmark_<data>.json)")
+    opcoes = parser.parse_args(argumentos)
+    if opcoes.orcamento_memoria is None:
+        try:
+            opcoes.orcamento_memoria = orcamento_mb()
+        except ValueError as erro:
+            parser.error(str(erro))
+
+    resultado = executar(opcoes.tamanhos, opcoes.semente, opcoes.amostras, opcoes.orcamento, opcoes.limite_legado,
+                         opcoes.orcamento_memoria, opcoes.colapso, opcoes.sem_pais, opcoes.filhos_por_casal)
+
+    saida = opcoes.saida
+    if not saida:
+        os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+        saida = os.path.join(PASTA_RESULTADOS, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {saida}", file=sys.stderr)
+    for pessoas in resultado["orcamento_memoria_excedido"]:
+        print(f"Orçamento de memória ({opcoes.orcamento_memoria} MB) ultrapassado na árvore de {pessoas} pessoas",
+              file=sys.stderr)
+    return resultado
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main()["orcamento_memoria_excedido"] else 0)
@@ -0,0 +1,261 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from dados import normalizar_tabela
+
+# Árvore gerada: a tabela no formato da planilha normalizada, a geração de cada linha
+# (0 = fundadores) e um resumo do que foi gerado
+ArvoreSintetica = namedtuple("ArvoreSintetica", ["df", "geracoes", "estatisticas"])
+
+NOMES_MASCULINOS = [
+    "Johann", "Adam", "Peter", "Nikolaus", "Jakob", "Heinrich", "Philipp", "Friedrich", "Carl", "Wilhelm",
+    "José", "João", "Antônio", "Francisco", "Pedro", "Manoel", "Luiz", "Paulo", "Miguel", "Mathias",
+]
+NOMES_FEMININOS = [
+    "Anna Maria", "Maria", "Catharina", "Elisabetha", "Margaretha", "Barbara", "Susanna", "Christina",
+    "Magdalena", "Gertrud", "Ana", "Joana", "Rosa", "Luiza", "Francisca", "Carolina", "Helena", "Clara",
+    "Amalia", "Wilhelmine",
+]
+SILABAS_SOBRENOME = [
+    "Alt", "en", "hof", "Schm", "idt", "Kl", "ein", "Web", "er", "Ro", "sa", "Bec", "ker", "Hei", "nz",
+    "Sil", "va", "Mül", "ler", "Bra",
+]
+LOCAIS = [
+    "São Leopoldo, Rio Grande do Sul, Brasil", "Porto Alegre, Rio Grande do Sul, Brasil",
+    "Novo Hamburgo, Rio Grande do Sul, Brasil", "Hunsrück, Rheinland-Pfalz, Deutschland",
+    "Bernkastel, Rheinland-Pfalz, Deutschland", "Lisboa, Portugal", "Porto, Portugal",
+    "Santa Cruz do Sul, Rio Grande do Sul, Brasil", "Blumenau, Santa Catarina, Brasil",
+    "Trier, Rheinland-Pfalz, Deutschland",
+]
+MESES_EXPORTACAO = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+ALFABETO_IDENTIFICADOR = np.array(list("0123456789BCDFGHJKLMNPQRSTVWXYZ"))
+
+# Ano de nascimento médio dos fundadores e intervalo entre gerações
+ANO_FUNDADORES = 1650
+ANOS_POR_GERACAO = 28
+
+
+def _sobrenomes(rng, quantidade):
+    """Sobrenomes fictícios, formados por 2 ou 3 sílabas."""
+    silabas = rng.choice(SILABAS_SOBRENOME, size=(quantidade, 3))
+    tamanhos = rng.integers(2, 4, quantidade)
+    return sorted({"".join(partes[:tamanho]).capitalize() for partes, tamanho in zip(silabas, tamanhos)})
+
+
+def _identificadores(rng, quantidade):
+    """Identificadores no formato do FamilySearch (XXXX-XXX)."""
+    letras = ALFABETO_IDENTIFICADOR[rng.integers(0, len(ALFABETO_IDENTIFICADOR), (quantidade, 7))]
+    return ["".join(linha[:4]) + "-" + "".join(linha[4:]) for linha in letras.tolist()]
+
+
+def _casais_de_primos(rng, homens, mulheres, pai, quantidade):
+    """
+    Forma até `quantidade` casais entre primos (mesmo avô paterno, pais diferentes), o que provoca
+    perda de antepassados nos descendentes. Retorna (homens, mulheres) dos casais formados.
+    """
+    avo = np.where(pai >= 0, pai[np.maximum(pai, 0)], -1)
+    livres = {}
+    for mulher in mulheres.tolist():
+        if avo[mulher] >= 0:
+            livres.setdefault(int(avo[mulher]), []).append(mulher)
+
+    casais_h, casais_m = [], []
+    for homem in homens.tolist():
+        if len(casais_h) >= quantidade:
+            break
+        primas = livres.get(int(avo[homem]), []) if avo[homem] >= 0 else []
+        for k, mulher in enumerate(primas):
+            if pai[mulher] != pai[homem]:
+                casais_h.append(homem)
+                casais_m.append(primas.pop(k))
+                break
+    return np.array(casais_h, dtype=np.int64), np.array(casais_m, dtype=np.int64)
+
+
+def gerar_arvore(
+    pessoas,
+    semente=0,
+    filhos_por_casal=3.0,
+    sem_pais=0.05,
+    colapso=0.05,
+    conjuges_externos=0.3,
+    solteiros=0.15,
+    fundadores=None,
+    com_datas=0.5,
+    normalizar=True,
+):
+    """
+    Gera uma árvore sintética reprodutível (a mesma semente gera a mesma árvore) com `pessoas` linhas,
+    no formato da planilha já normalizada (ver dados.normalizar_tabela).
+
+    A árvore cresce geração a geração a partir dos fundadores:
+      - filhos_por_casal: média (Poisson) de filhos de cada casal;
+      - colapso: fração dos casais formada por primos, que provoca perda de antepassados;
+      - conjuges_externos: fração adicional de casais com um cônjuge de fora, sem pais registrados;
+      - solteiros: fração de cada geração que não forma casal;
+      - sem_pais: chance de cada vínculo de pai ou mãe ficar em branco, como nas exportações reais;
+      - com_datas: fração das pessoas com data e local de nascimento preenchidos.
+    Os IDs (1..pessoas) são embaralhados, de modo que a ordem das linhas não segue as gerações.
+    Com normalizar=False, retorna a tabela como sairia da planilha, antes de normalizar_tabela.
+    """
+    rng = np.random.default_rng(semente)
+    fundadores = fundadores or max(2, pessoas // 250)
+    sobrenomes = _sobrenomes(rng, max(50, pessoas // 100))
+
+    # Atributos por pessoa (posição interna 0..n-1, -1 = ausente), acumulados em blocos por geração
+    pai, mae, sexo, geracao, sobrenome, casal = [], [], [], [], [], []
+
+    def acrescentar(quantidade, pais, maes, sexos, numero_geracao, sobrenomes_bloco):
+        pai.append(pais)
+        mae.append(maes)
+        sexo.append(sexos)
+        geracao.append(np.full(quantidade, numero_geracao, dtype=np.int32))
+        sobrenome.append(sobrenomes_bloco)
+        casal.append(np.zeros(quantidade, dtype=np.int64))
+
+    def novas_pessoas(quantidade, numero_geracao, sexos=None):
+        ausentes = np.full(quantidade, -1, dtype=np.int64)
+        if sexos is None:
+            sexos = rng.integers(0, 2, quantidade)
+        acrescentar(quantidade, ausentes, ausentes.copy(), sexos, numero_geracao,
+                    rng.integers(0, len(sobrenomes), quantidade))
+
+    novas_pessoas(fundadores, 0)
+    total = fundadores
+    atual = np.arange(fundadores, dtype=np.int64)
+    numero_geracao = 0
+    casais_total = casais_primos = externos = 0
+
+    while total < pessoas:
+        todos_pai = np.concatenate(pai)
+        todos_sexo = np.concatenate(sexo)
+        todos_casal = np.concatenate(casal)
+
+        homens = rng.permutation(atual[todos_sexo[atual] == 0])
+        mulheres = rng.permutation(atual[todos_sexo[atual] == 1])
+        limite = int(min(len(homens), len(mulheres)) * (1 - solteiros))
+
+        # Casais de primos primeiro; os demais, ao acaso entre quem sobrou
+        primos_h, primos_m = _casais_de_primos(rng, homens, mulheres, todos_pai, int(limite * colapso))
+        homens = homens[~np.isin(homens, primos_h)]
+        mulheres = mulheres[~np.isin(mulheres, primos_m)]
+        restantes = max(0, limite - len(primos_h))
+        casais_h = np.concatenate([primos_h, homens[:restantes]])
+        casais_m = np.concatenate([primos_m, mulheres[:restantes]])
+
+        # Cônjuges de fora da árvore (sem pais) para parte de quem ficou solteiro
+        solteiros_atuais = np.concatenate([homens[restantes:], mulheres[restantes:]])
+        quantidade_externos = min(len(solteiros_atuais), int(limite * conjuges_externos))
+        if quantidade_externos:
+            escolhidos = rng.choice(solteiros_atuais, quantidade_externos, replace=False)
+            conjuges = np.arange(total, total + quantidade_externos, dtype=np.int64)
+            novas_pessoas(quantidade_externos, numero_geracao, sexos=1 - todos_sexo[escolhidos])
+            todos_casal = np.concatenate([todos_casal, casal[-1]])
+            total += quantidade_externos
+            masculinos = todos_sexo[escolhidos] == 0
+            casais_h = np.concatenate([casais_h, escolhidos[masculinos], conjuges[~masculinos]])
+            casais_m = np.concatenate([casais_m, conjuges[masculinos], escolhidos[~masculinos]])
+            externos += quantidade_externos
+
+        # Casal_ID: número do casal, compartilhado pelos dois cônjuges
+        numeros = np.arange(casais_total + 1, casais_total + len(casais_h) + 1, dtype=np.int64)
+        todos_casal[casais_h] = numeros
+        todos_casal[casais_m] = numeros
+        casal[:] = np.split(todos_casal, np.cumsum([len(bloco) for bloco in casal])[:-1])
+        casais_total += len(casais_h)
+        casais_primos += len(primos_h)
+
+        filhos = rng.poisson(filhos_por_casal, len(casais_h))
+        quantidade_filhos = int(filhos.sum())
+        if quantidade_filhos == 0:
+            # A população se extinguiu: recomeça com novos fundadores
+            novas_pessoas(fundadores, numero_geracao + 1)
+            atual = np.arange(total, total + fundadores, dtype=np.int64)
+            total += fundadores
+            numero_geracao += 1
+            continue
+
+        pais_filhos = np.repeat(casais_h, filhos)
+        acrescentar(
+            quantidade_filhos,
+            pais_filhos,
+            np.repeat(casais_m, filhos),
+            rng.integers(0, 2, quantidade_filhos),
+            numero_geracao + 1,
+            np.concatenate(sobrenome)[pais_filhos],
+        )
+        atual = np.arange(total, total + quantidade_filhos, dtype=np.int64)
+        total += quantidade_filhos
+        numero_geracao += 1
+
+    pai = np.concatenate(pai)[:pessoas]
+    mae = np.concatenate(mae)[:pessoas]
+    sexo = np.concatenate(sexo)[:pessoas]
+    geracao = np.concatenate(geracao)[:pessoas]
+    sobrenome = np.concatenate(sobrenome)[:pessoas]
+    casal = np.concatenate(casal)[:pessoas]
+
+    # Vínculos em branco, como nas exportações reais
+    pai = np.where(rng.random(pessoas) < sem_pais, -1, pai)
+    mae = np.where(rng.random(pessoas) < sem_pais, -1, mae)
+
+    # IDs embaralhados; referências a pessoas cortadas pelo limite ficam em branco
+    ids = rng.permutation(pessoas).astype(np.int64) + 1
+
+    def para_ids(posicoes):
+        validas = (posicoes >= 0) & (posicoes < pessoas)
+        return np.where(validas, ids[np.where(validas, posicoes, 0)], 0)
+
+    nomes = np.where(
+        sexo == 0,
+        np.array(NOMES_MASCULINOS, dtype=object)[rng.integers(0, len(NOMES_MASCULINOS), pessoas)],
+        np.array(NOMES_FEMININOS, dtype=object)[rng.integers(0, len(NOMES_FEMININOS), pessoas)],
+    )
+    sobrenomes_pessoas = np.array(sobrenomes, dtype=object)[sobrenome]
+
+    # Data de nascimento no formato das exportações ("12 Mar 1820"); parte só com o ano
+    com_data = rng.random(pessoas) < com_datas
+    anos = ANO_FUNDADORES + ANOS_POR_GERACAO * geracao + rng.integers(-8, 9, pessoas)
+    datas = pd.Series(rng.integers(1, 29, pessoas).astype(str)) + " " \
+        + pd.Series(np.array(MESES_EXPORTACAO)[rng.integers(0, 12, pessoas)]) + " " + pd.Series(anos.astype(str))
+    datas = datas.where(rng.random(pessoas) < 0.8, pd.Series(anos.astype(str)))
+    datas = datas.where(com_data, None)
+    locais = pd.Series(np.array(LOCAIS, dtype=object)[rng.integers(0, len(LOCAIS), pessoas)]).where(com_data, None)
+
+    bruto = pd.DataFrame({
+        "ID": ids,
+        "Nome": nomes,
+        "Sobrenome": sobrenomes_pessoas,
+        "Sexo": np.where(sexo == 0, "Masculino", "Feminino"),
+        "Identificador": _identificadores(rng, pessoas),
+        "Casal_ID": casal,
+        "Pai_ID": para_ids(pai),
+        "Mãe_ID": para_ids(mae),
+        "Data de Nascimento": datas,
+        "Local de Nascimento": locais,
+        "Data de Falecimento": pd.Series(None, index=datas.index, dtype="str"),
+        "Local de Falecimento": None,
+    })
+    bruto["Nome Completo"] = bruto["Nome"] + " " + bruto["Sobrenome"]
+    bruto = bruto.set_index("ID")
+
+    ordem = np.argsort(ids, kind="stable")
+    df = bruto.iloc[ordem]
+    if normalizar:
+        df = normalizar_tabela(df)
+
+    estatisticas = {
+        "pessoas": pessoas,
+        "semente": semente,
+        "geracoes": int(geracao.max()) + 1,
+        "fundadores": fundadores,
+        "casais": casais_total,
+        "casais_de_primos": casais_primos,
+        "conjuges_externos": externos,
+        "sem_pai": float((pai < 0).mean()),
+        "sem_mae": float((mae < 0).mean()),
+        "filhos_por_casal": filhos_por_casal,
+    }
+    return ArvoreSintetica(df, geracao[ordem], estatisticas)
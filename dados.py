@@ -0,0 +1,505 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import weakref
+from collections import namedtuple
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+from instrumentacao import medido
+from indices import (
+    COLUNAS_MEMORIZADAS,
+    migrar_derivados,
+    normalizar_identificador,
+    normalizar_texto,
+    obter_familia_index,
+    obter_indice_busca,
+    obter_mapa_identificadores,
+)
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # Sem pyarrow, a planilha é lida diretamente a cada carga
+    feather = None
+
+# Caminho padrão da planilha da árvore
+CAMINHO_DADOS = "datasets/Dados_Genera_MyHeritage_Arvore.xlsx"
+
+# Pasta (ao lado da planilha) onde ficam os arquivos de cache colunar
+PASTA_CACHE = ".cache"
+
+# Incrementar quando o formato do cache ou o tratamento da planilha mudar
+VERSAO_CACHE = 3
+
+# Nomes de colunas das exportações antigas (arquivos _ANTIGO_*) e seus nomes atuais
+COLUNAS_ANTIGAS = {
+    "Data Nascimento": "Data de Nascimento",
+    "Local Nascimento": "Local de Nascimento",
+    "Data Falecimento": "Data de Falecimento",
+    "Local Falecimento": "Local de Falecimento",
+}
+
+# Colunas que guardam IDs de outras pessoas (vazio e 0 significam ausente)
+COLUNAS_IDS = ["Casal_ID", "Pai_ID", "Mãe_ID"]
+COLUNAS_PAIS = ["Pai_ID", "Mãe_ID"]
+
+# Colunas com poucos valores distintos e muito repetidos, guardadas como categorias
+COLUNAS_CATEGORICAS = ["Sexo", "Sobrenome", "Local de Nascimento", "Local de Falecimento"]
+
+# Colunas de data (texto livre) e as colunas com a data interpretada; o texto original é mantido
+COLUNAS_DATAS = {"Data de Nascimento": "Nascimento", "Data de Falecimento": "Falecimento"}
+
+# Meses por extenso e abreviados (sem acentos) que aparecem nas exportações: português, inglês e,
+# em registros copiados de outras árvores, alemão e espanhol
+MESES = {
+    "janeiro": 1, "jan": 1, "january": 1, "januar": 1, "enero": 1,
+    "fevereiro": 2, "fev": 2, "february": 2, "feb": 2, "februar": 2, "febrero": 2,
+    "marco": 3, "mar": 3, "march": 3, "marz": 3, "marzo": 3,
+    "abril": 4, "abr": 4, "april": 4, "apr": 4,
+    "maio": 5, "mai": 5, "may": 5, "mayo": 5,
+    "junho": 6, "jun": 6, "june": 6, "juni": 6, "junio": 6,
+    "julho": 7, "jul": 7, "july": 7, "juli": 7, "julio": 7,
+    "agosto": 8, "ago": 8, "august": 8, "aug": 8,
+    "setembro": 9, "set": 9, "september": 9, "sep": 9, "sept": 9, "septiembre": 9,
+    "outubro": 10, "out": 10, "october": 10, "oct": 10, "oktober": 10, "octubre": 10,
+    "novembro": 11, "nov": 11, "november": 11, "noviembre": 11,
+    "dezembro": 12, "dez": 12, "december": 12, "dec": 12, "dezember": 12, "diciembre": 12,
+}
+
+# Palavras que tornam a data aproximada ("aproximadamente 1867", "ABT 1820", "antes de 1773"...)
+QUALIFICADORES_APROXIMADOS = {
+    "aproximadamente", "aprox", "cerca", "circa", "ca", "c", "abt", "about", "approx", "est", "cal", "calculado",
+    "volta", "torno",
+    "antes", "before", "bef", "apos", "depois", "after", "aft", "um", "gegen", "vor", "nach",
+}
+
+# Palavras sem significado para a data ("25 de maio de 1829")
+PALAVRAS_IGNORADAS = {"de", "del", "em", "por", "in", "on", "the"}
+
+
+def hash_arquivo(caminho):
+    """Calcula o SHA-256 do conteúdo de um arquivo."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _caminhos_cache(caminho):
+    """Retorna os caminhos do arquivo feather e do arquivo JSON de metadados para uma planilha."""
+    pasta = os.path.join(os.path.dirname(os.path.abspath(caminho)), PASTA_CACHE)
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    return pasta, os.path.join(pasta, f"{base}.feather"), os.path.join(pasta, f"{base}.json")
+
+
+def ler_metadados(caminho_json):
+    """Lê os metadados do cache, retornando None se não existirem ou estiverem corrompidos."""
+    try:
+        with open(caminho_json, "r", encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def escrever_json(destino, metadados):
+    """Grava um dicionário (metadados do cache, manifesto do histórico) em JSON."""
+    with open(destino, "w", encoding="utf-8") as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False, indent=2)
+
+
+def gravar_atomico(caminho, escrever):
+    """
+    Grava um arquivo via arquivo temporário + os.replace, para nunca deixar um cache pela metade.
+    O temporário tem nome único por chamada, então threads e processos gravando o mesmo arquivo não se atropelam.
+    """
+    descritor, temporario = tempfile.mkstemp(prefix=f"{os.path.basename(caminho)}.", suffix=".tmp",
+                                             dir=os.path.dirname(caminho) or ".")
+    os.close(descritor)
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def _montar_data(ano, mes, dia, aproximada):
+    """Monta a data; mês ou dia ausentes (ou dia 0) viram 1 e tornam a data aproximada."""
+    if mes is None:
+        mes, aproximada = 1, True
+    if not dia:
+        dia, aproximada = 1, True
+    try:
+        return date(ano, mes, dia), aproximada
+    except ValueError:
+        return None, False
+
+
+def interpretar_data(texto):
+    """
+    Interpreta uma data em texto livre, como exportada pelo MyHeritage/FamilySearch ("25 de maio de 1829",
+    "16 MAY 1745", "01/01/1695", "15.12.1925", "ABT 1820", "aproximadamente 1867", "<1786>"...).
+    Retorna (date, aproximada); (None, False) se o texto não for uma data ("indefinido", "Falecido(a)").
+    Datas só com ano ou mês e ano usam o dia 1 (e o mês 1) e são marcadas como aproximadas.
+    """
+    if isinstance(texto, (datetime, date)):
+        return (texto.date() if isinstance(texto, datetime) else texto), False
+    if texto is None or pd.isna(texto):
+        return None, False
+
+    bruto = normalizar_texto(texto).strip()
+    aproximada = bruto.startswith("<") and bruto.endswith(">")  # Data estimada
+    iso = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})(?: \d{1,2}:\d{2}:\d{2})?", bruto)
+    if iso:
+        ano, mes, dia = (int(parte) for parte in iso.groups())
+        return _montar_data(ano, mes, dia, aproximada)
+
+    mes = None
+    numeros = []
+    for token in re.findall(r"[a-z]+|\d+", bruto):
+        if token.isdigit():
+            numeros.append(int(token))
+        elif token in MESES and mes is None:
+            mes = MESES[token]
+        elif token in QUALIFICADORES_APROXIMADOS:
+            aproximada = True
+        elif token not in PALAVRAS_IGNORADAS:
+            return None, False
+
+    if mes is not None and len(numeros) in (1, 2):
+        dia, ano = (None, numeros[0]) if len(numeros) == 1 else numeros
+    elif mes is None and len(numeros) == 1:
+        dia, ano = None, numeros[0]
+    elif mes is None and len(numeros) in (2, 3):
+        dia, mes, ano = ([None] + numeros) if len(numeros) == 2 else numeros  # mm/aaaa ou dd/mm/aaaa
+    else:
+        return None, False
+    if ano < 100:
+        return None, False
+    return _montar_data(ano, mes, dia, aproximada)
+
+
+def interpretar_datas(serie):
+    """
+    Versão de interpretar_data para uma Series (cada texto distinto é interpretado uma única vez).
+    Retorna (datas em datetime64[s], que cobre anos anteriores a 1677; flags de data aproximada).
+    """
+    codigos, textos = pd.factorize(serie.astype(object))
+    interpretadas = [interpretar_data(texto) for texto in textos]
+    datas = np.array([data if data is not None else "NaT" for data, _ in interpretadas] + ["NaT"], dtype="datetime64[s]")
+    aproximadas = np.array([aproximada for _, aproximada in interpretadas] + [False], dtype=bool)
+    # Códigos -1 (valor ausente) apontam para o último elemento: NaT e não aproximada
+    return (
+        pd.Series(datas[codigos], index=serie.index, dtype="datetime64[s]"),
+        pd.Series(aproximadas[codigos], index=serie.index, dtype=bool),
+    )
+
+
+def _ids_compactos(serie):
+    """IDs como int32 com 0 para ausente (int64 se algum valor não couber em int32)."""
+    valores = pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64")
+    if len(valores) and (valores.max() > np.iinfo(np.int32).max or valores.min() < np.iinfo(np.int32).min):
+        return valores
+    return valores.astype("int32")
+
+
+def normalizar_tabela(df):
+    """
+    Etapa de normalização feita na carga: colunas de IDs como int32 com 0 para ausente (sem NaN nem float),
+    COLUNAS_CATEGORICAS como categorias e, para cada coluna de COLUNAS_DATAS, a data interpretada
+    (datetime64) e a coluna "<nome> Aproximado" indicando datas aproximadas ou incompletas.
+    Pode ser reaplicada a uma tabela já normalizada (datas já interpretadas só têm os tipos restaurados).
+    """
+    df = df.copy()
+    for coluna in COLUNAS_IDS:
+        if coluna in df.columns:
+            df[coluna] = _ids_compactos(df[coluna])
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("category")
+    for coluna, destino in COLUNAS_DATAS.items():
+        aproximado = f"{destino} Aproximado"
+        if destino in df.columns and aproximado in df.columns:
+            df[destino] = df[destino].astype("datetime64[s]")
+            df[aproximado] = df[aproximado].fillna(False).astype(bool)
+        elif coluna in df.columns:
+            df[destino], df[aproximado] = interpretar_datas(df[coluna])
+    return df
+
+
+def relatorio_memoria(antes, depois):
+    """
+    Memória (bytes, contando o conteúdo dos textos) e tipo de cada coluna antes e depois da normalização,
+    com uma linha final de total (incluindo o índice).
+    """
+    uso_antes = antes.memory_usage(deep=True)
+    uso_depois = depois.memory_usage(deep=True)
+    colunas = list(depois.columns) + [coluna for coluna in antes.columns if coluna not in depois.columns]
+    relatorio = pd.DataFrame({
+        "tipo antes": antes.dtypes.astype(str),
+        "bytes antes": uso_antes.drop("Index"),
+        "tipo depois": depois.dtypes.astype(str),
+        "bytes depois": uso_depois.drop("Index"),
+    }).reindex(colunas).fillna({"tipo antes": "", "tipo depois": ""})
+    relatorio.loc["Total"] = ["", int(uso_antes.sum()), "", int(uso_depois.sum())]
+    return relatorio.astype({"bytes antes": "Int64", "bytes depois": "Int64"})
+
+
+def ler_planilha(caminho, normalizar=True):
+    """
+    Lê a planilha Excel, remove colunas sem nome e define a coluna 'ID' como índice.
+    Com normalizar=True, aplica também normalizar_tabela.
+    """
+    df = pd.read_excel(caminho)
+    df = df.loc[:, ~df.columns.astype(str).str.contains("^Unnamed")]  # Remove colunas sem nome
+    df = df.rename(columns=COLUNAS_ANTIGAS)  # Exportações antigas usam outros nomes para datas e locais
+    if "ID" in df.columns:
+        df["ID"] = pd.to_numeric(df["ID"], errors="coerce", downcast="integer")  # Converte ID para inteiro
+        df = df.set_index("ID")  # Define ID como índice
+    return normalizar_tabela(df) if normalizar else df
+
+
+def carregar_planilha(caminho=CAMINHO_DADOS, usar_cache=True):
+    """
+    Carrega a planilha da árvore usando um cache colunar (feather) ao lado do arquivo.
+    O cache é identificado pelo SHA-256 e pelo mtime da planilha: enquanto o arquivo não mudar,
+    as cargas seguintes leem o feather com memory-map em vez de interpretar o xlsx.
+    Sem pyarrow, ou se o cache não puder ser gravado, lê a planilha diretamente.
+    """
+    if not usar_cache or feather is None:
+        return ler_planilha(caminho)
+
+    estado = os.stat(caminho)  # Levanta FileNotFoundError se a planilha não existir
+    pasta, caminho_feather, caminho_json = _caminhos_cache(caminho)
+    metadados = ler_metadados(caminho_json)
+
+    if metadados and metadados.get("versao") == VERSAO_CACHE and os.path.exists(caminho_feather):
+        mesmo_arquivo = metadados.get("mtime_ns") == estado.st_mtime_ns and metadados.get("tamanho") == estado.st_size
+        sha256 = None
+        if not mesmo_arquivo:
+            # mtime mudou (cópia, checkout): só reaproveita o cache se o conteúdo for o mesmo
+            sha256 = hash_arquivo(caminho)
+            mesmo_arquivo = sha256 == metadados.get("sha256")
+        if mesmo_arquivo:
+            try:
+                df = feather.read_table(caminho_feather, memory_map=True).to_pandas()
+            except (OSError, ValueError):
+                df = None
+            if df is not None:
+                if metadados.get("indice") in df.columns:
+                    df = df.set_index(metadados["indice"])
+                if sha256 is not None:
+                    metadados.update(mtime_ns=estado.st_mtime_ns, tamanho=estado.st_size)
+                    try:
+                        gravar_atomico(caminho_json, lambda destino: escrever_json(destino, metadados))
+                    except OSError:
+                        pass
+                return df
+
+    # Cache ausente ou desatualizado: lê e normaliza a planilha e grava um novo cache
+    bruto = ler_planilha(caminho, normalizar=False)
+    df = normalizar_tabela(bruto)
+    memoria = relatorio_memoria(bruto, df).loc["Total"]
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        gravar_atomico(caminho_feather, lambda destino: df.reset_index(drop=df.index.name is None).to_feather(destino))
+        metadados = {
+            "versao": VERSAO_CACHE,
+            "origem": os.path.basename(caminho),
+            "sha256": hash_arquivo(caminho),
+            "mtime_ns": estado.st_mtime_ns,
+            "tamanho": estado.st_size,
+            "indice": df.index.name,
+            "linhas": len(df),
+            "memoria": {"antes": int(memoria["bytes antes"]), "depois": int(memoria["bytes depois"])},
+        }
+        gravar_atomico(caminho_json, lambda destino: escrever_json(destino, metadados))
+    except (OSError, ValueError, TypeError):
+        pass  # Cache é só uma otimização: sem permissão de escrita ou tipos não suportados, segue sem ele
+    return df
+
+
+def ler_cache_anterior(caminho=CAMINHO_DADOS):
+    """
+    Lê a última versão da planilha guardada no cache colunar, mesmo que a planilha já tenha mudado
+    (é o snapshot anterior de uma atualização). Retorna None se não houver cache legível.
+    """
+    if feather is None:
+        return None
+    _, caminho_feather, caminho_json = _caminhos_cache(caminho)
+    metadados = ler_metadados(caminho_json)
+    if not metadados or metadados.get("versao") != VERSAO_CACHE:
+        return None
+    try:
+        df = feather.read_table(caminho_feather, memory_map=True).to_pandas()
+    except (OSError, ValueError):
+        return None
+    if metadados.get("indice") in df.columns:
+        df = df.set_index(metadados["indice"])
+    return df
+
+
+# Diferenças entre duas versões da planilha, por ID: listas ordenadas de IDs, exceto
+# alterados ({ID: colunas alteradas}) e renumerados ([(ID antigo, ID novo)], mesma pessoa pelo Identificador)
+DiferencaSnapshots = namedtuple("DiferencaSnapshots", ["adicionados", "removidos", "reparentados", "alterados", "renumerados"])
+
+
+def _valores_comparaveis(df, ids, coluna):
+    """Valores de uma coluna nas linhas `ids`, num formato comparável entre versões (coluna ausente = vazia)."""
+    if coluna not in df.columns:
+        return pd.Series(None, index=ids, dtype=object)
+    serie = df[coluna].loc[ids]
+    if coluna in COLUNAS_IDS:
+        return pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64")
+    return serie.astype(object)
+
+
+def _ids_por_identificador(df, ids):
+    """{Identificador normalizado: ID} das linhas `ids` cujo Identificador é único entre elas."""
+    if "Identificador" not in df.columns or not len(ids):
+        return {}
+    identificadores = df["Identificador"].loc[ids].dropna().map(normalizar_identificador)
+    identificadores = identificadores[identificadores != ""].drop_duplicates(keep=False)
+    return dict(zip(identificadores.tolist(), identificadores.index.tolist()))
+
+
+def comparar_snapshots(df_anterior, df_novo):
+    """
+    Compara duas versões da planilha (indexadas por ID) e retorna uma DiferencaSnapshots.
+    Reparentados são os IDs presentes nas duas versões cujo Pai_ID ou Mãe_ID mudou; eles
+    também aparecem em alterados, que lista as colunas alteradas de cada ID.
+    """
+    adicionados = df_novo.index.difference(df_anterior.index)
+    removidos = df_anterior.index.difference(df_novo.index)
+    comuns = df_anterior.index.intersection(df_novo.index)
+
+    colunas = list(df_novo.columns) + [coluna for coluna in df_anterior.columns if coluna not in df_novo.columns]
+    colunas_alteradas, mudancas = [], []
+    for coluna in colunas:
+        antes = _valores_comparaveis(df_anterior, comuns, coluna)
+        depois = _valores_comparaveis(df_novo, comuns, coluna)
+        diferente = (antes.to_numpy() != depois.to_numpy()) & ~(antes.isna().to_numpy() & depois.isna().to_numpy())
+        if diferente.any():
+            colunas_alteradas.append(coluna)
+            mudancas.append(diferente)
+
+    alterados = {}
+    reparentados = []
+    if mudancas:
+        mudancas = np.column_stack(mudancas)  # Linhas de `comuns` x colunas alteradas
+        ids_comuns = comuns.to_numpy()
+        for linha in np.flatnonzero(mudancas.any(axis=1)).tolist():
+            alterados[int(ids_comuns[linha])] = tuple(
+                coluna for coluna, mudou in zip(colunas_alteradas, mudancas[linha].tolist()) if mudou
+            )
+        reparentados = [pessoa_id for pessoa_id, colunas_pessoa in alterados.items()
+                        if any(coluna in COLUNAS_PAIS for coluna in colunas_pessoa)]
+
+    # Mesma pessoa (pelo Identificador) removida com um ID e incluída com outro
+    identificadores_removidos = _ids_por_identificador(df_anterior, removidos)
+    identificadores_adicionados = _ids_por_identificador(df_novo, adicionados)
+    renumerados = sorted(
+        (int(identificadores_removidos[identificador]), int(pessoa_id))
+        for identificador, pessoa_id in identificadores_adicionados.items()
+        if identificador in identificadores_removidos
+    )
+
+    return DiferencaSnapshots(
+        adicionados=sorted(int(pessoa_id) for pessoa_id in adicionados),
+        removidos=sorted(int(pessoa_id) for pessoa_id in removidos),
+        reparentados=sorted(reparentados),
+        alterados=alterados,
+        renumerados=renumerados,
+    )
+
+
+class DatasetFamilia:
+    """
+    Dados da árvore compartilhados (somente leitura) por todas as sessões do processo:
+    o DataFrame e as estruturas derivadas dele, construídas uma única vez.
+    """
+
+    def __init__(self, df, origem=None, versao=None, diferencas=None):
+        self.df = df
+        self.origem = origem
+        self.versao = versao  # SHA-256 da planilha de origem
+        self.diferencas = diferencas  # DiferencaSnapshots em relação à versão anterior (None na primeira carga)
+        self.migracao = {}  # O que foi reaproveitado da versão anterior; ver migrar_derivados
+        self.indice = obter_familia_index(df)  # Grafo de pais/filhos e memo de antepassados
+        self.busca = obter_indice_busca(df)  # Busca textual da página de dados
+        self.identificadores = obter_mapa_identificadores(df)  # ID <-> Identificador (FamilySearch)
+
+    def __len__(self):
+        return len(self.df)
+
+    def resolver_identificadores(self, identificadores):
+        """Resolve de uma vez uma lista (ou texto colado) de Identificadores; ver MapaIdentificadores.resolver_lista."""
+        return self.identificadores.resolver_lista(identificadores)
+
+
+def atualizar_dataset(anterior, df, origem=None, versao=None):
+    """
+    Monta o DatasetFamilia de uma nova versão da planilha a partir da anterior: compara as duas por ID
+    e reaproveita os fechos de antepassados e os relatórios em cache que as mudanças não afetam.
+    `anterior` pode ser um DatasetFamilia ou o DataFrame da versão anterior.
+    """
+    df_anterior = anterior.df if isinstance(anterior, DatasetFamilia) else anterior
+    diferencas = comparar_snapshots(df_anterior, df)
+    dataset = DatasetFamilia(df, origem=origem, versao=versao, diferencas=diferencas)
+    mudaram_vinculos = set(diferencas.reparentados) | set(diferencas.adicionados) | set(diferencas.removidos)
+    mudaram_dados = [pessoa_id for pessoa_id, colunas in diferencas.alterados.items()
+                     if any(coluna in COLUNAS_MEMORIZADAS for coluna in colunas)]
+    dataset.migracao = migrar_derivados(df_anterior, df, mudaram_vinculos, mudaram_dados)
+    return dataset
+
+
+# Último dataset carregado de cada planilha, de onde partem as atualizações incrementais
+_datasets_atuais = {}
+
+
+@st.cache_resource(show_spinner="Carregando dados da árvore...", max_entries=2)
+def _carregar_dataset(caminho, mtime_ns, tamanho):
+    """
+    Carrega o dataset de uma versão da planilha (identificada por mtime e tamanho). Se houver uma versão
+    anterior (em memória ou no cache colunar), aplica só a diferença entre elas; ver atualizar_dataset.
+    """
+    versao = hash_arquivo(caminho)
+    referencia = _datasets_atuais.get(caminho)
+    anterior = referencia() if referencia is not None else None
+    if anterior is None:
+        # Sem versão em memória: parte do snapshot do cache colunar, se ele for de outra versão.
+        # Precisa ser lido antes de carregar_planilha regravar o cache.
+        metadados = ler_metadados(_caminhos_cache(caminho)[2])
+        if metadados and metadados.get("sha256") != versao:
+            anterior = ler_cache_anterior(caminho)
+
+    df = carregar_planilha(caminho)
+    if anterior is None:
+        dataset = DatasetFamilia(df, origem=caminho, versao=versao)
+    else:
+        dataset = atualizar_dataset(anterior, df, origem=caminho, versao=versao)
+    _datasets_atuais[caminho] = weakref.ref(dataset)
+    return dataset
+
+
+def versao_de(df):
+    """SHA-256 da planilha de onde veio o DataFrame (None se ele não veio de obter_dataset)."""
+    for referencia in list(_datasets_atuais.values()):
+        dataset = referencia()
+        if dataset is not None and dataset.df is df:
+            return dataset.versao
+    return None
+
+
+@medido("carga")
+def obter_dataset(caminho=CAMINHO_DADOS):
+    """
+    Retorna o DatasetFamilia compartilhado entre as sessões, recarregando-o apenas quando
+    a planilha muda. As sessões devem guardar só a referência, nunca cópias do DataFrame.
+    """
+    estado = os.stat(caminho)
+    return _carregar_dataset(caminho, estado.st_mtime_ns, estado.st_size)
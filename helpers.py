@@ -1,25 +1,33 @@
 import pandas as pd
 import os
 import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import simpleSplit
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import streamlit as st
-import re
+import numpy as np
+from dados import carregar_planilha
+from indices import (
+    FamilyIndex,
+    obter_familia_index,
+    obter_indice_nomes,
+    obter_mapa_identificadores,
+    obter_cache,
+    obter_matriz_antepassados,
+)
+from instrumentacao import medido, registrar_varredura
 
 # Função para carregar o DataFrame
 def carregar_dataframe(caminho):
-    """Carrega um DataFrame a partir de um arquivo Excel."""
-    df = pd.read_excel(caminho)
-    df.set_index('ID', inplace=True)  # Define a coluna 'ID' como índice
-    return df
-
-# Exemplo de carregamento do DataFrame
-# Substitua pelo caminho real do seu arquivo de dados
-caminho = pd.read_excel("datasets/Dados_Genera_MyHeritage_Arvore.xlsx")
+    """Carrega um DataFrame a partir de um arquivo Excel (via cache colunar, quando disponível)."""
+    return carregar_planilha(caminho)
 
 
+@medido("computacao")
 def buscar_nome_sobrenome_por_id(df, pessoa_id):
     """Busca o nome e sobrenome de uma pessoa por ID e retorna como uma string única no campo 'Nome Completo'."""
     if pessoa_id in df.index and pessoa_id != 0:
@@ -30,7 +38,16 @@ def buscar_nome_sobrenome_por_id(df, pessoa_id):
 
 # ------------------------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def encontrar_descendentes(df, pessoa_ids):
+    if isinstance(df, FamilyIndex):
+        linhas = {}
+        for pessoa_id in pessoa_ids:
+            pessoa_id_str = str(pessoa_id)
+            if pessoa_id_str.isdigit() and int(pessoa_id_str) > 0:
+                linhas.update(dict.fromkeys(df.linhas_filhos(int(pessoa_id_str)).tolist()))
+        return df.df.iloc[list(linhas)]
+
     descendentes = pd.DataFrame()
     for pessoa_id in pessoa_ids:
         pessoa_id_str = str(pessoa_id)  # Convert to string
@@ -38,6 +55,7 @@ def encontrar_descendentes(df, pessoa_ids):
             pessoa_id = int(pessoa_id_str)  # Convert to integer
             if pessoa_id > 0:  # Check if the ID is valid
                 # Search for children regardless of whether both parents are registered
+                registrar_varredura(len(df))
                 descendentes_temp = df[(df['Pai_ID'] == pessoa_id) | (df['Mãe_ID'] == pessoa_id)]
                 descendentes = pd.concat([descendentes, descendentes_temp])
     return descendentes.drop_duplicates()
@@ -46,12 +64,17 @@ def encontrar_descendentes(df, pessoa_ids):
 
 def id_valido(df, pessoa_id):
     # Verifica se o ID está no DataFrame e não é nulo
-    return pessoa_id in df.index and not pd.isnull(pessoa_id) and pessoa_id > 0
+    ids = df if isinstance(df, FamilyIndex) else df.index
+    return pessoa_id in ids and not pd.isnull(pessoa_id) and pessoa_id > 0
 
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_pais(df, pessoa_id):
+    if isinstance(df, FamilyIndex):
+        pai_id, mae_id = df.pais(pessoa_id) if pessoa_id != 0 else (None, None)
+        return {'pai': pai_id, 'mae': mae_id}
     if pessoa_id in df.index and pessoa_id != 0:
         pai_id = df.at[pessoa_id, 'Pai_ID'] if pd.notna(df.at[pessoa_id, 'Pai_ID']) and df.at[pessoa_id, 'Pai_ID'] in df.index else None
         mae_id = df.at[pessoa_id, 'Mãe_ID'] if pd.notna(df.at[pessoa_id, 'Mãe_ID']) and df.at[pessoa_id, 'Mãe_ID'] in df.index else None
@@ -59,15 +82,31 @@ def buscar_pais(df, pessoa_id):
     return {'pai': None, 'mae': None}
 
 
+@medido("computacao")
 def buscar_filhos(df, pessoa_id):
     """Busca os filhos de uma pessoa no DataFrame e retorna uma lista de dicionários."""
+    if isinstance(df, FamilyIndex):
+        return [{'ID': int(df.ids[linha]), 'Nome': df.nome[linha], 'Sobrenome': df.sobrenome[linha]}
+                for linha in df.linhas_filhos(pessoa_id).tolist()]
+
+    registrar_varredura(len(df))
     filhos = df[(df['Pai_ID'] == pessoa_id) | (df['Mãe_ID'] == pessoa_id)]
     filhos = filhos.assign(ID=filhos.index)  # Método seguro para adicionar 'ID'
     lista_filhos = filhos[['ID', 'Nome', 'Sobrenome']].to_dict('records')
     return lista_filhos
 
 
+@medido("computacao")
 def buscar_irmaos(df, pessoa_id):
+    if isinstance(df, FamilyIndex):
+        if pessoa_id not in df:
+            return []
+        lista_irmaos = []
+        for irmao_id in df.irmaos(pessoa_id):
+            linha = df.posicao[irmao_id]
+            lista_irmaos.append({'ID': irmao_id, 'Nome Completo': f"{df.nome[linha]} {df.sobrenome[linha]}"})
+        return lista_irmaos
+
     if pessoa_id not in df.index:
         print(f"O ID {pessoa_id} não foi encontrado no DataFrame.")
         return []
@@ -78,19 +117,23 @@ def buscar_irmaos(df, pessoa_id):
 
     irmaos = pd.DataFrame()
     if pai_id > 0 and not pd.isnull(pai_id):
+        registrar_varredura(len(df))
         irmaos_paternos = df[(df['Pai_ID'] == pai_id) & (df.index != pessoa_id)]
         irmaos = pd.concat([irmaos, irmaos_paternos])
     if mae_id > 0 and not pd.isnull(mae_id):
+        registrar_varredura(len(df))
         irmaos_maternos = df[(df['Mãe_ID'] == mae_id) & (df.index != pessoa_id)]
         irmaos = pd.concat([irmaos, irmaos_maternos])
 
     irmaos = irmaos.drop_duplicates()
 
     # Formatação da saída
+    registrar_varredura(len(irmaos))
     lista_irmaos = [{'ID': idx, 'Nome Completo': f"{row['Nome']} {row['Sobrenome']}"} for idx, row in irmaos.iterrows()]
     return lista_irmaos
 
 
+@medido("computacao")
 def buscar_sobrinhos(df, pessoa_id):
     """Busca todos os sobrinhos de uma pessoa no DataFrame."""
     irmaos = buscar_irmaos(df, pessoa_id)  # Supondo que isto retorne uma lista de dicionários
@@ -111,6 +154,7 @@ def buscar_sobrinhos(df, pessoa_id):
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_avos(df, pessoa_id):
     """Busca os IDs dos avós de uma pessoa e retorna um dicionário."""
     avos_ids = {'Avô Paterno': None, 'Avó Paterna': None, 'Avô Materno': None, 'Avó Materna': None}
@@ -118,7 +162,13 @@ def buscar_avos(df, pessoa_id):
     
     # Buscar os pais (pai e mãe)
     for chave, id in pais_ids.items():
-        if id and id in df.index:
+        if id and isinstance(df, FamilyIndex):
+            Avo_Paterno, Avo_Materna = df.pais_brutos(id)
+            if chave == 'pai':
+                avos_ids['Avô Paterno'], avos_ids['Avó Paterna'] = Avo_Paterno, Avo_Materna
+            else:
+                avos_ids['Avô Materno'], avos_ids['Avó Materna'] = Avo_Paterno, Avo_Materna
+        elif id and id in df.index:
             # Busca o ID do pai e da mãe do pai ou mãe da pessoa
             Avo_Paterno = df.at[id, 'Pai_ID'] if 'Pai_ID' in df.columns and pd.notna(df.at[id, 'Pai_ID']) else None
             Avo_Materna = df.at[id, 'Mãe_ID'] if 'Mãe_ID' in df.columns and pd.notna(df.at[id, 'Mãe_ID']) else None
@@ -134,6 +184,7 @@ def buscar_avos(df, pessoa_id):
     return avos_ids
 
 
+@medido("computacao")
 def buscar_tios(df, pessoa_id):
     """Busca e retorna os tios paternos e maternos de uma pessoa como um dicionário de listas de dicionários."""
     # Busca os IDs dos pais da pessoa
@@ -160,6 +211,7 @@ def buscar_tios(df, pessoa_id):
     return tios
 
 
+@medido("computacao")
 def buscar_primos_primeiro_grau(df, pessoa_id):
     # Encontrar pais da pessoa
     pais = buscar_pais(df, pessoa_id)
@@ -170,14 +222,14 @@ def buscar_primos_primeiro_grau(df, pessoa_id):
     primos_primeiro_grau = []
     
     # Verificar se existem IDs válidos para pai e mãe antes de buscar tios e tias
-    if pai_id and pai_id in df.index:
+    if pai_id:
         tios_paternos = buscar_irmaos(df, pai_id)
         # Para cada tio ou tia paterno, buscar seus filhos
         for tio in tios_paternos:
             filhos_do_tio = buscar_filhos(df, tio['ID'])
             primos_primeiro_grau.extend(filhos_do_tio)  # Adiciona os filhos do tio à lista de primos
     
-    if mae_id and mae_id in df.index:
+    if mae_id:
         tios_maternos = buscar_irmaos(df, mae_id)
         # Para cada tio ou tia materno, buscar seus filhos
         for tia in tios_maternos:
@@ -190,6 +242,7 @@ def buscar_primos_primeiro_grau(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_filhos_dos_primos_primeiro_grau(df, pessoa_id):
     primos = buscar_primos_primeiro_grau(df, pessoa_id)  # Retorna lista de dicionários
     filhos_dos_primos_primeiro_grau = []
@@ -208,6 +261,7 @@ def buscar_filhos_dos_primos_primeiro_grau(df, pessoa_id):
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_bisavos(df, pessoa_id):
     bisavos = []
 
@@ -230,6 +284,7 @@ def buscar_bisavos(df, pessoa_id):
 
 
 
+@medido("computacao")
 def buscar_tios_avos(df, pessoa_id):
     """Busca todos os tio-avôs e tia-avós de uma pessoa no DataFrame."""
     # Primeiro, encontrar todos os avós da pessoa usando a função ajustada buscar_avos
@@ -249,6 +304,7 @@ def buscar_tios_avos(df, pessoa_id):
     return list(unique_tios_avos)
 
 
+@medido("computacao")
 def buscar_primos_primeiro_grau_dos_pais(df, pessoa_id):
     """Busca os primos de primeiro grau dos pais da pessoa, que são os filhos dos tios-avós."""
     avos = buscar_avos(df, pessoa_id)  # Primeiro, encontrar todos os avós da pessoa
@@ -268,6 +324,7 @@ def buscar_primos_primeiro_grau_dos_pais(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_segundo_grau(df, pessoa_id):
     # Primeiro, obtemos os primos de primeiro grau dos pais da pessoa
     primos_primeiro_grau_dos_pais = buscar_primos_primeiro_grau_dos_pais(df, pessoa_id)
@@ -286,6 +343,7 @@ def buscar_primos_segundo_grau(df, pessoa_id):
     return primos_segundo_grau
 
 
+@medido("computacao")
 def buscar_filhos_dos_primos_segundo_grau(df, pessoa_id):
     """Busca os filhos dos primos de segundo grau de uma pessoa."""
     primos_segundo_grau = buscar_primos_segundo_grau(df, pessoa_id)  # Obtemos a lista de primos de segundo grau
@@ -305,6 +363,7 @@ def buscar_filhos_dos_primos_segundo_grau(df, pessoa_id):
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_trisavos(df, pessoa_id):
     """Busca os trisavós de uma pessoa no DataFrame."""
     bisavos = buscar_bisavos(df, pessoa_id)  # Obtemos a lista de bisavós
@@ -327,6 +386,7 @@ def buscar_trisavos(df, pessoa_id):
     return list(unique_trisavos)
 
 
+@medido("computacao")
 def buscar_tios_bisavos(df, pessoa_id):
     """Busca todos os tios-bisavôs e tias-bisavós de uma pessoa no DataFrame, que são os filhos dos trisavós, excluindo os próprios bisavós."""
     trisavos = buscar_trisavos(df, pessoa_id)  # Primeiro, encontrar todos os trisavós da pessoa
@@ -348,6 +408,7 @@ def buscar_tios_bisavos(df, pessoa_id):
     return list(unique_tios_bisavos)
 
 
+@medido("computacao")
 def buscar_primos_primeiro_grau_dos_avos(df, pessoa_id):
     """Busca os primos de primeiro grau dos avós de uma pessoa, excluindo os próprios avós."""
     avos = buscar_avos(df, pessoa_id)  # Obtemos a lista de avós para evitar incluí-los
@@ -370,6 +431,7 @@ def buscar_primos_primeiro_grau_dos_avos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_segundo_grau_dos_pais(df, pessoa_id):
     """Busca os primos de segundo grau do pai ou da mãe de uma pessoa, excluindo os próprios pais."""
     pais = buscar_pais(df, pessoa_id)  # Busca os pais para excluir seus IDs
@@ -392,6 +454,7 @@ def buscar_primos_segundo_grau_dos_pais(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_terceiro_grau(df, pessoa_id):
     """Busca os primos de terceiro grau de uma pessoa, que são os filhos dos primos de segundo grau dos pais."""
     primos_segundo_grau_dos_pais = buscar_primos_segundo_grau_dos_pais(df, pessoa_id)  # Obtemos a lista de primos de segundo grau dos pais
@@ -409,6 +472,7 @@ def buscar_primos_terceiro_grau(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_filhos_dos_primos_terceiro_grau(df, pessoa_id):
     """Busca os filhos dos primos de terceiro grau de uma pessoa."""
     primos_terceiro_grau = buscar_primos_terceiro_grau(df, pessoa_id)  # Obtemos a lista de primos de terceiro grau
@@ -428,6 +492,7 @@ def buscar_filhos_dos_primos_terceiro_grau(df, pessoa_id):
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_tetravos(df, pessoa_id):
     """Busca os tetravós de uma pessoa, que são os pais dos trisavós."""
     trisavos = buscar_trisavos(df, pessoa_id)  # Obtemos a lista de trisavós
@@ -450,6 +515,7 @@ def buscar_tetravos(df, pessoa_id):
     return list(unique_tetravos)
 
 
+@medido("computacao")
 def buscar_tios_trisavos(df, pessoa_id):
     """Busca os tios-trisavôs e tias-trisavós de uma pessoa, que são os filhos dos tetravós, excluindo os próprios trisavós."""
     trisavos = buscar_trisavos(df, pessoa_id)  # Obtemos a lista de trisavós
@@ -471,6 +537,7 @@ def buscar_tios_trisavos(df, pessoa_id):
     return list(unique_tios_trisavos)
 
 
+@medido("computacao")
 def buscar_primos_primeiro_grau_dos_bisavos(df, pessoa_id):
     """Busca os primos de primeiro grau dos bisavós de uma pessoa, que são os filhos dos tios-trisavôs e tias-trisavós, excluindo os próprios bisavós."""
     bisavos = buscar_bisavos(df, pessoa_id)  # Obtemos a lista de bisavós para evitar incluí-los
@@ -493,6 +560,7 @@ def buscar_primos_primeiro_grau_dos_bisavos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_segundo_grau_dos_avos(df, pessoa_id):
     """Busca os primos de segundo grau dos avós de uma pessoa, que são os filhos dos primos de primeiro grau dos bisavós, excluindo os próprios avós."""
     avos = buscar_avos(df, pessoa_id)  # Obtemos a lista de avós para evitar incluí-los
@@ -515,6 +583,7 @@ def buscar_primos_segundo_grau_dos_avos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_terceiro_grau_dos_pais(df, pessoa_id):
     """Busca os primos de terceiro grau do pai ou da mãe de uma pessoa, que são os filhos dos primos de segundo grau dos avós, excluindo os próprios pais."""
     pais = buscar_pais(df, pessoa_id)  # Busca os pais para excluir seus IDs
@@ -537,6 +606,7 @@ def buscar_primos_terceiro_grau_dos_pais(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_quarto_grau(df, pessoa_id):
     """Busca os primos de quarto grau de uma pessoa, que são os filhos dos primos de terceiro grau do pai/da mãe."""
     primos_terceiro_grau_dos_pais = buscar_primos_terceiro_grau_dos_pais(df, pessoa_id)
@@ -551,6 +621,7 @@ def buscar_primos_quarto_grau(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_filhos_dos_primos_quarto_grau(df, pessoa_id):
     """Busca os filhos dos primos de quarto grau de uma pessoa."""
     primos_quarto_grau = buscar_primos_quarto_grau(df, pessoa_id)
@@ -567,6 +638,7 @@ def buscar_filhos_dos_primos_quarto_grau(df, pessoa_id):
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_pentavos(df, pessoa_id):
     """Busca os pentavós de uma pessoa, que são os pais dos tetravós."""
     tetravos = buscar_tetravos(df, pessoa_id)
@@ -582,6 +654,7 @@ def buscar_pentavos(df, pessoa_id):
     return list(unique_pentavos)
 
 
+@medido("computacao")
 def buscar_tios_tetravos(df, pessoa_id):
     """Busca os tios-tetravôs e tias-tetravôs de uma pessoa, que são os filhos dos pentavós, excluindo os próprios tetravós."""
     pentavos = buscar_pentavos(df, pessoa_id)  # Obtemos a lista de pentavós
@@ -604,6 +677,7 @@ def buscar_tios_tetravos(df, pessoa_id):
     return list(unique_tios_tetravos)
 
 
+@medido("computacao")
 def buscar_primos_primeiro_grau_dos_trisavos(df, pessoa_id):
     """Busca os primos de primeiro grau dos trisavós de uma pessoa, que são os filhos dos tio-tetravôs e tia-tetravôs, excluindo os próprios trisavós."""
     trisavos = buscar_trisavos(df, pessoa_id)  # Primeiro, encontrar todos os trisavós da pessoa
@@ -624,6 +698,7 @@ def buscar_primos_primeiro_grau_dos_trisavos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_segundo_grau_dos_bisavos(df, pessoa_id):
     """Busca os primos de segundo grau dos bisavós de uma pessoa, que são os filhos dos primos de primeiro grau dos trisavós, excluindo os próprios bisavós."""
     bisavos = buscar_bisavos(df, pessoa_id)  # Buscar os bisavós para excluir seus IDs
@@ -644,6 +719,7 @@ def buscar_primos_segundo_grau_dos_bisavos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_terceiro_grau_dos_avos(df, pessoa_id):
     """Busca os primos de terceiro grau dos avós de uma pessoa, que são os filhos dos primos de segundo grau dos bisavós, excluindo os próprios avós."""
     avos = buscar_avos(df, pessoa_id)  # Obtemos a lista de avós para evitar incluí-los
@@ -665,6 +741,7 @@ def buscar_primos_terceiro_grau_dos_avos(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_quarto_grau_dos_pais(df, pessoa_id):
     """Busca os primos de quarto grau do pai ou da mãe de uma pessoa, que são os filhos dos primos de terceiro grau dos avós, excluindo os próprios pais."""
     pais = buscar_pais(df, pessoa_id)  # Busca os pais para excluir seus IDs
@@ -685,6 +762,7 @@ def buscar_primos_quarto_grau_dos_pais(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_primos_quinto_grau(df, pessoa_id):
     """Busca os primos de quinto grau de uma pessoa, que são os filhos dos primos de quarto grau do pai ou da mãe."""
     primos_quarto_grau_dos_pais = buscar_primos_quarto_grau_dos_pais(df, pessoa_id)
@@ -699,6 +777,7 @@ def buscar_primos_quinto_grau(df, pessoa_id):
     return list(unique_primos)
 
 
+@medido("computacao")
 def buscar_filhos_dos_primos_quinto_grau(df, pessoa_id):
     """Busca os filhos dos primos de quinto grau de uma pessoa."""
     primos_quinto_grau = buscar_primos_quinto_grau(df, pessoa_id)
@@ -871,153 +950,78 @@ def imprimir_familia_extensa(df, pessoa_id):
     ]
     imprimir_parentes(df, pessoa_id, filhos_primos_quinto_grau, "Filhos dos Primos de 5º Grau")
     
-# 
+# Categorias da família extensa, na ordem de exibição, com o par (gerações acima, gerações abaixo)
+CATEGORIAS_FAMILIA_EXTENSA = [
+    ("Pais", (1, 0)),
+    ("Filhos", (0, 1)),
+    ("Irmãos", (1, 1)),
+    ("Sobrinhos", (1, 2)),
+    ("Avós", (2, 0)),
+    ("Tios", (2, 1)),
+    ("Primos de Primeiro Grau", (2, 2)),
+    ("Filhos dos Primos de 1º Grau", (2, 3)),
+    ("Bisavós", (3, 0)),
+    ("Tios-avós", (3, 1)),
+    ("Primo(a) de 1º Grau do pai/da mãe", (3, 2)),
+    ("Primo(a) de 2º Grau", (3, 3)),
+    ("Filho(a) do(a) primo(a) de 2º grau", (3, 4)),
+    ("Trisavós", (4, 0)),
+    ("Tio-bisavô/tia-bisavó", (4, 1)),
+    ("Primo(a) de 1º grau do avô/da avó", (4, 2)),
+    ("Primo(a) de 2º grau do pai/da mãe", (4, 3)),
+    ("Primo(a) de 3º grau", (4, 4)),
+    ("Filho(a) do(a) primo(a) de 3º grau", (4, 5)),
+    ("Tetravós", (5, 0)),
+    ("Tio-trisavô/Tia-trisavó", (5, 1)),
+    ("Primo(a) de 1º grau do bisavô/da bisavó", (5, 2)),
+    ("Primo(a) de 2º grau do avô/da avó", (5, 3)),
+    ("Primo(a) de 3º grau do pai/da mãe", (5, 4)),
+    ("Primos de 4º Grau", (5, 5)),
+    ("Filhos dos Primos de 4º Grau", (5, 6)),
+    ("Pentavós", (6, 0)),
+    ("Tio-tetravô/Tia-tetravó", (6, 1)),
+    ("Primos de 1º Grau do Trisavô/da Trisavó", (6, 2)),
+    ("Primos de 2º Grau do Bisavô/da Bisavó", (6, 3)),
+    ("Primos de 3º Grau do Avô/da Avó", (6, 4)),
+    ("Primos de 4º Grau do Pai/da Mãe", (6, 5)),
+    ("Primos de 5º Grau", (6, 6)),
+    ("Filhos dos Primos de 5º Grau", (6, 7)),
+]
+
+# Registro de um parente na família extensa
+Parente = namedtuple("Parente", ["id", "nome", "identificador"])
+
+
+@medido("computacao")
+def familia_extensa(df, pessoa_id):
+    """
+    Retorna a família extensa de uma pessoa como um dicionário ordenado
+    {categoria: [Parente(id, nome, identificador), ...]}, na ordem de CATEGORIAS_FAMILIA_EXTENSA.
+    Todas as categorias estão presentes, mesmo quando vazias.
+    """
+    indice = obter_familia_index(df)
+    camadas = calcular_camadas_parentesco(indice, pessoa_id)
+
+    familia = {}
+    for categoria, chave in CATEGORIAS_FAMILIA_EXTENSA:
+        familia[categoria] = [
+            Parente(parente_id, indice.nome_completo(parente_id), indice.obter_identificador(parente_id))
+            for parente_id in camadas.get(chave, [])
+        ]
+    return familia
+
+
 def imprimir_familia_extensa(df, pessoa_id):
+    """Imprime a família extensa de uma pessoa, categoria por categoria."""
     nome_completo = buscar_nome_sobrenome_por_id(df, pessoa_id)
-    
-    # Pais
-    pais_ids = buscar_pais(df, pessoa_id)
-    pais = []
-    if pais_ids['pai']:
-        pai_info = buscar_nome_sobrenome_por_id(df, pais_ids['pai'])
-        pais.append({'ID': pais_ids['pai'], 'Nome Completo': pai_info})
-    if pais_ids['mae']:
-        mae_info = buscar_nome_sobrenome_por_id(df, pais_ids['mae'])
-        pais.append({'ID': pais_ids['mae'], 'Nome Completo': mae_info})
 
-    imprimir_parentes(df, pessoa_id, pais, "Pais")
-    
-    # Filhos
-    filhos = buscar_filhos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos, "Filhos")
-
-    # Irmãos
-    irmaos = buscar_irmaos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, irmaos, "Irmãos")
-    
-    # Sobrinhos
-    sobrinhos = buscar_sobrinhos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, sobrinhos, "Sobrinhos")
-    
-    # Avós
-    avos = buscar_avos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, avos, "Avós")
-    
-    # Tios
-    tios = buscar_tios(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tios, "Tios")
-    
-   # Primos de primeiro grau
-    primos_primeiro_grau = buscar_primos_primeiro_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_primeiro_grau, "Primos de Primeiro Grau")
-    
-     # Filhos dos primos de primeiro grau
-    filhos_dos_primos = buscar_filhos_dos_primos_primeiro_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos_dos_primos, "Filhos dos Primos de 1º Grau")
-    
-    # Bisavós
-    bisavos = buscar_bisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, bisavos, "Bisavós")
-    
-    # Tios-avós
-    tios_avos = buscar_tios_avos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tios_avos, "Tios-avós")
-    
-    # Primo(a) de 1º grau do pai/da mãe
-    primos_primeiro_grau_pais = buscar_primos_primeiro_grau_dos_pais(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_primeiro_grau_pais, "Primo(a) de 1º Grau do pai/da mãe")
-    
-    # Primo(a) de 2º grau
-    primos_segundo_grau = buscar_primos_segundo_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_segundo_grau, "Primo(a) de 2º Grau")
-    
-    # Filho(a) do(a) primo(a) de 2º grau
-    filhos_primos_segundo_grau = buscar_filhos_dos_primos_segundo_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos_primos_segundo_grau, "Filho(a) do(a) primo(a) de 2º grau")
-    
-    # Trisavós
-    trisavos = buscar_trisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, trisavos, "Trisavós")
-    
-    # Tio-bisavô/tia-bisavó
-    tios_bisavos = buscar_tios_bisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tios_bisavos, "Tio-bisavô/tia-bisavó")
-    
-    # Primo(a) de 1º grau do avô/da avó
-    primos_primeiro_grau_avos = buscar_primos_primeiro_grau_dos_avos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_primeiro_grau_avos, "Primo(a) de 1º grau do avô/da avó")
-    
-    # Primo(a) de 2º grau do pai/da mãe
-    primos_segundo_grau_pais = buscar_primos_segundo_grau_dos_pais(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_segundo_grau_pais, "Primo(a) de 2º grau do pai/da mãe")
-    
-    # Primo(a) de 3º grau
-    primos_terceiro_grau = buscar_primos_terceiro_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_terceiro_grau, "Primo(a) de 3º grau")
-    
-    # Filho(a) do(a) primo(a) de 3º grau
-    filhos_primos_terceiro_grau = buscar_filhos_dos_primos_terceiro_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos_primos_terceiro_grau, "Filho(a) do(a) primo(a) de 3º grau")
-    
-    # Tetravós
-    tetravos = buscar_tetravos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tetravos, "Tetravós")
-    
-    # Tio-trisavô/Tia-trisavó
-    tios_trisavos = buscar_tios_trisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tios_trisavos, "Tio-trisavô/Tia-trisavó")
-    
-    # Primo(a) de 1º grau do bisavô/da bisavó
-    primos_primeiro_grau_bisavos = buscar_primos_primeiro_grau_dos_bisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_primeiro_grau_bisavos, "Primo(a) de 1º grau do bisavô/da bisavó")
-    
-    # Primo(a) de 2º grau do avô/da avó
-    primos_segundo_grau_avos = buscar_primos_segundo_grau_dos_avos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_segundo_grau_avos, "Primo(a) de 2º grau do avô/da avó")
-    
-    # Primo(a) de 3º grau do pai/da mãe
-    primos_terceiro_grau_pais = buscar_primos_terceiro_grau_dos_pais(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_terceiro_grau_pais, "Primo(a) de 3º grau do pai/da mãe")
-    
-    # Primos de 4º Grau
-    primos_quarto_grau = buscar_primos_quarto_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_quarto_grau, "Primos de 4º Grau")
-    
-    # Filhos dos Primos de 4º Grau
-    filhos_primos_quarto_grau = buscar_filhos_dos_primos_quarto_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos_primos_quarto_grau, "Filhos dos Primos de 4º Grau")
-    
-    # Pentavós
-    pentavos = buscar_pentavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, pentavos, "Pentavós")
-    
-    # Tio-tetravô/Tia-tetravó
-    tios_tetravos = buscar_tios_tetravos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, tios_tetravos, "Tio-tetravô/Tia-tetravó")
-    
-    # Primos de 1º Grau do Trisavô/da Trisavó
-    primos_primeiro_grau_trisavos = buscar_primos_primeiro_grau_dos_trisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_primeiro_grau_trisavos, "Primos de 1º Grau do Trisavô/da Trisavó")
-    
-    # Primos de 2º Grau do Bisavô/da Bisavó
-    primos_segundo_grau_bisavos = buscar_primos_segundo_grau_dos_bisavos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_segundo_grau_bisavos, "Primos de 2º Grau do Bisavô/da Bisavó")
-    
-    # Primos de 3º Grau do Avô/da Avó
-    primos_terceiro_grau_avos = buscar_primos_terceiro_grau_dos_avos(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_terceiro_grau_avos, "Primos de 3º Grau do Avô/da Avó")
-    
-    # Primos de 4º Grau do Pai/da Mãe
-    primos_quarto_grau_pais = buscar_primos_quarto_grau_dos_pais(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_quarto_grau_pais, "Primos de 4º Grau do Pai/da Mãe")
-    
-    # Primos de 5º Grau
-    primos_quinto_grau = buscar_primos_quinto_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, primos_quinto_grau, "Primos de 5º Grau")
-    
-    # Filhos dos Primos de 5º Grau
-    filhos_primos_quinto_grau = buscar_filhos_dos_primos_quinto_grau(df, pessoa_id)
-    imprimir_parentes(df, pessoa_id, filhos_primos_quinto_grau, "Filhos dos Primos de 5º Grau")   
+    for categoria, parentes in familia_extensa(df, pessoa_id).items():
+        print(f"\n{categoria} de {nome_completo}:")
+        if parentes:
+            for parente in parentes:
+                print(f"  ID: {parente.id}, Nome: {parente.nome}, Identificador: {parente.identificador}")
+        else:
+            print("  Nenhum parente encontrado na categoria.")
     
 # ------------------------------------------------------------------------------------------------------------------------------------------    
 
@@ -1035,18 +1039,16 @@ def imprimir_parentes(df, pessoa_id, parentes, parentesco):
                     for parente in lista_parentes:
                         id_int = parente.get('ID')
                         nome_parente = buscar_nome_sobrenome_por_id(df, id_int) if id_int else "Desconhecido"
-                        identificador = (
-                            df.at[id_int, 'Identificador'] if id_int in df.index else "Desconhecido"
-                        )
+                        identificador = buscar_identificador_por_id(df, id_int)
                         print(f"  ID: {id_int}, Nome: {nome_parente}, Identificador: {identificador}")
                 else:
                     print("  Nenhum encontrado")
         else:
             # Trata dicionários onde os valores são IDs diretamente (como para avós)
             for categoria, id_int in parentes.items():
-                if id_int and id_int in df.index:
+                if id_int and id_valido(df, id_int):
                     nome_parente = buscar_nome_sobrenome_por_id(df, id_int)
-                    identificador = df.at[id_int, 'Identificador']
+                    identificador = buscar_identificador_por_id(df, id_int)
                     print(f"  {categoria}: ID {id_int}, Nome: {nome_parente}, Identificador: {identificador}")
                 else:
                     print(f"  {categoria}: Nenhum encontrado")
@@ -1054,15 +1056,14 @@ def imprimir_parentes(df, pessoa_id, parentes, parentesco):
         for parente in parentes:
             id_int = parente.get('ID')
             nome_parente = buscar_nome_sobrenome_por_id(df, id_int) if id_int else "Desconhecido"
-            identificador = (
-                df.at[id_int, 'Identificador'] if id_int in df.index else "Desconhecido"
-            )
+            identificador = buscar_identificador_por_id(df, id_int)
             print(f"  ID: {id_int}, Nome: {nome_parente}, Identificador: {identificador}")
     else:
         print("  Nenhum parente encontrado na categoria.")
 
 # ------------------------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def encontrar_parentesco_direto(df, id1, id2):
     # Função auxiliar para criar o dicionário de parentesco
     def criar_dicionario_parentesco(id):
@@ -1112,6 +1113,7 @@ def encontrar_parentesco_direto(df, id1, id2):
 # ------------------------------------------------------------------------------------------------------------------------------------------
 
 # Definindo a função que busca identificar o parentesco específico entre os IDs
+@medido("computacao")
 def buscar_id_no_dicionario(dicionario, id_procurado):
     for chave, valor in dicionario.items():
         if isinstance(valor, dict):  # Verifica se o valor é um dicionário
@@ -1126,6 +1128,232 @@ def buscar_id_no_dicionario(dicionario, id_procurado):
 
 # ------------------------------------------------------------------------------------------------------------------------------------------
 
+# Categorias do dicionário de parentesco, indexadas por (gerações acima, gerações abaixo)
+CATEGORIAS_PARENTESCO = {
+    (1, 0): 'Pai/Mãe',
+    (0, 1): 'filho(a)',
+    (1, 1): 'irmão(a)',
+    (1, 2): 'sobrinho(a)',
+    (2, 0): 'avô(ó)',
+    (2, 1): 'tio(a)',
+    (2, 2): 'primo(a) 1º Grau',
+    (2, 3): 'filho(a) do(a) primo(a) de 1º grau',
+    (3, 0): 'bisavo(a)',
+    (3, 1): 'Tio-Avô/Tia-Avó',
+    (3, 2): 'Primos de 1º Grau dos Pais',
+    (3, 3): 'Primos de 2º Grau',
+    (3, 4): 'Filhos dos Primos de 2º Grau',
+    (4, 0): 'Trisavós',
+    (4, 1): 'Tio-bisavô/tia-bisavó',
+    (4, 2): 'Primos de 1º Grau do Avô/da Avó',
+    (4, 3): 'Primos de 2º Grau do Pai/da Mãe',
+    (4, 4): 'Primos de 3º Grau',
+    (4, 5): 'Filhos dos Primos de 3º Grau',
+    (5, 0): 'Tetravós',
+    (5, 1): 'Tio-trisavô/Tia-trisavó',
+    (5, 2): 'Primos de 1º Grau do Bisavô/da Bisavó',
+    (5, 3): 'Primos de 2º Grau do Avô/da Avó',
+    (5, 4): 'Primos de 3º Grau do Pai/da Mãe',
+    (5, 5): 'Primos de 4º Grau',
+    (5, 6): 'Filhos dos Primos de 4º Grau',
+    (6, 0): 'Pentavós',
+    (6, 1): 'Tio-tetravô/Tia-tetravó',
+    (6, 2): 'Primos de 1º Grau do Trisavô/da Trisavó',
+    (6, 3): 'Primos de 2º Grau do Bisavô/da Bisavó',
+    (6, 4): 'Primos de 3º Grau do Avô/da Avó',
+    (6, 5): 'Primos de 4º Grau do Pai/da Mãe',
+    (6, 6): 'Primos de 5º Grau',
+    (6, 7): 'Filhos dos Primos de 5º Grau',
+}
+
+# Primeira subida (tios-bisavós) em que os ramos colaterais deixam de fora a linha direta da mesma geração
+SUBIDA_EXCLUSAO_LINHA_DIRETA = 4
+
+
+def termo_parentesco(subida, descida):
+    """
+    Retorna o nome do parentesco para um par (gerações acima, gerações abaixo) até o ancestral comum.
+    Usa as categorias existentes quando possível e um termo genérico para as demais.
+    """
+    if (subida, descida) in CATEGORIAS_PARENTESCO:
+        return CATEGORIAS_PARENTESCO[(subida, descida)]
+    if subida == 0 and descida == 0:
+        return "a própria pessoa"
+    if descida == 0:
+        return f"Antepassado(a) de {subida}ª geração"
+    if subida == 0:
+        return f"Descendente de {descida}ª geração"
+    if descida == 1:
+        return f"Irmão(ã) do(a) antepassado(a) de {subida - 1}ª geração"
+    if subida == 1:
+        return f"Descendente de {descida - 1}ª geração do(a) irmão(ã)"
+
+    grau_primo = min(subida, descida) - 1
+    if subida == descida:
+        return f"Primo(a) de {grau_primo}º Grau"
+    if subida > descida:
+        return f"Primo(a) de {grau_primo}º Grau do(a) antepassado(a) de {subida - descida}ª geração"
+    return f"Descendente de {descida - subida}ª geração do(a) primo(a) de {grau_primo}º Grau"
+
+
+@medido("computacao")
+def calcular_camadas_parentesco(df, pessoa_id, max_subida=6, descida_extra=1):
+    """
+    Percorre uma única vez os antepassados de uma pessoa (até max_subida gerações) e desce uma
+    única vez por cada ramo colateral, rotulando cada parente com o par (gerações acima, gerações abaixo).
+    Em cada geração acima, desce até descida_extra gerações além da geração da pessoa.
+    Retorna um dicionário {(subida, descida): [IDs]}.
+    """
+    indice = obter_familia_index(df)
+    camadas = {}
+
+    # Filhos da própria pessoa
+    camadas[(0, 1)] = [filho_id for filho_id in indice.filhos(pessoa_id) if filho_id != pessoa_id]
+
+    # Linha direta: cada geração é formada pelos pais (presentes no índice) da geração anterior
+    linha_direta = [[pessoa_id] if pessoa_id in indice else []]
+    for subida in range(1, max_subida + 1):
+        geracao = {}
+        for parente_id in linha_direta[-1]:
+            for pai_ou_mae in indice.pais(parente_id):
+                if pai_ou_mae is not None:
+                    geracao[pai_ou_mae] = None
+        linha_direta.append(list(geracao))
+        camadas[(subida, 0)] = linha_direta[subida]
+
+    # Ramos colaterais: irmãos de cada membro da linha direta, descendo geração a geração.
+    # Em árvores com colapso de pedigree, as regras são as das funções buscar_*: até os tios-avós e seus
+    # descendentes, um parente entra em todas as categorias em que se encaixa (um avô pode ser também
+    # tio-avô); a partir dos tios-bisavós, quem já é da linha direta na mesma geração não entra no ramo.
+    # A própria pessoa nunca aparece nas listas, mas os ramos continuam descendo por ela.
+    linha_por_geracao = [set(geracao) for geracao in linha_direta]
+    linha_por_geracao[0] = set()  # Só a linha acima da pessoa fica fora dos ramos
+    for subida in range(1, max_subida + 1):
+        excluir_linha = subida >= SUBIDA_EXCLUSAO_LINHA_DIRETA
+        excluidos = linha_por_geracao[subida - 1] if excluir_linha else ()
+        ramo = {}
+        for parente_id in linha_direta[subida - 1]:
+            for irmao_id in indice.irmaos(parente_id):
+                if irmao_id not in excluidos:
+                    ramo[irmao_id] = None
+        camadas[(subida, 1)] = [parente_id for parente_id in ramo if parente_id != pessoa_id]
+
+        for descida in range(2, subida + descida_extra + 1):
+            excluidos = linha_por_geracao[subida - descida] if excluir_linha and subida >= descida else ()
+            proxima = {}
+            for parente_id in ramo:
+                for filho_id in indice.filhos(parente_id):
+                    if filho_id not in excluidos:
+                        proxima[filho_id] = None
+            ramo = proxima
+            camadas[(subida, descida)] = [parente_id for parente_id in ramo if parente_id != pessoa_id]
+
+    return camadas
+
+
+@medido("computacao")
+def criar_dicionario_parentesco(df, pessoa_id):
+    """
+    Monta o dicionário com as 34 categorias de parentesco de encontrar_parentesco_direto
+    a partir de uma única travessia (calcular_camadas_parentesco).
+    """
+    indice = obter_familia_index(df)
+    camadas = calcular_camadas_parentesco(indice, pessoa_id)
+
+    def registros(ids):
+        return [{'ID': parente_id, 'Nome Completo': indice.nome_completo(parente_id)} for parente_id in ids]
+
+    dicionario = {}
+    for (subida, descida), categoria in CATEGORIAS_PARENTESCO.items():
+        if (subida, descida) == (1, 0):
+            dicionario[categoria] = buscar_pais(indice, pessoa_id)
+        elif (subida, descida) == (2, 0):
+            dicionario[categoria] = buscar_avos(indice, pessoa_id)
+        else:
+            dicionario[categoria] = registros(camadas.get((subida, descida), []))
+    return dicionario
+
+
+@medido("computacao")
+def encontrar_parentesco_por_camadas(df, id1, id2):
+    """Equivalente a encontrar_parentesco_direto, usando o motor de camadas de parentesco."""
+    return criar_dicionario_parentesco(df, id1), criar_dicionario_parentesco(df, id2)
+
+
+@medido("computacao")
+def resolver_parentesco(df, id1, id2, max_geracoes=15):
+    """
+    Responde "o que id2 é de id1" encontrando os ancestrais comuns mais próximos com uma
+    busca em largura bidirecional e limitada pelo grafo de pais, sem montar os dicionários de parentesco.
+
+    Retorna um dicionário com o parentesco, as gerações acima/abaixo até o ancestral comum,
+    os ancestrais comuns e o caminho (id1 -> ancestral comum -> id2), ou None se não houver
+    parentesco consanguíneo dentro de max_geracoes.
+    """
+    indice = obter_familia_index(df)
+    if id1 not in indice or id2 not in indice:
+        return None
+
+    distancia = ({id1: 0}, {id2: 0})
+    origem = ({id1: None}, {id2: None})  # Filho pelo qual cada ancestral foi alcançado
+    fronteira = ([id1], [id2])
+    nivel = [0, 0]
+    melhor_soma = 0 if id1 == id2 else None
+
+    while True:
+        # Depois do primeiro encontro, só vale expandir enquanto um encontro mais próximo for possível
+        limite = max_geracoes if melhor_soma is None else min(max_geracoes, melhor_soma - 1)
+        lados = [lado for lado in (0, 1) if fronteira[lado] and nivel[lado] < limite]
+        if not lados:
+            break
+        lado = min(lados, key=lambda lado: len(fronteira[lado]))  # Expande a menor fronteira
+        outro = 1 - lado
+        nivel[lado] += 1
+
+        nova_fronteira = []
+        for parente_id in fronteira[lado]:
+            for pai_ou_mae in indice.pais(parente_id):
+                if pai_ou_mae is None or pai_ou_mae in distancia[lado]:
+                    continue
+                distancia[lado][pai_ou_mae] = nivel[lado]
+                origem[lado][pai_ou_mae] = parente_id
+                nova_fronteira.append(pai_ou_mae)
+                if pai_ou_mae in distancia[outro]:
+                    soma = nivel[lado] + distancia[outro][pai_ou_mae]
+                    if melhor_soma is None or soma < melhor_soma:
+                        melhor_soma = soma
+        fronteira[lado][:] = nova_fronteira
+
+    # Agrupa os ancestrais comuns pelo par (gerações acima, gerações abaixo) e fica com o mais
+    # próximo (menor soma, depois menor subida)
+    pares = {}
+    for ancestral_id in distancia[0].keys() & distancia[1].keys():
+        pares.setdefault((distancia[0][ancestral_id], distancia[1][ancestral_id]), []).append(ancestral_id)
+    if not pares:
+        return None
+    subida, descida = min(pares, key=lambda par: (par[0] + par[1], par[0]))
+    ancestrais_comuns = sorted(pares[(subida, descida)])
+
+    def caminho_ate(lado, ancestral_id):
+        caminho = [ancestral_id]
+        while origem[lado][caminho[-1]] is not None:
+            caminho.append(origem[lado][caminho[-1]])
+        return caminho
+
+    ancestral_id = ancestrais_comuns[0]
+    caminho = caminho_ate(0, ancestral_id)[::-1] + caminho_ate(1, ancestral_id)[1:]
+
+    return {
+        'parentesco': termo_parentesco(subida, descida),
+        'subida': subida,
+        'descida': descida,
+        'ancestrais_comuns': ancestrais_comuns,
+        'caminho': caminho,
+        'meio_parentesco': subida > 0 and descida > 0 and len(ancestrais_comuns) == 1,
+    }
+
+# ------------------------------------------------------------------------------------------------------------------------------------------
+
 # def coletar_todos_antepassados(df, pessoa_id, atual_geracao=0, antepassados=None, visitados=None):
 #     """
 #     Coleta todos os antepassados de uma pessoa com base no ID fornecido.
@@ -1161,20 +1389,72 @@ def buscar_id_no_dicionario(dicionario, id_procurado):
 
 #     return antepassados
 
-def coletar_todos_antepassados(df, pessoa_id, atual_geracao=1, antepassados=None):
-    if antepassados is None:
-        antepassados = {}
+@medido("computacao")
+def coletar_todos_antepassados(df, pessoa_id):
+    """
+    Retorna {ID do antepassado: geração} com a menor geração em que cada antepassado aparece (1 = pais).
+    O fecho é calculado de forma iterativa, sem repetir ramos compartilhados, e fica memorizado
+    no FamilyIndex enquanto o conjunto de dados estiver carregado.
+    """
+    ids, geracoes, _ = obter_familia_index(df).fechamento_antepassados(pessoa_id)
+    return dict(zip(ids.tolist(), geracoes.tolist()))
+
+
+@medido("computacao")
+def coletar_antepassados_com_caminhos(df, pessoa_id):
+    """Retorna {ID do antepassado: (menor geração, número de caminhos até ele)}."""
+    ids, geracoes, caminhos = obter_familia_index(df).fechamento_antepassados(pessoa_id)
+    return {antepassado: (geracao, total) for antepassado, geracao, total
+            in zip(ids.tolist(), geracoes.tolist(), caminhos.tolist())}
 
-    # Busca os pais da pessoa
-    pais = buscar_pais(df, pessoa_id)
-    for pai in pais.values():
-        # Verifica se 'pai' é um inteiro e maior que zero
-        if pai is not None and pai > 0:  # Ignora IDs inválidos e None
-            antepassados[pai] = atual_geracao
-            # Recursivamente busca os antepassados do pai/mãe
-            coletar_todos_antepassados(df, pai, atual_geracao + 1, antepassados)
 
-    return antepassados
+@medido("computacao")
+def agrupar_descendentes_por_ancestral(df, ids_lista, id_especifico=None):
+    """
+    Agrupa os IDs da lista pelos antepassados que eles compartilham, usando a matriz de antepassados.
+    Com id_especifico, considera apenas os antepassados dele (e o retira da lista).
+    Retorna [(ancestral_id, [(pessoa_id, geração), ...]), ...], do ancestral com mais descendentes
+    para o com menos (empate pelo menor ID).
+    """
+    if id_especifico:
+        ids_lista = [id_ for id_ in ids_lista if id_ != id_especifico]
+    matriz = obter_matriz_antepassados(df, ids_lista)
+    pertinencia = matriz.pertinencia(restringir_a=id_especifico or None)
+
+    colunas = np.flatnonzero(pertinencia.any(axis=0))
+    contagem = pertinencia[:, colunas].sum(axis=0)
+    colunas = colunas[np.lexsort((matriz.antepassados[colunas], -contagem))]
+
+    geracoes_por_pessoa = {pessoa_id: coletar_todos_antepassados(df, pessoa_id) for pessoa_id in matriz.pessoas}
+    grupos = []
+    for coluna in colunas.tolist():
+        ancestral_id = int(matriz.antepassados[coluna])
+        descendentes = [(matriz.pessoas[linha], geracoes_por_pessoa[matriz.pessoas[linha]][ancestral_id])
+                        for linha in np.flatnonzero(pertinencia[:, coluna]).tolist()]
+        grupos.append((ancestral_id, descendentes))
+    return grupos
+
+
+@medido("computacao")
+def encontrar_primeiros_ancestrais_comuns(df, id_referencia, ids_lista):
+    """
+    Para cada ID da lista, encontra o ancestral comum mais próximo do ID de referência
+    (menor geração em relação à referência, depois em relação à pessoa, depois menor ID).
+    Retorna {pessoa_id: (ancestral_id, geração na referência, geração na pessoa)}.
+    """
+    matriz = obter_matriz_antepassados(df, ids_lista)
+    pertinencia = matriz.pertinencia(restringir_a=id_referencia)
+
+    resultado = {}
+    for linha, pessoa_id in enumerate(matriz.pessoas):
+        ancestrais = matriz.antepassados[pertinencia[linha]]
+        if not len(ancestrais):
+            continue
+        geracoes_referencia = matriz.geracoes(id_referencia, ancestrais)
+        geracoes_pessoa = matriz.geracoes(pessoa_id, ancestrais)
+        k = np.lexsort((ancestrais, geracoes_pessoa, geracoes_referencia))[0]
+        resultado[pessoa_id] = (int(ancestrais[k]), int(geracoes_referencia[k]), int(geracoes_pessoa[k]))
+    return resultado
 
 # ----------------------------------------------------------------------------------------------------------------------------------------
 
@@ -1193,6 +1473,7 @@ def geracao_para_termo(geracao):
 
 # -------------------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def exibir_antepassados_comuns_e_parentesco(df, id1, id2):
     antepassados_id1 = coletar_todos_antepassados(df, id1)
     antepassados_id2 = coletar_todos_antepassados(df, id2)
@@ -1214,6 +1495,7 @@ def exibir_antepassados_comuns_e_parentesco(df, id1, id2):
 
 # ------------------------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_por_nome_ou_sobrenome(df, texto_procurado, colunas_selecionadas):
     """
     Filtra o DataFrame para encontrar linhas onde o nome completo ou identificador contenha o texto procurado,
@@ -1244,6 +1526,7 @@ def buscar_por_nome_ou_sobrenome(df, texto_procurado, colunas_selecionadas):
             resultados = filtros.pop()  # Inicia com o primeiro filtro
             for filtro in filtros:
                 resultados |= filtro  # Combina filtros com OR
+            registrar_varredura(len(df))
 
             # Retorna apenas as colunas selecionadas, se forem válidas
             if colunas_selecionadas:
@@ -1256,6 +1539,7 @@ def buscar_por_nome_ou_sobrenome(df, texto_procurado, colunas_selecionadas):
 
 # -----------------------------------------------------------------------------------------------------------------------------
 
+@medido("pdf")
 def wrap_text(text, width, font_size, pdf_canvas):
     """
     Quebra o texto em linhas com base na largura especificada.
@@ -1264,6 +1548,7 @@ def wrap_text(text, width, font_size, pdf_canvas):
     return lines
 
 
+@medido("pdf")
 def exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, retornar_texto=False):
     """
     Exibe apenas o primeiro ancestral comum mais próximo entre o ID de referência e os IDs fornecidos,
@@ -1346,26 +1631,80 @@ def exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, retor
     return output_pdf
 
 
-def criar_relatorios_para_ids(df, ids_referencia, ids_lista):
+def nome_arquivo_relatorio(df, id_referencia):
+    """Nome do arquivo PDF do relatório de ancestrais comuns de uma referência (único por ID)."""
+    nome_referencia = buscar_nome_sobrenome_por_id(df, id_referencia)
+    return f"Relatorio_Ancestrais_Comuns_{nome_referencia.replace(' ', '_')}_{id_referencia}.pdf"
+
+
+@medido("pdf")
+def gerar_relatorio_pdf_bytes(df, id_referencia, ids_lista):
+    """Gera em memória o PDF de ancestrais comuns de uma referência; retorna (nome do arquivo, bytes)."""
+    buffer = BytesIO()
+    exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, output_buffer=buffer)
+    return nome_arquivo_relatorio(df, id_referencia), buffer.getvalue()
+
+
+# Dados do lote em andamento, herdados pelos processos filhos via fork (copy-on-write, sem pickle)
+_lote_df = None
+_lote_ids_lista = None
+
+
+def _gerar_relatorio_lote(id_referencia):
+    """Executado em um processo do lote: gera o PDF de uma referência com os dados herdados do processo pai."""
+    return gerar_relatorio_pdf_bytes(_lote_df, id_referencia, _lote_ids_lista)
+
+
+@medido("pdf")
+def criar_relatorios_para_ids(df, ids_referencia, ids_lista, destino="Relatorios_Ancestrais.zip", max_workers=None, progresso=None):
     """
-    Gera relatórios em PDF para cada ID de referência fornecido, comparando com a lista de IDs.
-    Compacta os arquivos gerados em um único arquivo zip.
+    Gera relatórios em PDF para cada ID de referência fornecido, comparando com a lista de IDs,
+    e grava cada PDF diretamente no zip, sem arquivos temporários. `destino` pode ser um caminho
+    ou um arquivo binário aberto (por exemplo, um BytesIO).
+
+    Os antepassados de todas as pessoas são calculados uma única vez antes de dividir o trabalho.
+    As referências são distribuídas entre processos criados por fork, que herdam o DataFrame e os
+    índices já construídos; onde fork não existe, ou com max_workers=1, a geração é em série.
+    Dentro do servidor do Streamlit (multi-thread) use max_workers=1.
+    `progresso(concluidos, total)` é chamado a cada relatório gravado. Retorna o destino.
     """
-    pdf_files = []
-    for id_referencia in ids_referencia:
-        print(f"Gerando relatório para ID de referência: {id_referencia}...")
-        pdf_file = exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista)
-        pdf_files.append(pdf_file)
-        print(f"Relatório para ID {id_referencia} gerado com sucesso!")
-
-    # Compactar todos os arquivos PDF em um único arquivo zip
-    zip_file_name = "Relatorios_Ancestrais.zip"
-    with zipfile.ZipFile(zip_file_name, 'w') as zipf:
-        for pdf in pdf_files:
-            zipf.write(pdf)
-            os.remove(pdf)  # Opcional: remove o arquivo PDF após compactar
-
-    print(f"Arquivos compactados em: {zip_file_name}")
+    global _lote_df, _lote_ids_lista
+    ids_referencia = list(dict.fromkeys(ids_referencia))
+    total = len(ids_referencia)
+
+    # Fechamentos de antepassados e matriz da lista, compartilhados por todas as referências
+    indice = obter_familia_index(df)
+    for pessoa_id in set(ids_referencia) | set(ids_lista):
+        indice.fechamento_antepassados(pessoa_id)
+    obter_matriz_antepassados(df, ids_lista)
+
+    usar_processos = (
+        total > 1
+        and (max_workers is None or max_workers > 1)
+        and "fork" in multiprocessing.get_all_start_methods()
+    )
+
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+        executor = None
+        if usar_processos:
+            _lote_df, _lote_ids_lista = df, ids_lista
+            processos = min(max_workers or os.cpu_count() or 1, total)
+            executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("fork"))
+            resultados = executor.map(_gerar_relatorio_lote, ids_referencia, chunksize=max(1, total // (processos * 4)))
+        else:
+            resultados = (gerar_relatorio_pdf_bytes(df, id_referencia, ids_lista) for id_referencia in ids_referencia)
+
+        try:
+            for concluidos, (nome_arquivo, conteudo) in enumerate(resultados, start=1):
+                zipf.writestr(nome_arquivo, conteudo)
+                if progresso:
+                    progresso(concluidos, total)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+                _lote_df = _lote_ids_lista = None
+
+    return destino
 
 # Exemplo de uso:
 ids_referencia = [100, 180, 535, 548, 657, 712, 874, 934, 996, 997, 1500, 1541, 1994, 2132, 2526, 2868, 2920, 
@@ -1396,6 +1735,7 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.utils import simpleSplit
 from collections import defaultdict
 
+@medido("pdf")
 def wrap_text(text, width, font_size, pdf_canvas):
     """
     Quebra o texto em linhas com base na largura especificada.
@@ -1406,36 +1746,318 @@ def wrap_text(text, width, font_size, pdf_canvas):
 
 # ------------------------------------------------------------------------------------------
 
+def campo_busca_pessoa(familia_df, metodo_busca, rotulo, key=None, placeholder=None):
+    """
+    Campo de busca de uma pessoa. Para "Nome Completo", lista logo abaixo os candidatos mais
+    próximos (sem acentos, por prefixo e aproximados) e retorna o ID escolhido; para "Identificador",
+    faz o mesmo quando o Identificador aparece em mais de um registro. Nos demais casos, retorna o
+    texto digitado.
+    """
+    termo_busca = st.text_input(rotulo, key=key, placeholder=placeholder)
+    if not termo_busca.strip():
+        return termo_busca
+
+    indice = obter_familia_index(familia_df)
+    if metodo_busca == "Nome Completo":
+        candidatos = [(pessoa_id, nome) for pessoa_id, nome, _ in obter_indice_nomes(familia_df).candidatos(termo_busca)]
+    elif metodo_busca == "Identificador":
+        candidatos = [(pessoa_id, indice.nome_completo(pessoa_id))
+                      for pessoa_id in obter_mapa_identificadores(familia_df).ids(termo_busca)]
+        if len(candidatos) < 2:
+            return termo_busca
+        st.caption(f"O Identificador {termo_busca.strip().upper()} aparece em {len(candidatos)} registros da árvore.")
+    else:
+        return termo_busca
+    if not candidatos:
+        return termo_busca
+
+    opcoes = {
+        f"{nome} (ID: {pessoa_id} | Identificador: {indice.obter_identificador(pessoa_id)})": pessoa_id
+        for pessoa_id, nome in candidatos
+    }
+    escolha = st.selectbox(
+        "Pessoa:", list(opcoes), key=f"{key}_candidatos" if key else None, label_visibility="collapsed"
+    )
+    return opcoes[escolha]
+
+
+@medido("computacao")
 def obter_id_por_metodo(metodo_busca, termo_busca, familia_df, st):
     """
     Busca o ID baseado no método selecionado e no termo de busca.
+    Aceita também um ID já resolvido (por exemplo, o escolhido em campo_busca_pessoa). Um Identificador
+    presente em mais de um registro interrompe a execução, listando os registros para o usuário escolher.
     """
+    if isinstance(termo_busca, (int, np.integer)):
+        return int(termo_busca)
     if metodo_busca == "ID":
         return int(termo_busca)
     elif metodo_busca == "Identificador":
-        filtro = familia_df["Identificador"] == termo_busca
-        if filtro.any():
-            return familia_df[filtro].index[0]
-        else:
+        ids = obter_mapa_identificadores(familia_df).ids(termo_busca)
+        if not ids:
             st.warning(f"Nenhuma correspondência encontrada para o Identificador '{termo_busca}'.")
             st.stop()
+        if len(ids) > 1:
+            # Chamada dentro de um botão: uma caixa de seleção aqui sumiria na execução seguinte, então a
+            # escolha é feita pelo usuário, buscando pelo ID de um dos registros listados
+            indice = obter_familia_index(familia_df)
+            registros = "\n".join(f"- {indice.nome_completo(pessoa_id)} (ID: {pessoa_id})" for pessoa_id in ids)
+            st.warning(
+                f"O Identificador '{termo_busca}' aparece em {len(ids)} registros da árvore. "
+                f"Escolha um deles e busque pelo ID:\n\n{registros}"
+            )
+            st.stop()
+        return ids[0]
     elif metodo_busca == "Nome Completo":
-        filtro = familia_df["Nome Completo"].str.contains(termo_busca, case=False, na=False)
-        if filtro.any():
-            return familia_df[filtro].index[0]
+        candidatos = obter_indice_nomes(familia_df).candidatos(termo_busca, limite=1)
+        if candidatos:
+            return candidatos[0][0]  # Candidato mais provável
         else:
             st.warning(f"Nenhuma correspondência encontrada para o Nome Completo '{termo_busca}'.")
             st.stop()
 
 # ------------------------------------------------------------------------------------------------------------------------------
 
+# Modelo dos relatórios de ancestrais comuns: calculado uma única vez por (tipo, referência, lista de IDs)
+# e consumido por todos os renderizadores (PDF, tabelas do Streamlit e texto).
+DescendenteRelatorio = namedtuple("DescendenteRelatorio", ["id", "nome", "identificador", "grau"])
+GrupoAncestral = namedtuple("GrupoAncestral", ["id", "nome", "identificador", "grau_referencia", "descendentes"])
+RelatorioAncestrais = namedtuple(
+    "RelatorioAncestrais", ["tipo", "id_referencia", "nome_referencia", "identificador_referencia", "grupos"]
+)
+
+# Quantidade de modelos de relatório guardados por conjunto de dados
+MAX_RELATORIOS = 64
+
+
+def cache_relatorios(df):
+    """Cache dos modelos de relatório do conjunto de dados (cada versão dos dados tem o seu)."""
+    return obter_cache(df, "relatorios", MAX_RELATORIOS)
+
+
+# Quantidade de PDFs de relatório guardados por conjunto de dados
+MAX_PDFS = 32
+
+
+def cache_pdfs(df):
+    """Cache dos PDFs de relatório já gerados, pela mesma chave de conteúdo dos modelos."""
+    return obter_cache(df, "pdfs", MAX_PDFS)
+
+
+@medido("pdf")
+def pdf_primeiros_ancestrais(df, id_referencia, ids_lista):
+    """
+    Bytes do PDF dos primeiros ancestrais comuns. Gerado só na primeira vez que é pedido
+    (por exemplo, no clique de download) e reaproveitado depois.
+    """
+    def gerar():
+        buffer = BytesIO()
+        exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, output_buffer=buffer)
+        return buffer.getvalue()
+
+    return cache_pdfs(df).obter(("primeiros", id_referencia, tuple(ids_lista)), gerar)
+
+
+@medido("pdf")
+def pdf_ancestrais_por_ocorrencia(df, ids_lista, id_especifico=None):
+    """
+    Bytes do PDF de ancestrais comuns por ocorrência. Gerado só na primeira vez que é pedido
+    e reaproveitado depois.
+    """
+    return cache_pdfs(df).obter(
+        ("ocorrencia", id_especifico, tuple(ids_lista)),
+        lambda: exibir_ancestrais_comuns_por_ocorrencia(df, ids_lista, id_especifico).getvalue(),
+    )
+
+
+def _descendente_relatorio(indice, pessoa_id, grau):
+    return DescendenteRelatorio(pessoa_id, indice.nome_completo(pessoa_id), buscar_identificador_por_id(indice.df, pessoa_id), grau)
+
+
+def _cabecalho_relatorio(df, id_referencia):
+    """Nome e Identificador da referência, como exibidos no título dos relatórios."""
+    if id_referencia is None:
+        return None, None
+    nome_referencia = df.loc[id_referencia, "Nome Completo"] if "Nome Completo" in df.columns else "Desconhecido"
+    return nome_referencia, buscar_identificador_por_id(df, id_referencia)
+
+
+@medido("computacao")
+def modelo_primeiros_ancestrais(df, id_referencia, ids_lista):
+    """
+    Modelo do relatório dos primeiros ancestrais comuns entre a referência e cada ID da lista:
+    um GrupoAncestral por ancestral, na ordem em que aparecem na lista, com o grau de cada descendente.
+    """
+    chave = ("primeiros", id_referencia, tuple(ids_lista))
+    return cache_relatorios(df).obter(chave, lambda: _calcular_modelo_primeiros_ancestrais(df, id_referencia, ids_lista))
+
+
+def _calcular_modelo_primeiros_ancestrais(df, id_referencia, ids_lista):
+    indice = obter_familia_index(df)
+    antepassados_referencia = coletar_todos_antepassados(df, id_referencia)
+    primeiros_ancestrais = encontrar_primeiros_ancestrais_comuns(df, id_referencia, ids_lista)
+
+    descendentes_por_ancestral = {}
+    for pessoa_id in ids_lista:
+        if pessoa_id in primeiros_ancestrais:
+            ancestral_id, _, menor_grau_pessoa = primeiros_ancestrais[pessoa_id]
+            descendentes_por_ancestral.setdefault(ancestral_id, []).append(
+                _descendente_relatorio(indice, pessoa_id, menor_grau_pessoa)
+            )
+
+    grupos = tuple(
+        GrupoAncestral(
+            ancestral_id,
+            indice.nome_completo(ancestral_id),
+            buscar_identificador_por_id(df, ancestral_id),
+            antepassados_referencia.get(ancestral_id),
+            tuple(descendentes),
+        )
+        for ancestral_id, descendentes in descendentes_por_ancestral.items()
+    )
+    nome_referencia, identificador_referencia = _cabecalho_relatorio(df, id_referencia)
+    return RelatorioAncestrais("primeiros", id_referencia, nome_referencia, identificador_referencia, grupos)
+
+
+@medido("computacao")
+def modelo_ancestrais_por_ocorrencia(df, ids_lista, id_especifico=None):
+    """
+    Modelo do relatório de ancestrais comuns por ocorrência: os ancestrais compartilhados pelos IDs da
+    lista (ou pelo ID específico e os demais), do que tem mais descendentes ao que tem menos.
+    Sem ID específico, só entram ancestrais com mais de um descendente na lista.
+    """
+    chave = ("ocorrencia", id_especifico, tuple(ids_lista))
+    return cache_relatorios(df).obter(chave, lambda: _calcular_modelo_ancestrais_por_ocorrencia(df, ids_lista, id_especifico))
+
+
+def _calcular_modelo_ancestrais_por_ocorrencia(df, ids_lista, id_especifico):
+    indice = obter_familia_index(df)
+    antepassados_referencia = coletar_todos_antepassados(df, id_especifico) if id_especifico else {}
+
+    grupos = tuple(
+        GrupoAncestral(
+            ancestral_id,
+            indice.nome_completo(ancestral_id),
+            buscar_identificador_por_id(df, ancestral_id),
+            antepassados_referencia.get(ancestral_id),
+            tuple(_descendente_relatorio(indice, pessoa_id, grau) for pessoa_id, grau in descendentes),
+        )
+        for ancestral_id, descendentes in agrupar_descendentes_por_ancestral(df, ids_lista, id_especifico)
+        if len(descendentes) > 1 or id_especifico
+    )
+    nome_referencia, identificador_referencia = _cabecalho_relatorio(df, id_especifico)
+    return RelatorioAncestrais("ocorrencia", id_especifico, nome_referencia, identificador_referencia, grupos)
+
+
+@medido("computacao")
+def texto_relatorio_primeiros_ancestrais(modelo):
+    """Texto do relatório dos primeiros ancestrais comuns."""
+    texto_relatorio = f"Relatório de Ancestrais Comuns para:\n"
+    texto_relatorio += f"{modelo.nome_referencia} ( ID: {modelo.id_referencia} | Identificador: {modelo.identificador_referencia} )\n\n"
+
+    for grupo in modelo.grupos:
+        texto_relatorio += f"Ancestral Comum: {grupo.nome} ( ID: {grupo.id} | Identificador: {grupo.identificador} )\n"
+        if grupo.grau_referencia is not None:
+            texto_relatorio += f"Grau de parentesco com a referência: {geracao_para_termo(grupo.grau_referencia)}\n"
+        for desc in grupo.descendentes:
+            texto_relatorio += f"{desc.id}, {desc.nome}, {geracao_para_termo(desc.grau)}\n"
+        texto_relatorio += "\n"
+    return texto_relatorio
+
+
+@medido("computacao")
+def texto_relatorio_por_ocorrencia(modelo):
+    """Texto do relatório de ancestrais comuns por ocorrência."""
+    if modelo.id_referencia:
+        texto_relatorio = f"Relatório de Ancestrais Comuns para:\n"
+        texto_relatorio += f"{modelo.nome_referencia} ( ID: {modelo.id_referencia} | Identificador: {modelo.identificador_referencia} )\n\n"
+    else:
+        texto_relatorio = "Relatório de Ancestrais Comuns para Todos os IDs\n\n"
+
+    for grupo in modelo.grupos:
+        texto_relatorio += f"Ancestral Comum: {grupo.nome} ( ID: {grupo.id} | Identificador: {grupo.identificador} ) - Descendentes: {len(grupo.descendentes)}\n"
+        if grupo.grau_referencia is not None:
+            texto_relatorio += f"Parentesco com a referência: {geracao_para_termo(grupo.grau_referencia)}\n"
+        for desc in grupo.descendentes:
+            texto_relatorio += f"{desc.id}, {desc.identificador}, {desc.nome}, {geracao_para_termo(desc.grau)}\n"
+        texto_relatorio += "\n"
+
+    if not modelo.grupos:
+        texto_relatorio += "Nenhum ancestral comum encontrado entre os IDs fornecidos.\n"
+    return texto_relatorio
+
+
+# Espaçamento vertical padrão entre as linhas dos relatórios em PDF
+ENTRELINHA_PDF = 15
+
+
+class PaginacaoPDF:
+    """
+    Layout de um relatório em PDF calculado antes do desenho.
+    Cada página é uma lista de (y, fonte, tamanho, celulas), com celulas = ((x, texto), ...).
+    """
+
+    def __init__(self, altura=A4[1], margem=40):
+        self.altura = altura
+        self.margem = margem
+        self.paginas = [[]]
+        self.y = altura - margem
+
+    def nova_pagina(self):
+        self.paginas.append([])
+        self.y = self.altura - self.margem
+
+    def espaco(self, pontos):
+        self.y -= pontos
+
+    def reservar(self, pontos):
+        """Começa uma nova página se não houver `pontos` livres acima da margem inferior."""
+        if self.paginas[-1] and self.y - pontos < self.margem:
+            self.nova_pagina()
+
+    def linha(self, fonte, tamanho, celulas, entrelinha=ENTRELINHA_PDF, quebrar_pagina=False):
+        self.paginas[-1].append((self.y, fonte, tamanho, celulas))
+        self.y -= entrelinha
+        if quebrar_pagina and self.y < self.margem:
+            self.nova_pagina()
+
+
+@medido("pdf")
+def desenhar_paginacao(pdf, paginacao, entrelinha=ENTRELINHA_PDF):
+    """
+    Desenha uma PaginacaoPDF no canvas: em cada página, um único objeto de texto por coluna,
+    avançando com textLine nas linhas consecutivas em vez de um drawString por célula.
+    """
+    paginas = [pagina for pagina in paginacao.paginas if pagina]
+    for numero, pagina in enumerate(paginas):
+        if numero:
+            pdf.showPage()
+        colunas = defaultdict(list)
+        for y, fonte, tamanho, celulas in pagina:
+            for x, texto in celulas:
+                colunas[x].append((y, fonte, tamanho, texto))
+        for x, itens in colunas.items():
+            objeto_texto = pdf.beginText(x, itens[0][0])
+            fonte_atual = None
+            y_esperado = itens[0][0]
+            for y, fonte, tamanho, texto in itens:
+                if (fonte, tamanho) != fonte_atual:
+                    objeto_texto.setFont(fonte, tamanho, leading=entrelinha)
+                    fonte_atual = (fonte, tamanho)
+                if y != y_esperado:
+                    objeto_texto.setTextOrigin(x, y)
+                objeto_texto.textLine(texto)
+                y_esperado = y - entrelinha
+            pdf.drawText(objeto_texto)
+
+
+@medido("pdf")
 def exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, retornar_texto=False, output_buffer=None):
     """
     Gera relatório de ancestrais comuns em PDF e retorna o texto formatado.
     """
-    nome_referencia = df.loc[id_referencia, "Nome Completo"] if "Nome Completo" in df.columns else "Desconhecido"
-    identificador_referencia = df.loc[id_referencia, "Identificador"] if "Identificador" in df.columns else "Desconhecido"
-    output_pdf = f"Relatorio_Ancestrais_Comuns_{nome_referencia.replace(' ', '_')}.pdf"
+    modelo = modelo_primeiros_ancestrais(df, id_referencia, ids_lista)
+    output_pdf = f"Relatorio_Ancestrais_Comuns_{modelo.nome_referencia.replace(' ', '_')}.pdf"
 
     # Ajuste: Usar buffer se output_buffer for fornecido
     if output_buffer:
@@ -1444,114 +2066,57 @@ def exibir_antepassados_comuns_ordenados_pdf(df, id_referencia, ids_lista, retor
         pdf = canvas.Canvas(output_pdf, pagesize=A4)
 
     width, height = A4
-    text_y_position = height - 40
     max_line_width = width - 80
 
+    # Layout e paginação calculados antes de desenhar
+    paginacao = PaginacaoPDF(height)
+
     # Título do relatório
-    pdf.setFont("Helvetica-Bold", 14)
     titulo = f"Relatório dos Primeiros Ancestrais Comuns para:\n"
-    titulo += f"{nome_referencia} (ID: {id_referencia}, Identificador: {identificador_referencia})"
-    lines = wrap_text(titulo, max_line_width, 14, pdf)
-    for line in lines:
-        pdf.drawString(40, text_y_position, line)
-        text_y_position -= 20
+    titulo += f"{modelo.nome_referencia} (ID: {id_referencia}, Identificador: {modelo.identificador_referencia})"
+    for line in simpleSplit(titulo, "Helvetica-Bold", 14, max_line_width):
+        paginacao.linha("Helvetica-Bold", 14, ((40, line),), entrelinha=20)
 
-    text_y_position -= 20  # Espaço após o título
+    paginacao.espaco(20)  # Espaço após o título
 
-    ancestrais_agrupados = defaultdict(list)
+    # Colunas: ID, Identificador, Nome e Grau
+    col_id_x, col_identificador_x, col_nome_x, col_grau_x = 40, 100, 200, 430
 
-    # Coletar antepassados do ID de referência
-    antepassados_referencia = coletar_todos_antepassados(df, id_referencia)
+    for grupo in modelo.grupos:
+        texto_ancestral = f"Ancestral Comum: {grupo.nome} (ID: {grupo.id}, Identificador: {grupo.identificador})"
+        lines = simpleSplit(texto_ancestral, "Helvetica-Bold", 12, max_line_width)
+        com_grau = grupo.grau_referencia is not None
 
-    # Processar cada ID na lista
-    for pessoa_id in ids_lista:
-        antepassados_pessoa = coletar_todos_antepassados(df, pessoa_id)
-
-        ancestral_comum_mais_proximo = None
-        menor_grau_referencia = float('inf')
-        menor_grau_pessoa = float('inf')
-
-        for ancestral_id in antepassados_referencia.keys() & antepassados_pessoa.keys():
-            grau_referencia = antepassados_referencia[ancestral_id]
-            grau_pessoa = antepassados_pessoa[ancestral_id]
-
-            if (grau_referencia < menor_grau_referencia) or \
-               (grau_referencia == menor_grau_referencia and grau_pessoa < menor_grau_pessoa):
-                ancestral_comum_mais_proximo = ancestral_id
-                menor_grau_referencia = grau_referencia
-                menor_grau_pessoa = grau_pessoa
-
-        if ancestral_comum_mais_proximo:
-            nome_ancestral = buscar_nome_sobrenome_por_id(df, ancestral_comum_mais_proximo)
-            identificador_ancestral = df.at[ancestral_comum_mais_proximo, 'Identificador'] if 'Identificador' in df.columns else "Desconhecido"
-            ancestrais_agrupados[(ancestral_comum_mais_proximo, nome_ancestral, identificador_ancestral)].append({
-                'ID': pessoa_id,
-                'Nome': buscar_nome_sobrenome_por_id(df, pessoa_id),
-                'Grau': geracao_para_termo(menor_grau_pessoa)
-            })
-
-    pdf.setFont("Helvetica", 10)
-    for (ancestral_id, nome_ancestral, identificador_ancestral), descendentes in ancestrais_agrupados.items():
-        # Título do ancestral comum
-        pdf.setFont("Helvetica-Bold", 12)
-        texto_ancestral = f"Ancestral Comum: {nome_ancestral} (ID: {ancestral_id}, Identificador: {identificador_ancestral})"
-        lines = wrap_text(texto_ancestral, max_line_width, 12, pdf)
+        # Mantém o título do ancestral na mesma página que a primeira linha da tabela
+        paginacao.reservar(ENTRELINHA_PDF * (len(lines) + com_grau))
         for line in lines:
-            pdf.drawString(40, text_y_position, line)
-            text_y_position -= 15
+            paginacao.linha("Helvetica-Bold", 12, ((40, line),))
 
         # Grau de parentesco com a referência
-        grau_referencia = antepassados_referencia.get(ancestral_id, None)
-        if grau_referencia is not None:
-            grau_referencia_texto = geracao_para_termo(grau_referencia)
-            pdf.setFont("Helvetica-Oblique", 10)
-            pdf.drawString(40, text_y_position, f"Grau de parentesco com a referência: {grau_referencia_texto}")
-            text_y_position -= 15
-
-        pdf.setFont("Helvetica", 10)
-
-        # Definir larguras fixas para colunas
-        col_id_x = 40          # Posição inicial da coluna ID
-        col_identificador_x = 100  # Posição inicial da coluna Identificador
-        col_nome_x = 200       # Posição inicial da coluna Nome
-        col_grau_x = 430       # Posição inicial da coluna Grau
-        col_spacing = 15       # Espaçamento vertical entre linhas
-
-        for desc in descendentes:
-            identificador = df.at[desc['ID'], 'Identificador'] if 'Identificador' in df.columns else "Desconhecido"
-            pdf.drawString(col_id_x, text_y_position, f"{desc['ID']}")
-            pdf.drawString(col_identificador_x, text_y_position, f"{identificador}")
-            pdf.drawString(col_nome_x, text_y_position, f"{desc['Nome']}")
-            pdf.drawString(col_grau_x, text_y_position, f"{desc['Grau']}")
-            text_y_position -= col_spacing
-
-            if text_y_position < 40:  # Criar uma nova página se necessário
-                pdf.showPage()
-                pdf.setFont("Helvetica", 10)
-                text_y_position = height - 40
+        if com_grau:
+            grau_referencia_texto = geracao_para_termo(grupo.grau_referencia)
+            paginacao.linha("Helvetica-Oblique", 10, ((40, f"Grau de parentesco com a referência: {grau_referencia_texto}"),))
+
+        for desc in grupo.descendentes:
+            celulas = (
+                (col_id_x, f"{desc.id}"),
+                (col_identificador_x, f"{desc.identificador}"),
+                (col_nome_x, f"{desc.nome}"),
+                (col_grau_x, geracao_para_termo(desc.grau)),
+            )
+            paginacao.linha("Helvetica", 10, celulas, quebrar_pagina=True)
 
-        text_y_position -= 20  # Espaço após cada ancestral
+        paginacao.espaco(20)  # Espaço após cada ancestral
 
-    if not ancestrais_agrupados:
-        pdf.drawString(40, text_y_position, "Nenhum ancestral comum encontrado para os IDs fornecidos.")
+    if not modelo.grupos:
+        paginacao.linha("Helvetica", 10, ((40, "Nenhum ancestral comum encontrado para os IDs fornecidos."),))
 
+    desenhar_paginacao(pdf, paginacao)
     pdf.save()
 
     if retornar_texto:
         # Retornar o texto formatado para exibição no Streamlit
-        texto_relatorio = f"Relatório de Ancestrais Comuns para:\n"  # Adicionada quebra de linha após os dois pontos
-        texto_relatorio += f"{nome_referencia} ( ID: {id_referencia} | Identificador: {identificador_referencia} )\n\n"
-
-        for (ancestral_id, nome_ancestral, identificador_ancestral), descendentes in ancestrais_agrupados.items():
-            texto_relatorio += f"Ancestral Comum: {nome_ancestral} ( ID: {ancestral_id} | Identificador: {identificador_ancestral} )\n"
-            grau_referencia = antepassados_referencia.get(ancestral_id, None)
-            if grau_referencia is not None:
-                grau_referencia_texto = geracao_para_termo(grau_referencia)
-                texto_relatorio += f"Grau de parentesco com a referência: {grau_referencia_texto}\n"
-            for desc in descendentes:
-                texto_relatorio += f"{desc['ID']}, {desc['Nome']}, {desc['Grau']}\n"
-            texto_relatorio += "\n"
-        return output_pdf if not output_buffer else None, texto_relatorio
+        return output_pdf if not output_buffer else None, texto_relatorio_primeiros_ancestrais(modelo)
 
     return output_pdf if not output_buffer else None
 
@@ -1562,6 +2127,7 @@ from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
+@medido("pdf")
 def wrap_text(text, width, font_size, pdf_canvas):
     """
     Quebra o texto em linhas com base na largura especificada.
@@ -1571,111 +2137,81 @@ def wrap_text(text, width, font_size, pdf_canvas):
 
 # ------------------------------------------------------------------------------------------------------------------
 
+@medido("pdf")
 def exibir_ancestrais_comuns_por_ocorrencia(df, ids_lista, id_especifico=None):
     """
     Exibe ancestrais comuns entre todos os IDs da lista, ou entre um ID específico e os demais.
     Gera e retorna um relatório em PDF com título.
     """
+    modelo = modelo_ancestrais_por_ocorrencia(df, ids_lista, id_especifico)
+
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
-    text_y_position = height - 40
     max_line_width = width - 80
 
+    # Layout e paginação calculados antes de desenhar
+    paginacao = PaginacaoPDF(height)
+
     # Título do relatório
-    pdf.setFont("Helvetica-Bold", 14)
     if id_especifico:
-        nome_referencia = df.loc[id_especifico, "Nome Completo"] if "Nome Completo" in df.columns else "Desconhecido"
-        identificador_referencia = df.loc[id_especifico, "Identificador"] if "Identificador" in df.columns else "Desconhecido"
         titulo = f"Relatório de Ancestrais Comuns para:\n"
-        titulo += f"{nome_referencia} (ID: {id_especifico}, Identificador: {identificador_referencia})"
+        titulo += f"{modelo.nome_referencia} (ID: {id_especifico}, Identificador: {modelo.identificador_referencia})"
     else:
         titulo = "Relatório de Ancestrais Comuns para Todos os IDs"
-    lines = wrap_text(titulo, max_line_width, 14, pdf)
-    for line in lines:
-        pdf.drawString(40, text_y_position, line)
-        text_y_position -= 20
-
-    text_y_position -= 20  # Espaço após o título
+    for line in simpleSplit(titulo, "Helvetica-Bold", 14, max_line_width):
+        paginacao.linha("Helvetica-Bold", 14, ((40, line),), entrelinha=20)
 
-    if id_especifico:
-        ids_lista = [id_ for id_ in ids_lista if id_ != id_especifico]
-        antepassados_referencia = coletar_todos_antepassados(df, id_especifico)
+    paginacao.espaco(20)  # Espaço após o título
 
-    # Coletar os antepassados para cada ID na lista fornecida
-    antepassados_por_id = {pessoa_id: coletar_todos_antepassados(df, pessoa_id) for pessoa_id in ids_lista}
+    for grupo in modelo.grupos:
+        title_text = f"Ancestral Comum: {grupo.nome} (ID: {grupo.id}, Identificador: {grupo.identificador}) - Descendentes: {len(grupo.descendentes)}"
+        lines = simpleSplit(title_text, "Helvetica-Bold", 10, max_line_width)
 
-    # Criar um dicionário para agrupar os descendentes de cada ancestral comum
-    descendentes_por_ancestral = {}
+        # Mantém o título do ancestral na mesma página que a primeira linha da tabela
+        paginacao.reservar(ENTRELINHA_PDF * len(lines))
+        for line in lines:
+            paginacao.linha("Helvetica-Bold", 10, ((40, line),))
+
+        for desc in sorted(grupo.descendentes, key=lambda d: (d.grau, d.id)):
+            celulas = (
+                (40, f"{desc.identificador}"),
+                (120, f"Nome: {desc.nome}"),
+                (320, geracao_para_termo(desc.grau)),
+                (500, f"Grau: {desc.grau}"),
+            )
+            paginacao.linha("Helvetica", 10, celulas, quebrar_pagina=True)
 
-    # Iterar sobre os ancestrais e agrupar por ancestral comum
-    for pessoa_id, antepassados in antepassados_por_id.items():
-        for ancestral_id, grau in antepassados.items():
-            if id_especifico and ancestral_id not in antepassados_referencia:
-                continue
-            if ancestral_id not in descendentes_por_ancestral:
-                descendentes_por_ancestral[ancestral_id] = []
-            descendentes_por_ancestral[ancestral_id].append({
-                'ID': pessoa_id,
-                'ID FS': df.at[pessoa_id, 'Identificador'] if 'Identificador' in df.columns else "Desconhecido",
-                'Nome': buscar_nome_sobrenome_por_id(df, pessoa_id),
-                'Grau de Parentesco': geracao_para_termo(grau),
-                'Grau': grau
-            })
-
-    # Ordenar os ancestrais por quantidade de descendentes
-    descendentes_por_ancestral_ordenado = sorted(
-        descendentes_por_ancestral.items(),
-        key=lambda x: (-len(x[1]), x[0])
-    )
+        paginacao.espaco(20)
 
-    pdf.setFont("Helvetica", 10)
-    ancestrais_exibidos = False
-    for ancestral_id, descendentes in descendentes_por_ancestral_ordenado:
-        if len(descendentes) > 1 or id_especifico:
-            nome_ancestral = buscar_nome_sobrenome_por_id(df, ancestral_id)
-            identificador_ancestral = df.at[ancestral_id, 'Identificador'] if 'Identificador' in df.columns else "Desconhecido"
-            title_text = f"Ancestral Comum: {nome_ancestral} (ID: {ancestral_id}, Identificador: {identificador_ancestral}) - Descendentes: {len(descendentes)}"
-
-            pdf.setFont("Helvetica-Bold", 10)
-            lines = wrap_text(title_text, max_line_width, 10, pdf)
-            for line in lines:
-                pdf.drawString(40, text_y_position, line)
-                text_y_position -= 15
-
-            descendentes_df = pd.DataFrame(descendentes).sort_values(by=['Grau', 'ID'])
-            pdf.setFont("Helvetica", 10)
-            for _, row in descendentes_df.iterrows():
-                pdf.drawString(40, text_y_position, f"{row['ID FS']}")
-                pdf.drawString(120, text_y_position, f"Nome: {row['Nome']}")
-                pdf.drawString(320, text_y_position, f"{row['Grau de Parentesco']}")
-                pdf.drawString(500, text_y_position, f"Grau: {row['Grau']}")
-                text_y_position -= 15
-
-                if text_y_position < 40:
-                    pdf.showPage()
-                    pdf.setFont("Helvetica", 10)
-                    text_y_position = height - 40
-
-            ancestrais_exibidos = True
-            text_y_position -= 20
-
-    if not ancestrais_exibidos:
-        pdf.drawString(40, text_y_position, "Nenhum ancestral comum encontrado entre os IDs fornecidos.")
+    if not modelo.grupos:
+        paginacao.linha("Helvetica", 10, ((40, "Nenhum ancestral comum encontrado entre os IDs fornecidos."),))
 
+    desenhar_paginacao(pdf, paginacao)
     pdf.save()
     buffer.seek(0)
     return buffer
 
 # ------------------------------------------------------------------------------------------------
 
+@medido("computacao")
 def buscar_nome_sobrenome_por_id(df, pessoa_id):
+    if isinstance(df, FamilyIndex):
+        return df.nome_completo(pessoa_id)
     if pessoa_id in df.index:
         nome = df.at[pessoa_id, 'Nome'] if 'Nome' in df.columns else "Desconhecido"
         sobrenome = df.at[pessoa_id, 'Sobrenome'] if 'Sobrenome' in df.columns else ""
         return f"{nome} {sobrenome}".strip()
     return "Desconhecido"
 
+
+@medido("computacao")
+def buscar_identificador_por_id(df, pessoa_id):
+    """Busca o Identificador de uma pessoa por ID, retornando 'Desconhecido' se não existir."""
+    if isinstance(df, FamilyIndex):
+        return df.obter_identificador(pessoa_id)
+    return obter_mapa_identificadores(df).identificador(pessoa_id)
+
 # -------------------------------------------------------------------------------------------------
 
 def gerar_relatorio_visualizacao(df, ids_lista, id_especifico=None):
@@ -1683,84 +2219,71 @@ def gerar_relatorio_visualizacao(df, ids_lista, id_especifico=None):
     Gera uma visualização formatada para o Streamlit no estilo fornecido,
     com destaque para ancestrais e correção do "Parentesco com Referência".
     """
-    from collections import defaultdict
+    modelo = modelo_ancestrais_por_ocorrencia(df, ids_lista, id_especifico)
 
     # Início do relatório
     st.markdown("## Relatório de Ancestrais Comuns para:")
 
     if id_especifico:
-        nome_referencia = df.loc[id_especifico, "Nome Completo"] if "Nome Completo" in df.columns else "Desconhecido"
         st.markdown(f"""
         <div style="background-color: #1E293B; color: #FFFFFF; padding: 10px; border-radius: 5px; margin-bottom: 10px;">
-            <strong>ID de Referência: {id_especifico} | Nome: {nome_referencia}</strong>
+            <strong>ID de Referência: {id_especifico} | Nome: {modelo.nome_referencia}</strong>
         </div>
         """, unsafe_allow_html=True)
 
-    # Coletar dados de ancestrais comuns
-    descendentes_por_ancestral = defaultdict(list)
+    # Exibir o relatório com destaques
+    for grupo in modelo.grupos:
+        # Grau de parentesco com o ID de referência
+        if grupo.grau_referencia is not None:
+            parentesco_referencia = geracao_para_termo(grupo.grau_referencia)
+        else:
+            parentesco_referencia = "Indefinido"
 
-    if id_especifico:
-        ids_lista = [id_ for id_ in ids_lista if id_ != id_especifico]
-        antepassados_referencia = coletar_todos_antepassados(df, id_especifico)
-    else:
-        antepassados_referencia = None
+        # Destaque do ancestral comum
+        st.markdown(f"""
+        <div style="background-color: #111827; color: #FFFFFF; padding: 10px; border-radius: 5px; margin-top: 10px;">
+            <strong>Ancestral Comum: {grupo.nome} (ID: {grupo.id} | Identificador: {grupo.identificador}) 
+            (Parentesco com Referência: {parentesco_referencia})</strong>
+        </div>
+        """, unsafe_allow_html=True)
 
-    # Organizar descendentes por ancestral comum
-    for pessoa_id in ids_lista:
-        antepassados = coletar_todos_antepassados(df, pessoa_id)
-        for ancestral_id, grau in antepassados.items():
-            if id_especifico and ancestral_id not in antepassados_referencia:
-                continue
-            descendentes_por_ancestral[ancestral_id].append({
-                'ID': pessoa_id,
-                'Nome': buscar_nome_sobrenome_por_id(df, pessoa_id),
-                'Grau': geracao_para_termo(grau)
-            })
-
-    # Ordenar ancestrais por quantidade de descendentes
-    ancestrais_ordenados = sorted(
-        descendentes_por_ancestral.items(),
-        key=lambda x: (-len(x[1]), x[0])
-    )
+        # Montar os descendentes como tabela
+        tabela_descendentes = {
+            "ID": [d.id for d in grupo.descendentes],
+            "Nome": [d.nome for d in grupo.descendentes],
+            "Grau": [geracao_para_termo(d.grau) for d in grupo.descendentes]
+        }
+        st.table(tabela_descendentes)
 
-    # Exibir o relatório com destaques
-    for ancestral_id, descendentes in ancestrais_ordenados:
-        if len(descendentes) > 1 or id_especifico:
-            nome_ancestral = buscar_nome_sobrenome_por_id(df, ancestral_id)
-            identificador = df.at[ancestral_id, 'Identificador'] if 'Identificador' in df.columns else "Desconhecido"
-
-            # Calcular o grau de parentesco com o ID de referência
-            grau_parentesco_referencia = antepassados_referencia.get(ancestral_id, None) if antepassados_referencia else None
-            if grau_parentesco_referencia is not None:
-                parentesco_referencia = geracao_para_termo(grau_parentesco_referencia)
-            else:
-                parentesco_referencia = "Indefinido"
-
-            # Destaque do ancestral comum
-            st.markdown(f"""
-            <div style="background-color: #111827; color: #FFFFFF; padding: 10px; border-radius: 5px; margin-top: 10px;">
-                <strong>Ancestral Comum: {nome_ancestral} (ID: {ancestral_id} | Identificador: {identificador}) 
-                (Parentesco com Referência: {parentesco_referencia})</strong>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Montar os descendentes como tabela
-            tabela_descendentes = {
-                "ID": [d['ID'] for d in descendentes],
-                "Nome": [d['Nome'] for d in descendentes],
-                "Grau": [d['Grau'] for d in descendentes]
-            }
-            st.table(tabela_descendentes)
-
-    if not descendentes_por_ancestral:
+    if not modelo.grupos:
         st.warning("Nenhum ancestral comum encontrado.")
 
 # -------------------------------------------------------------------------------------------------------------------------------
 
+@medido("computacao")
+def matches_com_ancestral_comum(df, id_referencia, ids_lista):
+    """
+    Retorna o conjunto de IDs da lista que compartilham ao menos um antepassado com o ID de referência.
+    Relações em linha direta também contam: matches que são antepassados ou descendentes da referência.
+    """
+    matriz = obter_matriz_antepassados(df, ids_lista)
+    compartilham = matriz.pertinencia(restringir_a=id_referencia).any(axis=1)
+    relacionados = {pessoa_id for pessoa_id, compartilha in zip(matriz.pessoas, compartilham.tolist()) if compartilha}
+
+    antepassados_referencia = coletar_todos_antepassados(df, id_referencia)
+    for pessoa_id in matriz.pessoas:
+        if pessoa_id in antepassados_referencia or id_referencia in coletar_todos_antepassados(df, pessoa_id):
+            relacionados.add(pessoa_id)
+
+    relacionados.discard(id_referencia)
+    return relacionados
+
+
+@medido("computacao")
 def separar_ids_por_relacao_via_ancestrais(df, ids_lista, id1, id2):
     """
-    Separa os IDs dos matches em grupos com base nos ancestrais comuns e descendentes
-    de dois IDs de referência.
+    Separa os IDs dos matches em grupos com base nos ancestrais comuns com
+    dois IDs de referência.
 
     Parâmetros:
         df: DataFrame contendo os dados.
@@ -1774,27 +2297,13 @@ def separar_ids_por_relacao_via_ancestrais(df, ids_lista, id1, id2):
         ids_somente_id2: IDs relacionados apenas ao ID2.
         ids_nenhum: IDs não relacionados a nenhum dos dois IDs.
     """
-    # Gerar os descendentes para ID1 e ID2 usando a função existente
-    buffer_id1, texto_id1 = exibir_ancestrais_comuns_por_ocorrencia(df, ids_lista, id1, retornar_texto=True)
-    buffer_id2, texto_id2 = exibir_ancestrais_comuns_por_ocorrencia(df, ids_lista, id2, retornar_texto=True)
-
-    # Extrair os IDs dos descendentes a partir do texto retornado
-    def extrair_ids_do_texto(texto):
-        """Extrai IDs do texto retornado pela função de ancestrais."""
-        ids_encontrados = set()
-        for linha in texto.split("\n"):
-            match = re.search(r"ID:\s*(\d+)", linha)  # Procura padrões como 'ID: 123'
-            if match:
-                ids_encontrados.add(int(match.group(1)))
-        return sorted(ids_encontrados)
-
-    ids_descendentes_id1 = extrair_ids_do_texto(texto_id1)
-    ids_descendentes_id2 = extrair_ids_do_texto(texto_id2)
+    relacionados_id1 = matches_com_ancestral_comum(df, id1, ids_lista)
+    relacionados_id2 = matches_com_ancestral_comum(df, id2, ids_lista)
 
     # Cruzar as informações para formar os grupos
-    ids_ambos = sorted(ids_descendentes_id1 & ids_descendentes_id2)  # IDs comuns
-    ids_somente_id1 = sorted(ids_descendentes_id1 - ids_descendentes_id2)  # Somente ID1
-    ids_somente_id2 = sorted(ids_descendentes_id2 - ids_descendentes_id1)  # Somente ID2
-    ids_nenhum = sorted(set(ids_lista) - ids_descendentes_id1 - ids_descendentes_id2)  # Nenhum
+    ids_ambos = sorted(relacionados_id1 & relacionados_id2)  # IDs comuns
+    ids_somente_id1 = sorted(relacionados_id1 - relacionados_id2)  # Somente ID1
+    ids_somente_id2 = sorted(relacionados_id2 - relacionados_id1)  # Somente ID2
+    ids_nenhum = sorted(set(ids_lista) - relacionados_id1 - relacionados_id2)  # Nenhum
 
     return ids_ambos, ids_somente_id1, ids_somente_id2, ids_nenhum
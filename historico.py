@@ -0,0 +1,258 @@
+import os
+import re
+import time
+import pandas as pd
+from dados import (
+    CAMINHO_DADOS,
+    comparar_snapshots,
+    escrever_json,
+    gravar_atomico,
+    hash_arquivo,
+    ler_metadados,
+    ler_planilha,
+    normalizar_tabela,
+)
+from indices import CacheLRU, obter_familia_index
+
+# Pasta (ao lado da planilha) com o histórico de versões da árvore
+PASTA_HISTORICO = os.path.join(os.path.dirname(CAMINHO_DADOS), ".historico")
+
+# Incrementar quando o formato do histórico mudar
+VERSAO_HISTORICO = 1
+
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Colunas de controle dos registros: versão em que o estado da linha começa e se a pessoa foi removida nela
+COLUNA_VERSAO = "_versao"
+COLUNA_REMOVIDO = "_removido"
+
+# Quantidade de versões reconstruídas mantidas em memória
+MAX_TABELAS = 4
+
+
+def listar_snapshots(caminho_atual=CAMINHO_DADOS):
+    """
+    Exportações da árvore em ordem cronológica, como (nome da versão, caminho): primeiro as
+    _ANTIGO_<n> (pelo número) e por último a planilha atual, nomeada pela data de modificação.
+    """
+    pasta = os.path.dirname(caminho_atual)
+    base = os.path.splitext(os.path.basename(caminho_atual))[0]
+    padrao = re.compile(re.escape(base) + r"_ANTIGO_(\d+)\.xlsx")
+
+    antigos = []
+    for nome in os.listdir(pasta or "."):
+        encontrado = padrao.fullmatch(nome)
+        if encontrado:
+            antigos.append((int(encontrado.group(1)), nome))
+    snapshots = [(f"ANTIGO_{numero}", os.path.join(pasta, nome)) for numero, nome in sorted(antigos)]
+
+    if os.path.exists(caminho_atual):
+        data = time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(caminho_atual)))
+        snapshots.append((data, caminho_atual))
+    return snapshots
+
+
+class HistoricoArvore:
+    """
+    Histórico compacto das versões da árvore: a primeira versão completa e, para cada versão seguinte,
+    só as linhas incluídas, alteradas ou removidas, em arquivos feather descritos por um manifesto JSON.
+    As consultas "como estava na versão N" partem desses registros, sem reler as planilhas.
+    """
+
+    def __init__(self, pasta=PASTA_HISTORICO):
+        self.pasta = pasta
+        manifesto = ler_metadados(os.path.join(pasta, ARQUIVO_MANIFESTO))
+        if not manifesto or manifesto.get("formato") != VERSAO_HISTORICO:
+            manifesto = {"formato": VERSAO_HISTORICO, "versoes": []}
+        self.manifesto = manifesto
+        self._registros = None
+        self._tabelas = CacheLRU(MAX_TABELAS)
+
+    @property
+    def versoes(self):
+        """Descrição de cada versão (nome, origem, SHA-256, arquivo e contagens), da mais antiga à mais recente."""
+        return self.manifesto["versoes"]
+
+    def __len__(self):
+        return len(self.versoes)
+
+    def numero(self, versao):
+        """Número de uma versão a partir do número (negativos contam do fim) ou do nome."""
+        if isinstance(versao, str):
+            for item in self.versoes:
+                if item["nome"] == versao:
+                    return item["numero"]
+            raise KeyError(f"Versão não encontrada no histórico: {versao}")
+        return range(len(self.versoes))[versao]
+
+    def resumo(self):
+        """Tabela com uma linha por versão e as contagens de pessoas incluídas, removidas e alteradas."""
+        colunas = ["numero", "nome", "origem", "linhas", "adicionados", "removidos", "reparentados", "alterados"]
+        return pd.DataFrame(self.versoes, columns=colunas)
+
+    def registrar(self, caminho, nome=None):
+        """
+        Acrescenta uma exportação ao histórico como nova versão, gravando só a diferença para a última.
+        Se o mesmo conteúdo (SHA-256) já estiver registrado, não grava nada. Retorna o número da versão.
+        """
+        sha256 = hash_arquivo(caminho)
+        for item in self.versoes:
+            if item["sha256"] == sha256:
+                return item["numero"]
+
+        df = ler_planilha(caminho)
+        df.index = df.index.astype("int64")
+        numero = len(self.versoes)
+        descricao = {
+            "numero": numero,
+            "nome": nome or os.path.splitext(os.path.basename(caminho))[0],
+            "origem": os.path.basename(caminho),
+            "sha256": sha256,
+            "arquivo": f"v{numero:03d}.feather",
+            "linhas": len(df),
+        }
+
+        if numero == 0:
+            registros = df.reset_index()
+            registros[COLUNA_REMOVIDO] = False
+            descricao.update(adicionados=len(df), removidos=0, reparentados=0, alterados=0)
+        else:
+            diferencas = comparar_snapshots(self.tabela_em(-1), df)
+            mudaram = df[df.index.isin(diferencas.adicionados) | df.index.isin(list(diferencas.alterados))].reset_index()
+            mudaram[COLUNA_REMOVIDO] = False
+            removidos = pd.DataFrame({"ID": pd.Series(diferencas.removidos, dtype="int64"), COLUNA_REMOVIDO: True})
+            registros = pd.concat([mudaram, removidos], ignore_index=True) if len(removidos) else mudaram
+            descricao.update(
+                adicionados=len(diferencas.adicionados),
+                removidos=len(diferencas.removidos),
+                reparentados=len(diferencas.reparentados),
+                alterados=len(diferencas.alterados),
+            )
+        registros[COLUNA_VERSAO] = numero
+
+        os.makedirs(self.pasta, exist_ok=True)
+        gravar_atomico(os.path.join(self.pasta, descricao["arquivo"]), registros.to_feather)
+        self.versoes.append(descricao)
+        gravar_atomico(os.path.join(self.pasta, ARQUIVO_MANIFESTO), lambda destino: escrever_json(destino, self.manifesto))
+
+        self._registros = None
+        self._tabelas.invalidar()
+        return numero
+
+    def registros(self):
+        """
+        Todos os registros do histórico, ordenados por ID e versão: uma linha para cada estado de
+        cada pessoa, com as colunas _versao e _removido.
+        """
+        if self._registros is None:
+            partes = [pd.read_feather(os.path.join(self.pasta, item["arquivo"])) for item in self.versoes]
+            if partes:
+                registros = pd.concat(partes, ignore_index=True)
+            else:
+                registros = pd.DataFrame({"ID": [], COLUNA_REMOVIDO: [], COLUNA_VERSAO: []})
+            self._registros = registros.sort_values(["ID", COLUNA_VERSAO], kind="stable", ignore_index=True)
+        return self._registros
+
+    def tabela_em(self, versao=-1):
+        """A tabela de pessoas como estava numa versão (indexada por ID), reconstruída a partir dos registros."""
+        numero = self.numero(versao)
+        return self._tabelas.obter(numero, lambda: self._reconstruir(numero))
+
+    def _reconstruir(self, numero):
+        registros = self.registros()
+        registros = registros[registros[COLUNA_VERSAO] <= numero]
+        ultimos = registros.drop_duplicates("ID", keep="last")  # Último estado de cada pessoa até a versão
+        ultimos = ultimos[~ultimos[COLUNA_REMOVIDO].astype(bool)]
+        # Restaura os tipos da carga normal (categorias, IDs int32), perdidos ao juntar os registros
+        return normalizar_tabela(ultimos.drop(columns=[COLUNA_VERSAO, COLUNA_REMOVIDO]).set_index("ID"))
+
+    def pais_em(self, pessoa_id, versao=-1):
+        """(Pai_ID, Mãe_ID) de uma pessoa na versão, com 0 para ausente; (None, None) se ela ainda não existia."""
+        return obter_familia_index(self.tabela_em(versao)).pais_brutos(pessoa_id)
+
+    def antepassados_em(self, pessoa_id, versao=-1):
+        """Antepassados de uma pessoa na versão, como {ID: menor geração} (1 = pais)."""
+        ids, geracoes, _ = obter_familia_index(self.tabela_em(versao)).fechamento_antepassados(pessoa_id)
+        return dict(zip(ids.tolist(), geracoes.tolist()))
+
+    def historico_pessoa(self, pessoa_id):
+        """Estados registrados de uma pessoa: um por versão em que ela foi incluída, alterada ou removida."""
+        registros = self.registros()
+        linhas = registros[registros["ID"] == pessoa_id]
+        linhas = linhas.assign(Versão=[self.versoes[numero]["nome"] for numero in linhas[COLUNA_VERSAO]])
+        return linhas.set_index("Versão")
+
+    def primeira_versao(self, pessoa_id):
+        """Nome da primeira versão em que a pessoa aparece (None se ela nunca apareceu)."""
+        historico = self.historico_pessoa(pessoa_id)
+        presentes = historico[~historico[COLUNA_REMOVIDO].astype(bool)]
+        return presentes.index[0] if len(presentes) else None
+
+    def surgimento_ramo(self, pessoa_id, versao=-1):
+        """
+        Quando cada antepassado da pessoa (na versão informada) passou a fazer parte da ascendência dela:
+        {ID do antepassado: nome da primeira versão em que ele já aparecia como antepassado}.
+
+        Percorre os registros uma única vez, versão a versão, mantendo os pais de cada pessoa presente.
+        A ascendência só é recalculada nas versões com registros da pessoa, de um antepassado dela ou
+        de um pai ou mãe deles, as únicas que podem mudá-la; nenhuma tabela é reconstruída.
+        """
+        numero = self.numero(versao)
+        registros = self.registros()
+        registros = registros[registros[COLUNA_VERSAO] <= numero]
+
+        pais = {}  # (Pai_ID, Mãe_ID) de cada pessoa presente na versão, com 0 para ausente
+        antepassados = set()
+        observados = None  # IDs cujos registros podem mudar a ascendência (None antes do primeiro cálculo)
+        surgimento = {}
+        for anterior, mudancas in registros.groupby(COLUNA_VERSAO, sort=True):
+            ids = mudancas["ID"].astype("int64").tolist()
+            removidos = mudancas[COLUNA_REMOVIDO].astype(bool).tolist()
+            pais_ids = [pd.to_numeric(mudancas[coluna], errors="coerce").fillna(0).astype("int64").tolist()
+                        for coluna in ("Pai_ID", "Mãe_ID")]
+            for atual, removido, pai_id, mae_id in zip(ids, removidos, *pais_ids):
+                if removido:
+                    pais.pop(atual, None)
+                else:
+                    pais[atual] = (pai_id, mae_id)
+
+            if observados is not None and observados.isdisjoint(ids):
+                continue
+            antepassados, observados = _ascendencia(pais, pessoa_id)
+            for antepassado_id in antepassados:
+                surgimento.setdefault(antepassado_id, self.versoes[int(anterior)]["nome"])
+        return {antepassado_id: nome for antepassado_id, nome in surgimento.items() if antepassado_id in antepassados}
+
+
+def _ascendencia(pais, pessoa_id):
+    """
+    Antepassados de uma pessoa a partir de {ID: (Pai_ID, Mãe_ID)} das pessoas presentes e os IDs
+    observados: a pessoa, os antepassados e todos os pais e mães registrados deles, presentes ou não.
+    """
+    antepassados = set()
+    observados = {pessoa_id}
+    pendentes = [pessoa_id]
+    while pendentes:
+        for pai_ou_mae in pais.get(pendentes.pop(), ()):
+            if not pai_ou_mae:
+                continue
+            observados.add(pai_ou_mae)
+            if pai_ou_mae in pais and pai_ou_mae not in antepassados:
+                antepassados.add(pai_ou_mae)
+                pendentes.append(pai_ou_mae)
+    return antepassados, observados
+
+
+def construir_historico(caminho_atual=CAMINHO_DADOS, pasta=PASTA_HISTORICO):
+    """
+    Registra no histórico, em ordem, as exportações ainda não registradas (ver listar_snapshots).
+    Só as planilhas novas são lidas; as já registradas são reconhecidas pelo SHA-256.
+    """
+    historico = HistoricoArvore(pasta)
+    for nome, caminho in listar_snapshots(caminho_atual):
+        historico.registrar(caminho, nome)
+    return historico
+
+
+if __name__ == "__main__":
+    print(construir_historico().resumo().to_string(index=False))
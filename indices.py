@@ -0,0 +1,803 @@
+import re
+import threading
+import unicodedata
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medido, registrar_varredura
+
+
+# Estruturas derivadas de cada DataFrame carregado, construídas uma única vez.
+# A chave é o id() do DataFrame; a referência fraca garante que o registro
+# some junto com o DataFrame quando ele é descartado.
+_derivados_por_df = {}
+
+
+def _derivados(df):
+    """Retorna o dicionário de estruturas derivadas associado ao DataFrame."""
+    chave = id(df)
+    registro = _derivados_por_df.get(chave)
+    if registro is None or registro[0]() is not df:
+        def _remover(ref, chave=chave):
+            atual = _derivados_por_df.get(chave)
+            if atual is not None and atual[0] is ref:
+                del _derivados_por_df[chave]
+
+        registro = (weakref.ref(df, _remover), {})
+        _derivados_por_df[chave] = registro
+    return registro[1]
+
+
+def iterar_derivados():
+    """Gera (df, derivados) para cada DataFrame ainda vivo com estruturas derivadas; `derivados` é uma cópia."""
+    for referencia, derivados in list(_derivados_por_df.values()):
+        df = referencia()
+        if df is not None:
+            yield df, dict(derivados)
+
+
+class CacheLRU:
+    """
+    Cache dos itens usados mais recentemente, com limite de entradas e contadores de acertos/falhas.
+    Seguro para uso entre as threads das sessões do Streamlit (o cálculo em si fica fora do lock).
+    """
+
+    def __init__(self, capacidade=32):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def obter(self, chave, calcular):
+        """Retorna o valor da chave, calculando-o com calcular() e guardando-o na primeira vez."""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+        valor = calcular()
+        self.guardar(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        """Guarda o valor da chave como o usado mais recentemente, sem contar como consulta."""
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, predicado=None):
+        """Remove as entradas cuja chave satisfaz predicado(chave) (todas, se omitido); retorna quantas saíram."""
+        with self._lock:
+            chaves = [chave for chave in self._itens if predicado is None or predicado(chave)]
+            for chave in chaves:
+                del self._itens[chave]
+        return len(chaves)
+
+    def transferir(self, destino, predicado=None):
+        """Copia para outro cache as entradas cuja chave satisfaz predicado(chave), na mesma ordem de uso; retorna quantas."""
+        with self._lock:
+            itens = [(chave, valor) for chave, valor in self._itens.items() if predicado is None or predicado(chave)]
+        with destino._lock:
+            for chave, valor in itens:
+                destino._itens[chave] = valor
+                destino._itens.move_to_end(chave)
+            while len(destino._itens) > destino.capacidade:
+                destino._itens.popitem(last=False)
+        return len(itens)
+
+    def valor(self, chave, padrao=None):
+        """Valor guardado da chave (ou padrao), sem contar como consulta nem mudar a ordem de uso."""
+        with self._lock:
+            return self._itens.get(chave, padrao)
+
+    def estatisticas(self):
+        """Entradas, capacidade, acertos, falhas e taxa de acertos do cache."""
+        consultas = self.acertos + self.falhas
+        return {
+            "entradas": len(self._itens),
+            "capacidade": self.capacidade,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acertos": self.acertos / consultas if consultas else 0.0,
+        }
+
+
+def _coluna_ids(df, coluna):
+    """Converte uma coluna de IDs (Pai_ID, Mãe_ID...) para int64, usando 0 como ausente."""
+    if coluna not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    valores = pd.to_numeric(df[coluna], errors="coerce").fillna(0)
+    return valores.to_numpy(dtype=np.int64)
+
+
+def _coluna_valores(df, coluna):
+    """Retorna os valores brutos de uma coluna como lista (None se a coluna não existir)."""
+    if coluna not in df.columns:
+        return [None] * len(df)
+    return df[coluna].tolist()
+
+
+# Fechos de antepassados guardados em cada índice (pessoas consultadas e seus antepassados). Numa árvore
+# sintética de 100 mil pessoas, cada fecho ocupa em média 1,8 KB (uns 70 antepassados), perto de 55 MB
+# com o cache cheio; na planilha real, a média fica em 0,7 KB.
+MAX_FECHAMENTOS = 30_000
+
+# Quantidade de listas de pessoas cujas matrizes ficam guardadas por conjunto de dados
+MAX_MATRIZES = 8
+
+
+class FamilyIndex:
+    """
+    Índice de parentesco construído uma única vez a partir do DataFrame carregado.
+
+    Guarda os vetores de pai/mãe em arrays alinhados às linhas do DataFrame e a
+    lista de filhos no formato CSR (offsets + array contíguo), de modo que as
+    consultas de pais, filhos e irmãos custam O(grau) em vez de varrer as
+    colunas 'Pai_ID'/'Mãe_ID' inteiras.
+    """
+
+    def __init__(self, df):
+        self._df = weakref.ref(df)
+        self.ids = df.index.to_numpy(dtype=np.int64)
+        self.posicao = {pessoa_id: linha for linha, pessoa_id in enumerate(self.ids.tolist())}
+
+        # Valores brutos de Pai_ID/Mãe_ID (0 = ausente), mesmo que apontem para IDs fora do índice
+        self.pai = _coluna_ids(df, 'Pai_ID')
+        self.mae = _coluna_ids(df, 'Mãe_ID')
+
+        self.nome = _coluna_valores(df, 'Nome')
+        self.sobrenome = _coluna_valores(df, 'Sobrenome')
+        self.identificador = _coluna_valores(df, 'Identificador')
+
+        # Lista de filhos em CSR, chaveada pelo valor do ID do pai/mãe
+        linhas = np.arange(len(self.ids), dtype=np.int64)
+        pais_ref = np.concatenate([self.pai, self.mae])
+        filhos_ref = np.concatenate([linhas, linhas])
+        validos = pais_ref > 0
+        pais_ref, filhos_ref = pais_ref[validos], filhos_ref[validos]
+
+        ordem = np.lexsort((filhos_ref, pais_ref))  # Por pai, mantendo a ordem das linhas
+        pais_ref, filhos_ref = pais_ref[ordem], filhos_ref[ordem]
+        if len(pais_ref):
+            # Remove o par repetido quando Pai_ID == Mãe_ID na mesma linha
+            distintos = np.ones(len(pais_ref), dtype=bool)
+            distintos[1:] = (pais_ref[1:] != pais_ref[:-1]) | (filhos_ref[1:] != filhos_ref[:-1])
+            pais_ref, filhos_ref = pais_ref[distintos], filhos_ref[distintos]
+
+        chaves, inicio = np.unique(pais_ref, return_index=True)
+        self._filhos_linhas = filhos_ref
+        self._filhos_inicio = np.append(inicio, len(filhos_ref)).tolist()
+        self._linha_filhos = {chave: k for k, chave in enumerate(chaves.tolist())}
+
+        # Fechos de antepassados das pessoas consultadas e matrizes de antepassados já calculados,
+        # válidos enquanto o índice existir
+        self._fechamentos = CacheLRU(MAX_FECHAMENTOS)
+        self._matrizes = CacheLRU(MAX_MATRIZES)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pessoa_id):
+        return pessoa_id in self.posicao
+
+    @property
+    def df(self):
+        """DataFrame de origem (ou None se ele já foi descartado)."""
+        return self._df()
+
+    def pais_brutos(self, pessoa_id):
+        """Retorna (Pai_ID, Mãe_ID) exatamente como registrados, com 0 para ausente."""
+        linha = self.posicao.get(pessoa_id)
+        if linha is None:
+            return None, None
+        return int(self.pai[linha]), int(self.mae[linha])
+
+    def pais(self, pessoa_id):
+        """Retorna (pai, mãe) presentes no índice, com None para ausente."""
+        pai, mae = self.pais_brutos(pessoa_id)
+        return (pai if pai in self.posicao else None,
+                mae if mae in self.posicao else None)
+
+    def linhas_filhos(self, pessoa_id):
+        """Linhas (posições no DataFrame) dos filhos de um ID, na ordem do DataFrame."""
+        k = self._linha_filhos.get(pessoa_id)
+        if k is None:
+            return self._filhos_linhas[:0]
+        return self._filhos_linhas[self._filhos_inicio[k]:self._filhos_inicio[k + 1]]
+
+    def filhos(self, pessoa_id):
+        """IDs dos filhos de um ID (pai ou mãe), na ordem do DataFrame."""
+        return self.ids[self.linhas_filhos(pessoa_id)].tolist()
+
+    def irmaos(self, pessoa_id):
+        """IDs dos irmãos (inclusive meio-irmãos): primeiro os paternos, depois os maternos."""
+        pai, mae = self.pais_brutos(pessoa_id)
+        irmaos = {}
+        for pai_ou_mae in (pai, mae):
+            if pai_ou_mae and pai_ou_mae > 0:
+                for irmao_id in self.filhos(pai_ou_mae):
+                    if irmao_id != pessoa_id:
+                        irmaos[irmao_id] = None
+        return list(irmaos)
+
+    def descendentes(self, pessoas_ids):
+        """IDs de todos os descendentes (filhos, netos...) das pessoas informadas, sem incluí-las."""
+        vistos = set()
+        pendentes = list(pessoas_ids)
+        while pendentes:
+            for filho_id in self.filhos(pendentes.pop()):
+                if filho_id not in vistos:
+                    vistos.add(filho_id)
+                    pendentes.append(filho_id)
+        return vistos
+
+    def fechamento_antepassados(self, pessoa_id):
+        """
+        Fecho de antepassados de um ID, calculado de forma iterativa e memorizado por pessoa (até
+        MAX_FECHAMENTOS fechos, os usados mais recentemente).
+
+        Retorna três arrays alinhados (somente leitura): IDs dos antepassados, a menor geração em
+        que cada um aparece (1 = pais) e o número de caminhos distintos até ele, o que expõe a
+        perda de antepassados (casamentos entre parentes). Ciclos nos dados são ignorados.
+        """
+        return self._fechamentos.obter(pessoa_id, lambda: self._calcular_fechamento(pessoa_id))
+
+    def _calcular_fechamento(self, pessoa_id):
+        """
+        Calcula o fecho de uma pessoa a partir dos fechos dos pais, reaproveitando os já guardados.
+        Os fechos dos antepassados calculados no caminho também são guardados.
+        """
+        fechamentos = {}
+
+        def conhecido(atual):
+            fechamento = fechamentos.get(atual)
+            return fechamento if fechamento is not None else self._fechamentos.valor(atual)
+
+        em_andamento = set()
+        pilha = [(pessoa_id, False)]
+        while pilha:
+            atual, expandido = pilha.pop()
+            if conhecido(atual) is not None:
+                continue
+            pais = [pai_ou_mae for pai_ou_mae in self.pais(atual) if pai_ou_mae is not None]
+            if not expandido:
+                if atual in em_andamento:  # A pessoa aparece como antepassada de si mesma
+                    continue
+                em_andamento.add(atual)
+                pilha.append((atual, True))
+                pilha.extend((pai_ou_mae, False) for pai_ou_mae in pais
+                             if conhecido(pai_ou_mae) is None and pai_ou_mae not in em_andamento)
+            else:
+                em_andamento.discard(atual)
+                fechamentos[atual] = self._combinar_fechamentos(pais, conhecido)
+
+        fechamento = fechamentos.pop(pessoa_id, None)
+        for antepassado_id, fechamento_antepassado in fechamentos.items():
+            self._fechamentos.guardar(antepassado_id, fechamento_antepassado)
+        return fechamento if fechamento is not None else conhecido(pessoa_id)
+
+    def _combinar_fechamentos(self, pais, conhecido):
+        """Combina os fechos dos pais (geração + 1, caminhos somados) com os próprios pais."""
+        ids = [np.array(pais, dtype=np.int64)]
+        geracoes = [np.ones(len(pais), dtype=np.int32)]
+        caminhos = [np.ones(len(pais), dtype=np.int64)]
+        for pai_ou_mae in pais:
+            fechamento = conhecido(pai_ou_mae)
+            if fechamento is not None:
+                ids.append(fechamento[0])
+                geracoes.append(fechamento[1] + 1)
+                caminhos.append(fechamento[2])
+
+        ids = np.concatenate(ids)
+        geracoes = np.concatenate(geracoes)
+        caminhos = np.concatenate(caminhos)
+        unicos, inverso = np.unique(ids, return_inverse=True)
+        geracao_minima = np.full(len(unicos), np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(geracao_minima, inverso, geracoes)
+        total_caminhos = np.zeros(len(unicos), dtype=np.int64)
+        np.add.at(total_caminhos, inverso, caminhos)
+
+        for array in (unicos, geracao_minima, total_caminhos):
+            array.setflags(write=False)
+        return unicos, geracao_minima, total_caminhos
+
+    def nome_completo(self, pessoa_id):
+        """Nome e sobrenome concatenados, no mesmo formato de buscar_nome_sobrenome_por_id."""
+        linha = self.posicao.get(pessoa_id)
+        if linha is None:
+            return "Desconhecido"
+        return f"{self.nome[linha]} {self.sobrenome[linha]}".strip()
+
+    def obter_identificador(self, pessoa_id, padrao="Desconhecido"):
+        """Identificador (FamilySearch) de um ID, ou o valor padrão se o ID não existir."""
+        linha = self.posicao.get(pessoa_id)
+        if linha is None:
+            return padrao
+        return self.identificador[linha]
+
+
+@medido("carga")
+def obter_familia_index(df):
+    """Retorna o FamilyIndex do DataFrame, construindo-o apenas na primeira chamada."""
+    if isinstance(df, FamilyIndex):
+        return df
+    derivados = _derivados(df)
+    indice = derivados.get("familia")
+    if indice is None:
+        indice = derivados["familia"] = FamilyIndex(df)
+    return indice
+
+
+class MatrizAntepassados:
+    """
+    Pertinência de antepassados de uma lista de pessoas (por exemplo, a lista de matches)
+    em forma compacta: uma linha de bits (np.packbits) por pessoa e uma coluna por antepassado.
+
+    Antepassados comuns de um par ou grupo são um AND vetorizado das linhas, e a quantidade
+    de pessoas que compartilham cada antepassado é uma contagem de bits por coluna.
+    """
+
+    def __init__(self, indice, pessoas_ids):
+        self.indice = indice
+        self.pessoas = list(dict.fromkeys(pessoas_ids))
+        self.linha = {pessoa_id: i for i, pessoa_id in enumerate(self.pessoas)}
+
+        fechamentos = [indice.fechamento_antepassados(pessoa_id) for pessoa_id in self.pessoas]
+        if fechamentos:
+            self.antepassados = np.unique(np.concatenate([fechamento[0] for fechamento in fechamentos]))
+        else:
+            self.antepassados = np.zeros(0, dtype=np.int64)
+
+        self.bits = np.zeros((len(self.pessoas), (len(self.antepassados) + 7) // 8), dtype=np.uint8)
+        for i, fechamento in enumerate(fechamentos):
+            presentes = np.zeros(len(self.antepassados), dtype=bool)
+            presentes[np.searchsorted(self.antepassados, fechamento[0])] = True
+            self.bits[i] = np.packbits(presentes)
+
+    def _desempacotar(self, bits):
+        return np.unpackbits(bits, axis=-1, count=len(self.antepassados)).astype(bool)
+
+    def mascara(self, pessoa_id):
+        """
+        Linha de bits (empacotada) dos antepassados de uma pessoa. Para quem não está na lista,
+        a linha é calculada na hora, restrita aos antepassados presentes na matriz.
+        """
+        if pessoa_id in self.linha:
+            return self.bits[self.linha[pessoa_id]]
+        ids = self.indice.fechamento_antepassados(pessoa_id)[0]
+        posicoes = np.searchsorted(self.antepassados, ids)
+        presentes = np.zeros(len(self.antepassados), dtype=bool)
+        validas = posicoes < len(self.antepassados)
+        presentes[posicoes[validas][self.antepassados[posicoes[validas]] == ids[validas]]] = True
+        return np.packbits(presentes)
+
+    def comuns(self, id_a, id_b):
+        """IDs dos antepassados comuns a duas pessoas da lista."""
+        return self.antepassados[self._desempacotar(self.mascara(id_a) & self.mascara(id_b))]
+
+    def comuns_grupo(self, pessoas_ids):
+        """IDs dos antepassados comuns a todas as pessoas do grupo."""
+        linhas = [self.linha[pessoa_id] for pessoa_id in pessoas_ids]
+        if not linhas:
+            return self.antepassados[:0]
+        return self.antepassados[self._desempacotar(np.bitwise_and.reduce(self.bits[linhas], axis=0))]
+
+    def pertinencia(self, restringir_a=None):
+        """
+        Matriz booleana pessoas x antepassados. Com restringir_a (ID de uma pessoa da lista),
+        mantém apenas as colunas dos antepassados dessa pessoa.
+        """
+        bits = self.bits
+        if restringir_a is not None:
+            bits = bits & self.mascara(restringir_a)
+        return self._desempacotar(bits)
+
+    def contagem_por_antepassado(self, restringir_a=None):
+        """Quantidade de pessoas da lista que compartilham cada antepassado (alinhada a self.antepassados)."""
+        return self.pertinencia(restringir_a).sum(axis=0)
+
+    def geracoes(self, pessoa_id, antepassados_ids):
+        """Menor geração de cada antepassado informado em relação a uma pessoa (todos devem ser antepassados dela)."""
+        ids, geracoes, _ = self.indice.fechamento_antepassados(pessoa_id)
+        return geracoes[np.searchsorted(ids, antepassados_ids)]
+
+
+def obter_matriz_antepassados(df, pessoas_ids):
+    """Retorna a MatrizAntepassados de uma lista de pessoas, reaproveitando as listas usadas recentemente."""
+    indice = obter_familia_index(df)
+    return indice._matrizes.obter(tuple(pessoas_ids), lambda: MatrizAntepassados(indice, pessoas_ids))
+
+
+# Colunas cobertas pela busca textual (as ausentes no DataFrame são ignoradas)
+COLUNAS_BUSCA = [
+    "Nome",
+    "Sobrenome",
+    "Nome Completo",
+    "Identificador",
+    "Local de Nascimento",
+    "Local de Falecimento",
+    "Data de Nascimento",
+    "Data de Falecimento",
+]
+
+# Separador entre os campos no texto concatenado: impede que um termo case atravessando dois campos
+SEPARADOR_BUSCA = "\x1f"
+
+
+def normalizar_texto(texto):
+    """Converte um texto para a forma usada na busca: sem acentos e em minúsculas."""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _como_texto(serie):
+    """Valores de uma coluna (inclusive categórica) como texto, com vazio no lugar dos ausentes."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    return serie.fillna("").astype(str)
+
+
+def _normalizar_serie(serie):
+    """
+    Aplica normalizar_texto a uma Series de textos (uma vez por valor distinto), para que a coluna
+    indexada e a consulta sejam dobradas pela mesma função.
+    """
+    normalizados = {valor: normalizar_texto(valor) for valor in pd.unique(serie)}
+    return serie.map(normalizados)
+
+
+class IndiceBusca:
+    """
+    Índice de busca textual: uma única coluna com os campos de COLUNAS_BUSCA de cada linha
+    concatenados, sem acentos e em minúsculas. Cada termo da consulta vira uma única
+    operação vetorizada de "contém" sobre essa coluna.
+    """
+
+    def __init__(self, df, colunas=None):
+        self._df = weakref.ref(df)
+        self.colunas = [coluna for coluna in (colunas or COLUNAS_BUSCA) if coluna in df.columns]
+        partes = [_como_texto(df[coluna]).reset_index(drop=True) for coluna in self.colunas]
+        if partes:
+            texto = partes[0].str.cat(partes[1:], sep=SEPARADOR_BUSCA)
+        else:
+            texto = pd.Series([""] * len(df), dtype=str)
+        self.texto = _normalizar_serie(texto)
+
+    @property
+    def df(self):
+        return self._df()
+
+    def mascara(self, consulta):
+        """
+        Retorna um array booleano (uma posição por linha) das linhas que contêm todos os termos da
+        consulta, ignorando acentos e maiúsculas. Consulta vazia seleciona todas as linhas.
+        """
+        mascara = np.ones(len(self.texto), dtype=bool)
+        candidatos = self.texto
+        for termo in normalizar_texto(consulta).split():
+            # Cada termo só é procurado nas linhas que sobraram dos termos anteriores
+            contem = candidatos.str.contains(termo, regex=False).to_numpy(dtype=bool)
+            mascara[candidatos.index.to_numpy()[~contem]] = False
+            candidatos = candidatos[contem]
+        return mascara
+
+    @medido("computacao")
+    def filtrar(self, consulta):
+        """Retorna as linhas do DataFrame que atendem à consulta."""
+        df = self.df
+        if not str(consulta).strip():
+            return df
+        registrar_varredura(len(df))
+        return df[self.mascara(consulta)]
+
+
+@medido("carga")
+def obter_indice_busca(df):
+    """Retorna o IndiceBusca do DataFrame, construindo-o apenas na primeira chamada."""
+    derivados = _derivados(df)
+    indice = derivados.get("busca")
+    if indice is None:
+        indice = derivados["busca"] = IndiceBusca(df)
+    return indice
+
+
+def _trigramas(texto):
+    """Conjunto de trigramas de um texto já normalizado (com bordas marcadas por espaços)."""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNomes:
+    """
+    Índice para resolver nomes completos em IDs, ignorando acentos e maiúsculas:
+    - exato: nome normalizado -> linhas;
+    - prefixo: cada termo da consulta é início de alguma palavra do nome (busca binária nas palavras ordenadas);
+    - aproximado: similaridade de trigramas (Dice), tolerante a erros de digitação.
+    """
+
+    # Similaridade mínima para um candidato encontrado apenas por trigramas
+    SIMILARIDADE_MINIMA = 0.3
+
+    def __init__(self, df):
+        if "Nome Completo" in df.columns:
+            nomes = _como_texto(df["Nome Completo"])
+        else:
+            nomes = _como_texto(df.get("Nome", pd.Series("", index=df.index))).str.cat(
+                _como_texto(df.get("Sobrenome", pd.Series("", index=df.index))), sep=" "
+            )
+        self.ids = df.index.to_numpy()
+        self.nomes = [nome.strip() for nome in nomes.tolist()]
+        self.normalizados = [" ".join(nome.split()) for nome in _normalizar_serie(nomes.reset_index(drop=True)).tolist()]
+
+        exatos = {}
+        palavras = {}
+        trigramas = {}
+        for linha, nome in enumerate(self.normalizados):
+            if not nome:
+                continue
+            exatos.setdefault(nome, []).append(linha)
+            for palavra in set(nome.split()):
+                palavras.setdefault(palavra, []).append(linha)
+            for trigrama in _trigramas(nome):
+                trigramas.setdefault(trigrama, []).append(linha)
+
+        self._exatos = {nome: np.array(linhas, dtype=np.int64) for nome, linhas in exatos.items()}
+        self._palavras = sorted(palavras)
+        self._linhas_palavra = [np.array(palavras[palavra], dtype=np.int64) for palavra in self._palavras]
+        self._trigramas = {trigrama: np.array(linhas, dtype=np.int64) for trigrama, linhas in trigramas.items()}
+        self._total_trigramas = np.array(
+            [len(_trigramas(nome)) if nome else 0 for nome in self.normalizados], dtype=np.int64
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def linhas_por_prefixo(self, termo):
+        """Linhas cujo nome tem alguma palavra começando pelo termo (já normalizado)."""
+        inicio = bisect_left(self._palavras, termo)
+        fim = bisect_left(self._palavras, termo + "\uffff", inicio)
+        if inicio == fim:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(self._linhas_palavra[inicio:fim]))
+
+    def pontuacoes(self, consulta):
+        """
+        Pontuação de cada linha para a consulta: similaridade de trigramas (0 a 1),
+        +1 se todos os termos forem prefixos de palavras do nome e +1 se o nome for idêntico.
+        """
+        pontuacao = np.zeros(len(self.ids), dtype=np.float64)
+        consulta = " ".join(normalizar_texto(consulta).split())
+        if not consulta:
+            return pontuacao
+
+        trigramas_consulta = _trigramas(consulta)
+        postagens = [self._trigramas[t] for t in trigramas_consulta if t in self._trigramas]
+        if postagens:
+            compartilhados = np.bincount(np.concatenate(postagens), minlength=len(self.ids))
+            pontuacao = 2.0 * compartilhados / (len(trigramas_consulta) + np.maximum(self._total_trigramas, 1))
+            pontuacao[pontuacao < self.SIMILARIDADE_MINIMA] = 0.0
+
+        linhas = None
+        for termo in consulta.split():
+            encontradas = self.linhas_por_prefixo(termo)
+            linhas = encontradas if linhas is None else np.intersect1d(linhas, encontradas, assume_unique=True)
+            if not len(linhas):
+                break
+        if linhas is not None and len(linhas):
+            pontuacao[linhas] += 1.0
+
+        exatas = self._exatos.get(consulta)
+        if exatas is not None:
+            pontuacao[exatas] += 1.0
+        return pontuacao
+
+    @medido("computacao")
+    def candidatos(self, consulta, limite=10):
+        """
+        Retorna até `limite` candidatos [(ID, nome completo, pontuação)], do mais ao menos provável
+        (empates em ordem alfabética).
+        """
+        pontuacao = self.pontuacoes(consulta)
+        positivas = np.flatnonzero(pontuacao > 0)
+        if len(positivas) > limite:
+            positivas = positivas[np.argpartition(-pontuacao[positivas], limite - 1)[:limite]]
+        ordem = sorted(positivas.tolist(), key=lambda linha: (-pontuacao[linha], self.normalizados[linha]))
+        return [(self.ids[linha].item(), self.nomes[linha], round(float(pontuacao[linha]), 3)) for linha in ordem]
+
+
+@medido("carga")
+def obter_indice_nomes(df):
+    """Retorna o IndiceNomes do DataFrame, construindo-o apenas na primeira chamada."""
+    derivados = _derivados(df)
+    indice = derivados.get("nomes")
+    if indice is None:
+        indice = derivados["nomes"] = IndiceNomes(df)
+    return indice
+
+
+# Identificadores do FamilySearch (4 caracteres, hífen, 3 ou 4 caracteres; ex.: G5H3-8TB) dentro de um texto colado,
+# em maiúsculas ou minúsculas (gs39-hcw vira GS39-HCW).
+# Em "Schmidt-Weber, nascida em 2020-05; Jean-Pierre G5QF-Q1C (1890-12)", só G5QF-Q1C é extraído.
+# Há Identificadores só com algarismos (ex.: 2794-839), então intervalos como 1890-1950 também
+# são extraídos e aparecem entre os não encontrados.
+PADRAO_IDENTIFICADOR = re.compile(r"\b[0-9A-Z]{4}-[0-9A-Z]{3,4}\b", re.IGNORECASE)
+
+# Palavras de um texto colado (letras, algarismos e hífens). As que misturam letras e algarismos
+# e não são Identificadores (ex.: G5H3-8T ou G5H38TB, cortados ou sem hífen) são listadas como não reconhecidas.
+PADRAO_PALAVRA = re.compile(r"[0-9A-Za-z]+(?:-[0-9A-Za-z]+)*")
+
+# Resultado de MapaIdentificadores.resolver_lista
+ResolucaoIdentificadores = namedtuple("ResolucaoIdentificadores", ["encontrados", "nao_encontrados", "nao_reconhecidos"])
+
+
+def normalizar_identificador(identificador):
+    """Forma canônica de um Identificador: sem espaços nas bordas e em maiúsculas."""
+    return str(identificador).strip().upper()
+
+
+def extrair_identificadores(texto):
+    """
+    Extrai os Identificadores de um texto colado, na forma canônica. Retorna (identificadores,
+    nao_reconhecidos): os Identificadores na ordem do texto e as palavras que parecem um Identificador
+    (letras e algarismos) sem ter o formato dele.
+    """
+    identificadores = [normalizar_identificador(i) for i in PADRAO_IDENTIFICADOR.findall(texto)]
+    nao_reconhecidos = []
+    for palavra in PADRAO_PALAVRA.findall(texto):
+        if PADRAO_IDENTIFICADOR.search(palavra):
+            continue
+        if any(c.isdigit() for c in palavra) and any(c.isalpha() for c in palavra):
+            nao_reconhecidos.append(palavra)
+    return identificadores, list(dict.fromkeys(nao_reconhecidos))
+
+
+class MapaIdentificadores:
+    """
+    Mapa bidirecional ID <-> Identificador (FamilySearch), construído uma única vez.
+    Um mesmo Identificador pode aparecer em mais de um ID (registros duplicados na árvore).
+    """
+
+    def __init__(self, df):
+        self._por_id = {}
+        self._por_identificador = {}
+        if "Identificador" not in df.columns:
+            return
+        for pessoa_id, identificador in zip(df.index.tolist(), df["Identificador"].tolist()):
+            if pd.isna(identificador) or not str(identificador).strip():
+                continue
+            self._por_id[pessoa_id] = identificador
+            self._por_identificador.setdefault(normalizar_identificador(identificador), []).append(pessoa_id)
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def identificador(self, pessoa_id, padrao="Desconhecido"):
+        """Identificador de um ID, ou o valor padrão se o ID não existir ou não tiver Identificador."""
+        return self._por_id.get(pessoa_id, padrao)
+
+    def ids(self, identificador):
+        """Todos os IDs com o Identificador informado (lista vazia se nenhum)."""
+        return list(self._por_identificador.get(normalizar_identificador(identificador), []))
+
+    def resolver(self, identificador):
+        """Primeiro ID com o Identificador informado, ou None."""
+        ids = self._por_identificador.get(normalizar_identificador(identificador))
+        return ids[0] if ids else None
+
+    @medido("computacao")
+    def resolver_lista(self, identificadores):
+        """
+        Resolve vários Identificadores de uma vez. Aceita uma lista ou um texto colado (por exemplo,
+        uma exportação de matches de DNA), do qual os Identificadores são extraídos.
+        Retorna uma ResolucaoIdentificadores (encontrados, nao_encontrados, nao_reconhecidos): um
+        dicionário {Identificador: ID}, na ordem em que aparecem e sem repetições, a lista dos
+        Identificadores sem correspondência na árvore e, para um texto colado, as palavras que
+        parecem um Identificador sem ter o formato dele (ver extrair_identificadores).
+        """
+        nao_reconhecidos = []
+        if isinstance(identificadores, str):
+            identificadores, nao_reconhecidos = extrair_identificadores(identificadores)
+        encontrados = {}
+        nao_encontrados = []
+        for identificador in dict.fromkeys(normalizar_identificador(i) for i in identificadores):
+            pessoa_id = self.resolver(identificador)
+            if pessoa_id is None:
+                nao_encontrados.append(identificador)
+            else:
+                encontrados[identificador] = pessoa_id
+        return ResolucaoIdentificadores(encontrados, nao_encontrados, nao_reconhecidos)
+
+
+@medido("carga")
+def obter_mapa_identificadores(df):
+    """Retorna o MapaIdentificadores do DataFrame, construindo-o apenas na primeira chamada."""
+    derivados = _derivados(df)
+    mapa = derivados.get("identificadores")
+    if mapa is None:
+        mapa = derivados["identificadores"] = MapaIdentificadores(df)
+    return mapa
+
+
+def obter_cache(df, nome, capacidade=32):
+    """
+    Retorna o CacheLRU `nome` associado ao DataFrame (ou ao DataFrame de um FamilyIndex), criado na primeira chamada.
+    As chaves devem conter os IDs das pessoas de que o valor depende: é por eles que migrar_derivados
+    decide o que aproveitar quando chega uma nova versão dos dados.
+    """
+    if isinstance(df, FamilyIndex):
+        df = df.df
+    derivados = _derivados(df)
+    cache = derivados.get(nome)
+    if cache is None:
+        cache = derivados[nome] = CacheLRU(capacidade)
+    return cache
+
+
+# Colunas lidas pelo que fica memorizado entre versões (fechos de antepassados, relatórios e PDFs
+# em cache). Mudanças só em outras colunas, como datas e locais, não invalidam nada disso.
+COLUNAS_MEMORIZADAS = ["Pai_ID", "Mãe_ID", "Nome", "Sobrenome", "Nome Completo", "Identificador"]
+
+
+def _ids_da_chave(chave):
+    """IDs de pessoas (inteiros) contidos na chave de um cache, inclusive em tuplas aninhadas."""
+    if isinstance(chave, tuple):
+        for parte in chave:
+            yield from _ids_da_chave(parte)
+    elif isinstance(chave, (int, np.integer)) and not isinstance(chave, bool):
+        yield int(chave)
+
+
+def migrar_derivados(df_anterior, df_novo, reparentados, alterados=()):
+    """
+    Atualização incremental: leva para o DataFrame novo o que já foi calculado para o anterior
+    e continua válido. `reparentados` são os IDs cujo vínculo de pai/mãe mudou (incluídos e
+    removidos também contam) e `alterados`, os IDs com outros dados alterados.
+
+    Os fechos de antepassados só são descartados para os reparentados e seus descendentes (nas
+    duas versões da árvore). As entradas dos caches de obter_cache saem quando a chave contém o
+    ID de alguém afetado, ou de um descendente dele; as demais são copiadas. Os índices baratos
+    (busca, nomes, Identificadores) são reconstruídos normalmente a partir do DataFrame novo.
+    Retorna {estrutura: (mantidos, descartados)}.
+    """
+    anteriores = _derivados(df_anterior)
+    caches = {nome: cache for nome, cache in anteriores.items() if isinstance(cache, CacheLRU)}
+    indice_anterior = anteriores.get("familia")
+    if indice_anterior is None and not caches:
+        return {}
+
+    indice_anterior = obter_familia_index(df_anterior)
+    indice_novo = obter_familia_index(df_novo)
+    reparentados = set(reparentados)
+    alterados = set(alterados) | reparentados
+
+    # Quem descende de alguém afetado, pela árvore antiga ou pela nova
+    fechos_invalidos = reparentados | indice_anterior.descendentes(reparentados) | indice_novo.descendentes(reparentados)
+    afetados = fechos_invalidos | indice_anterior.descendentes(alterados) | indice_novo.descendentes(alterados) | alterados
+
+    resultado = {}
+    mantidos = indice_anterior._fechamentos.transferir(
+        indice_novo._fechamentos, lambda pessoa_id: pessoa_id not in fechos_invalidos
+    )
+    resultado["fechamentos"] = (mantidos, len(indice_anterior._fechamentos) - mantidos)
+
+    for nome, cache in caches.items():
+        copiados = cache.transferir(
+            obter_cache(df_novo, nome, cache.capacidade),
+            lambda chave: afetados.isdisjoint(_ids_da_chave(chave)),
+        )
+        resultado[nome] = (copiados, len(cache) - copiados)
+    return resultado
@@ -0,0 +1,80 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Camada única de instrumentação das funções de dados.py, indices.py e helpers.py. Cada função medida
+# recebe o decorador @medido na definição, então nenhuma função é substituída em tempo de execução.
+# O perfil (perfil.py) e o rastreamento (rastreamento.py) são observadores da execução atual, cada um
+# no seu canal; sem observadores, a função medida só repassa a chamada.
+
+# Etapas do rastreamento a que o tempo de uma função medida pode pertencer
+ETAPAS_MEDIDAS = ("carga", "computacao", "pdf")
+
+# Observadores da execução atual: tupla de pares (canal, observador)
+_observadores = ContextVar("observadores_instrumentacao", default=())
+
+
+def medido(etapa):
+    """
+    Decorador das funções medidas. `etapa` ("carga", "computacao" ou "pdf") é a etapa do rastreamento
+    a que pertence o tempo próprio da função. Cada observador recebe _entrar(nome, etapa) antes da
+    chamada e _sair(nome, etapa) depois dela.
+    """
+    if etapa not in ETAPAS_MEDIDAS:
+        raise ValueError(f"Etapa desconhecida: {etapa!r}")
+
+    def decorador(funcao):
+        nome = funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            observadores = _observadores.get()
+            if not observadores:
+                return funcao(*args, **kwargs)
+            for _, observador in observadores:
+                observador._entrar(nome, etapa)
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                for _, observador in reversed(observadores):
+                    observador._sair(nome, etapa)
+
+        medida.etapa = etapa
+        return medida
+
+    return decorador
+
+
+def registrar_varredura(linhas):
+    """
+    Avisa os observadores de uma varredura do DataFrame (seleção de linhas por máscara booleana ou
+    iterrows) de `linhas` linhas. Chamado pelas funções que fazem a varredura, no ponto em que ela ocorre.
+    """
+    for _, observador in _observadores.get():
+        observador._varredura(linhas)
+
+
+def observador(canal):
+    """Observador do canal na execução atual, ou None."""
+    for nome, atual in _observadores.get():
+        if nome == canal:
+            return atual
+    return None
+
+
+def definir_observador(canal, novo):
+    """Define o observador do canal na execução atual (None remove o anterior)."""
+    outros = tuple(par for par in _observadores.get() if par[0] != canal)
+    _observadores.set(outros + ((canal, novo),) if novo is not None else outros)
+
+
+@contextmanager
+def observando(canal, novo):
+    """Usa `novo` como observador do canal dentro do bloco e restaura o anterior ao sair."""
+    token = _observadores.set(
+        tuple(par for par in _observadores.get() if par[0] != canal) + ((canal, novo),)
+    )
+    try:
+        yield novo
+    finally:
+        _observadores.reset(token)
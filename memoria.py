@@ -0,0 +1,228 @@
+import os
+import sys
+import threading
+import types
+import weakref
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from indices import CacheLRU, FamilyIndex, iterar_derivados
+
+# Contabilidade da memória residente: o DataFrame de cada versão carregada, os índices derivados dele,
+# os caches (com entradas e taxa de acertos) e o session_state de cada sessão (só o tamanho, nunca o conteúdo).
+
+# Grupos do relatório, na ordem em que são contados
+GRUPOS = ["dados", "indice", "cache", "sessao"]
+
+# Orçamento de memória (MB) dos dados, índices e caches, lido desta variável de ambiente (sem ela, não há orçamento)
+VARIAVEL_ORCAMENTO = "FBC_ORCAMENTO_MEMORIA_MB"
+
+# Objetos do processo que não pertencem aos dados e não são percorridos
+_TIPOS_IGNORADOS = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    weakref.ReferenceType,
+    type(threading.Lock()),
+    type(threading.RLock()),
+)
+
+# Valores sem referências a outros objetos, contados direto ao percorrer um contêiner
+_TIPOS_ESCALARES = (str, bytes, int, float, complex, bool)
+
+ItemMemoria = namedtuple("ItemMemoria", ["grupo", "origem", "item", "bytes", "entradas", "capacidade", "taxa_acertos"])
+
+
+def tamanho_profundo(objeto, vistos=None, excluir=()):
+    """
+    Bytes ocupados pelo objeto e por tudo o que ele referencia: dicionários, listas, atributos, arrays do
+    numpy e DataFrames/Series (com o conteúdo dos textos). Um objeto em `vistos` não é contado de novo, então
+    chamadas que compartilham `vistos` contam cada objeto uma única vez; os ids em `excluir` não são
+    percorridos. Referências fracas, módulos, classes, funções e locks ficam de fora.
+    """
+    vistos = set() if vistos is None else vistos
+    total = 0
+    pendentes = [objeto]
+    while pendentes:
+        atual = pendentes.pop()
+        if id(atual) in vistos or id(atual) in excluir or isinstance(atual, _TIPOS_IGNORADOS):
+            continue
+        vistos.add(id(atual))
+
+        if isinstance(atual, pd.DataFrame):
+            total += int(atual.memory_usage(deep=True).sum())
+        elif isinstance(atual, (pd.Series, pd.Index)):
+            total += int(atual.memory_usage(deep=True))
+        elif isinstance(atual, np.ndarray):
+            total += sys.getsizeof(atual)  # Inclui os dados quando o array é dono deles
+            if atual.base is not None:
+                pendentes.append(atual.base)
+            if atual.dtype == object:
+                total += _percorrer(atual.ravel().tolist(), pendentes, vistos)
+        else:
+            total += sys.getsizeof(atual)
+            if isinstance(atual, dict):
+                total += _percorrer(atual.keys(), pendentes, vistos)
+                total += _percorrer(atual.values(), pendentes, vistos)
+            elif isinstance(atual, (list, tuple, set, frozenset, deque)):
+                total += _percorrer(atual, pendentes, vistos)
+            elif not isinstance(atual, _TIPOS_ESCALARES):
+                if hasattr(atual, "__dict__"):
+                    pendentes.append(atual.__dict__)
+                for nome in getattr(type(atual), "__slots__", ()):
+                    if hasattr(atual, nome):
+                        pendentes.append(getattr(atual, nome))
+    return total
+
+
+def _percorrer(valores, pendentes, vistos):
+    """
+    Conta os escalares de um contêiner ainda não vistos e põe os demais valores na fila; retorna os bytes
+    contados. Evita empilhar um a um os milhões de textos e inteiros das listas e dicionários dos índices.
+    """
+    total = 0
+    for valor in valores:
+        if type(valor) in _TIPOS_ESCALARES:
+            if id(valor) not in vistos:
+                vistos.add(id(valor))
+                total += sys.getsizeof(valor)
+        else:
+            pendentes.append(valor)
+    return total
+
+
+def _origem(df):
+    """Rótulo de um DataFrame: a versão da planilha (início do SHA-256) ou o número de pessoas."""
+    from dados import versao_de
+
+    versao = versao_de(df)
+    if versao:
+        return f"planilha {versao[:12]}"
+    return f"DataFrame {len(df)} pessoas ({id(df):x})"
+
+
+def conjuntos_de_dados():
+    """DataFrames ainda vivos que têm estruturas derivadas, cada um com o dicionário dessas estruturas."""
+    return list(iterar_derivados())
+
+
+def estados_sessoes():
+    """
+    session_state de cada sessão mantida pelo servidor, por um rótulo anônimo ("sessão 1", "sessão 2", ...,
+    e "sessão atual" para a que fez a chamada): o id das sessões não sai daqui, e quem chama deve expor
+    só o tamanho dos estados. Usa o gerenciador de sessões do runtime do Streamlit; fora do servidor (ou se
+    essa API mudar), retorna só a sessão atual, se houver.
+    """
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        contexto = get_script_run_ctx()
+        sessao_atual = contexto.session_id if contexto is not None else None
+        estados = {}
+        for numero, info in enumerate(Runtime.instance()._session_mgr.list_sessions(), start=1):
+            rotulo = "sessão atual" if info.session.id == sessao_atual else f"sessão {numero}"
+            estados[rotulo] = dict(info.session.session_state.filtered_state)
+        return estados
+    except Exception:
+        pass
+    try:
+        return {"sessão atual": st.session_state.to_dict()}
+    except Exception:  # Fora de uma execução do Streamlit
+        return {}
+
+
+def _itens_conjunto(df, derivados, vistos):
+    origem = _origem(df)
+    itens = [ItemMemoria("dados", origem, "familia_df", tamanho_profundo(df, vistos), len(df), None, None)]
+
+    # Caches: os de obter_cache e os memos guardados dentro do FamilyIndex
+    caches = []
+    for nome, valor in derivados.items():
+        if isinstance(valor, CacheLRU):
+            caches.append((nome, valor, valor.estatisticas()))
+        elif isinstance(valor, FamilyIndex):
+            caches.append((f"{nome}.fechamentos", valor._fechamentos, valor._fechamentos.estatisticas()))
+            caches.append((f"{nome}.matrizes", valor._matrizes, valor._matrizes.estatisticas()))
+
+    excluir = {id(cache) for _, cache, _ in caches}
+    for nome, valor in derivados.items():
+        if not isinstance(valor, CacheLRU):
+            entradas = len(valor) if hasattr(valor, "__len__") else None
+            itens.append(ItemMemoria("indice", origem, nome, tamanho_profundo(valor, vistos, excluir), entradas, None, None))
+    for nome, cache, estatisticas in caches:
+        itens.append(ItemMemoria(
+            "cache", origem, nome, tamanho_profundo(cache, vistos),
+            estatisticas["entradas"], estatisticas.get("capacidade"), estatisticas.get("taxa_acertos"),
+        ))
+    return itens
+
+
+def itens_memoria(df=None, sessoes=True):
+    """
+    Memória de cada DataFrame carregado (ou só de `df`), de cada índice e cache derivado dele e, com
+    sessoes=True, do session_state de cada sessão. Cada objeto é contado uma vez, no primeiro item que o
+    referencia: a sessão que só guarda a referência ao DataFrame compartilhado quase não pesa.
+    Retorna uma lista de ItemMemoria.
+    """
+    vistos = set()
+    itens = []
+    for df_conjunto, derivados in conjuntos_de_dados():
+        if df is None or df_conjunto is df:
+            itens += _itens_conjunto(df_conjunto, derivados, vistos)
+    if df is not None and not itens:  # DataFrame ainda sem estruturas derivadas
+        itens.append(ItemMemoria("dados", _origem(df), "familia_df", tamanho_profundo(df, vistos), len(df), None, None))
+    if sessoes:
+        for sessao, estado in estados_sessoes().items():
+            itens.append(ItemMemoria("sessao", sessao, "session_state", tamanho_profundo(estado, vistos), len(estado), None, None))
+    return itens
+
+
+def tabela_memoria(itens):
+    """Os itens de itens_memoria como DataFrame, em MB, do maior para o menor."""
+    tabela = pd.DataFrame(itens, columns=ItemMemoria._fields)
+    tabela["mb"] = tabela["bytes"] / 2**20
+    return tabela.sort_values("bytes", ascending=False, ignore_index=True)
+
+
+def uso_memoria(df=None, sessoes=True):
+    """
+    Bytes por grupo (dados, indice, cache, sessao) e o total, para o benchmark e para checar o orçamento
+    de memória. Os argumentos são os de itens_memoria.
+    """
+    uso = dict.fromkeys(GRUPOS, 0)
+    for item in itens_memoria(df, sessoes):
+        uso[item.grupo] += item.bytes
+    uso["total"] = sum(uso.values())
+    return uso
+
+
+def memoria_processo():
+    """Memória residente (RSS) atual do processo em bytes, ou None se o sistema não informar (só Linux)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for linha in status:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def orcamento_mb():
+    """
+    Orçamento de memória (MB) definido em FBC_ORCAMENTO_MEMORIA_MB, ou None sem a variável.
+    Levanta ValueError se o valor não for um número.
+    """
+    valor = os.environ.get(VARIAVEL_ORCAMENTO)
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        raise ValueError(f"{VARIAVEL_ORCAMENTO}={valor!r} não é um número de MB") from None
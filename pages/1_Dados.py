@@ -1,4 +1,10 @@
 import streamlit as st
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Dados")
+
+from indices import obter_indice_busca
 
 # CSS para ajustar o layout
 st.markdown("""
@@ -48,8 +54,9 @@ if familia_df is not None:
         
     # Filtro de busca por texto
     texto_procurado = st.text_input(
-        "Buscar por Nome, Sobrenome, Identificador ou Nome Completo:",
-        placeholder="Exemplo: José, Altenhofen, G5H3-8TB"
+        "Buscar por Nome, Sobrenome, Identificador, Nome Completo, Local ou Data:",
+        placeholder="Exemplo: José, Altenhofen, G5H3-8TB",
+        key="texto_procurado",
     )
         
     # Selecionar colunas para exibição
@@ -58,15 +65,11 @@ if familia_df is not None:
         "Selecione as colunas que deseja exibir:",
         options=colunas_disponiveis,
         default=colunas_disponiveis[:4],
+        key="colunas_selecionadas",
     )
 
-    # Aplicar os filtros
-    resultados = familia_df.copy()
-    if texto_procurado:
-        resultados = resultados[resultados.apply(
-            lambda row: row.astype(str).str.contains(texto_procurado, case=False, na=False).any(),
-            axis=1
-        )]
+    # Aplicar os filtros: busca sem acentos e sem diferenciar maiúsculas, todos os termos devem aparecer
+    resultados = obter_indice_busca(familia_df).filtrar(texto_procurado)
 
     # Exibir os dados filtrados
     if not resultados.empty:
@@ -76,3 +79,6 @@ if familia_df is not None:
         st.warning("Nenhum registro encontrado com os filtros aplicados.")
 else:
     st.error("Os dados não foram carregados corretamente. Verifique a página inicial.")
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -1,7 +1,19 @@
 import pandas as pd
 import streamlit as st
+from perfil import iniciar_perfil, painel_perfil
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento, registrar_acao
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Família Extensa")
+
+# Perfil de desempenho desta execução (opcional: FBC_PERFIL=1, ou ?perfil=1 com FBC_PERFIL=url)
+coleta_perfil = iniciar_perfil("Família Extensa")
+
 from helpers import (
-    imprimir_familia_extensa,
+    familia_extensa,
+    obter_familia_index,
+    campo_busca_pessoa,
+    obter_id_por_metodo,
 )
 
 # CSS para ajustar o layout e melhorar visualização
@@ -71,97 +83,50 @@ else:
 
     with col2:
         # Entrada para busca
-        termo_busca = st.text_input(
+        termo_busca = campo_busca_pessoa(
+            familia_df,
+            metodo_busca,
             f"Digite o {metodo_busca} para visualizar a árvore genealógica:",
+            key="termo_busca",
             placeholder=f"Exemplo: {180 if metodo_busca == 'ID' else 'G5H3-8TB' if metodo_busca == 'Identificador' else 'José Altenhofen'}",
         )
 
     if st.button("Exibir Família Extensa", key="btn_exibir_familia"):
+        registrar_acao("exibir_familia", termo_busca=termo_busca)
         try:
             # Verificar e identificar a entrada
-            if metodo_busca == "ID":
-                id_selecionado = int(termo_busca)
-            elif metodo_busca == "Identificador":
-                filtro = familia_df["Identificador"] == termo_busca
-                if filtro.any():
-                    id_selecionado = familia_df[filtro].index[0]
-                else:
-                    st.warning("Nenhuma correspondência encontrada para o Identificador informado.")
-                    st.stop()
-            else:  # Nome Completo
-                filtro = familia_df["Nome Completo"].str.contains(termo_busca, case=False, na=False)
-                if filtro.any():
-                    id_selecionado = familia_df[filtro].index[0]
-                else:
-                    st.warning("Nenhuma correspondência encontrada para o Nome Completo informado.")
-                    st.stop()
+            id_selecionado = obter_id_por_metodo(metodo_busca, termo_busca, familia_df, st)
 
             # Obter o nome e o identificador associados ao ID selecionado
             nome_selecionado = familia_df.at[id_selecionado, "Nome Completo"]
             identificador_selecionado = familia_df.at[id_selecionado, "Identificador"]
 
-            # Capturar o resultado da função
-            from io import StringIO
-            import sys
-
-            # Redirecionar saída do terminal para capturar `print`
-            buffer = StringIO()
-            sys.stdout = buffer
-
-            # Chamar a função
-            imprimir_familia_extensa(familia_df, id_selecionado)
+            # Obter a família extensa como estrutura (categoria -> lista de parentes)
+            familia = familia_extensa(obter_familia_index(familia_df), id_selecionado)
 
-            # Restaurar saída padrão e capturar o texto
-            sys.stdout = sys.__stdout__
-            resultado = buffer.getvalue()
-            buffer.close()
-
-           
-            # Adicionar o Identificador no resultado das seções
-            if resultado.strip():
+            if any(familia.values()):
                 # Exibir o título com nome, ID e identificador
                 st.markdown(
                     f"##### 🌟 Família Extensa: **{nome_selecionado} (ID: {id_selecionado} | Identificador: {identificador_selecionado})**"
                 )
-                for section in resultado.strip().split("\n\n"):  # Dividir por seções
-                    linhas = section.strip().split("\n")
-                    titulo = linhas[0]
-                    conteudo = linhas[1:]
-
+                for categoria, parentes in familia.items():
                     # Usar expander para a seção
-                    with st.expander(f"📂 {titulo}", expanded=False):
-                        if conteudo:
-                            for linha in conteudo:
-                                linha_formatada = linha.strip()
-                                
-                                if linha_formatada.startswith("ID:"):
-                                    # Dividir a linha corretamente
-                                    try:
-                                        partes = linha_formatada.split(", Nome:")
-                                        id_part = partes[0].replace("ID:", "").strip()  # ID extraído
-                                        nome_part = partes[1].split(", Identificador:")[0].strip()  # Nome extraído
-                                        identificador_part = partes[1].split(", Identificador:")[1].strip()  # Identificador extraído
-                                    except IndexError:
-                                        nome_part = "Desconhecido"
-                                        id_part = "Desconhecido"
-                                        identificador_part = "Desconhecido"
-
-                                    # Formatar com estilo
-                                    st.markdown(
-                                        f"""
-                                        <div style="background: #1C2833; padding: 12px; border-radius: 8px; margin-bottom: 10px;">
-                                            <p style="font-size: 14px; color: #EAECEE; margin: 0;">
-                                                <strong style="color: #3498DB;">🆔 ID:</strong> {id_part}<br>
-                                                <strong style="color: #3498DB;">👤 Nome:</strong> {nome_part}<br>
-                                                <strong style="color: #3498DB;">🏷️ Identificador:</strong> {identificador_part}
-                                            </p>
-                                        </div>
-                                        """,
-                                        unsafe_allow_html=True,
-                                    )
-                                else:
-                                    # Formatar linhas genéricas
-                                    st.markdown(f"<p style='color: #95A5A6; margin: 0;'>{linha_formatada}</p>", unsafe_allow_html=True)
+                    with st.expander(f"📂 {categoria} de {nome_selecionado}", expanded=False):
+                        if parentes:
+                            for parente in parentes:
+                                # Formatar com estilo
+                                st.markdown(
+                                    f"""
+                                    <div style="background: #1C2833; padding: 12px; border-radius: 8px; margin-bottom: 10px;">
+                                        <p style="font-size: 14px; color: #EAECEE; margin: 0;">
+                                            <strong style="color: #3498DB;">🆔 ID:</strong> {parente.id}<br>
+                                            <strong style="color: #3498DB;">👤 Nome:</strong> {parente.nome}<br>
+                                            <strong style="color: #3498DB;">🏷️ Identificador:</strong> {parente.identificador}
+                                        </p>
+                                    </div>
+                                    """,
+                                    unsafe_allow_html=True,
+                                )
                         else:
                             st.markdown("<p style='color: #E74C3C;'>Nenhum parente encontrado.</p>", unsafe_allow_html=True)
             else:
@@ -170,3 +135,9 @@ else:
 
         except Exception as e:
             st.error(f"Erro ao gerar a árvore genealógica: {e}")
+
+# Resumo do perfil desta execução na barra lateral (só com o perfil habilitado)
+painel_perfil(coleta_perfil)
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
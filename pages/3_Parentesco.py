@@ -1,11 +1,22 @@
 import pandas as pd
 import streamlit as st
+from perfil import iniciar_perfil, painel_perfil
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento, registrar_acao
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Parentesco")
+
+# Perfil de desempenho desta execução (opcional: FBC_PERFIL=1, ou ?perfil=1 com FBC_PERFIL=url)
+coleta_perfil = iniciar_perfil("Parentesco")
+
 from helpers import (
     buscar_nome_sobrenome_por_id,
-    encontrar_parentesco_direto,
-    buscar_id_no_dicionario,
+    resolver_parentesco,
     geracao_para_termo,
     coletar_todos_antepassados,
+    obter_familia_index,
+    campo_busca_pessoa,
+    obter_id_por_metodo,
 )
 
 # CSS para ajustar o layout
@@ -63,56 +74,27 @@ st.divider()
 # Recuperar DataFrame
 familia_df = st.session_state.get("familia_df")
 
-# Função para obter o ID a partir do método de busca
-def obter_id_por_metodo(metodo_busca, termo_busca, familia_df):
-    try:
-        if metodo_busca == "ID":
-            return int(termo_busca)
-        elif metodo_busca == "Identificador":
-            filtro = familia_df["Identificador"] == termo_busca
-            ids_encontrados = familia_df[filtro].index.tolist()
-            if len(ids_encontrados) == 1:
-                return ids_encontrados[0]
-            elif len(ids_encontrados) > 1:
-                st.warning(f"Mais de um resultado encontrado para o Identificador '{termo_busca}'. Selecione um ID específico.")
-                st.stop()
-            else:
-                st.warning(f"Nenhuma correspondência encontrada para o Identificador '{termo_busca}'.")
-                st.stop()
-        elif metodo_busca == "Nome Completo":
-            filtro = familia_df["Nome Completo"].str.contains(termo_busca, case=False, na=False)
-            ids_encontrados = familia_df[filtro].index.tolist()
-            if len(ids_encontrados) == 1:
-                return ids_encontrados[0]
-            elif len(ids_encontrados) > 1:
-                st.warning(f"Mais de um resultado encontrado para o Nome '{termo_busca}'. Selecione um ID específico.")
-                st.stop()
-            else:
-                st.warning(f"Nenhuma correspondência encontrada para o Nome Completo '{termo_busca}'.")
-                st.stop()
-    except Exception as e:
-        st.error(f"Erro ao buscar ID: {e}")
-        st.stop()
-
 # Verifica se o DataFrame está carregado
 if "familia_df" in st.session_state and st.session_state.familia_df is not None:
     familia_df = st.session_state.familia_df
+    familia_index = obter_familia_index(familia_df)
 
     # Inputs para os dois termos de busca
     col1, col2, col3 = st.columns(3)
     with col1:
         metodo_busca = st.selectbox("Método de busca:", ["ID", "Identificador", "Nome Completo"], key="metodo_busca")
     with col2:
-        termo_busca1 = st.text_input(f"Digite o {metodo_busca} da Pessoa 1:", key="termo_busca1")
+        termo_busca1 = campo_busca_pessoa(familia_df, metodo_busca, f"Digite o {metodo_busca} da Pessoa 1:", key="termo_busca1")
     with col3:
-        termo_busca2 = st.text_input(f"Digite o {metodo_busca} da Pessoa 2:", key="termo_busca2")
+        termo_busca2 = campo_busca_pessoa(familia_df, metodo_busca, f"Digite o {metodo_busca} da Pessoa 2:", key="termo_busca2")
 
     # Botão para executar ambas as funcionalidades
     if st.button("Executar Comparação e Análise de Antepassados"):
+        registrar_acao("comparar_parentesco", termo_busca1=termo_busca1, termo_busca2=termo_busca2)
         try:
             # Obter os IDs a partir do método e termo de busca
-            id1 = obter_id_por_metodo(metodo_busca, termo_busca1, familia_df)
-            id2 = obter_id_por_metodo(metodo_busca, termo_busca2, familia_df)
+            id1 = obter_id_por_metodo(metodo_busca, termo_busca1, familia_df, st)
+            id2 = obter_id_por_metodo(metodo_busca, termo_busca2, familia_df, st)
 
             if id1 == id2:
                 st.error("Por favor, informe IDs diferentes.")
@@ -122,11 +104,18 @@ if "familia_df" in st.session_state and st.session_state.familia_df is not None:
                 try:
                     nome_ID1 = buscar_nome_sobrenome_por_id(familia_df, id1)
                     nome_ID2 = buscar_nome_sobrenome_por_id(familia_df, id2)
-                    parentescos_id1, parentescos_id2 = encontrar_parentesco_direto(familia_df, id1, id2)
-                    parentesco_encontrado_1 = buscar_id_no_dicionario(parentescos_id1, id2)
-                    parentesco_encontrado_2 = buscar_id_no_dicionario(parentescos_id2, id1)
-                    st.success(f"{nome_ID2} é {parentesco_encontrado_1} de {nome_ID1}")
-                    st.success(f"{nome_ID1} é {parentesco_encontrado_2} de {nome_ID2}")
+                    parentesco_1 = resolver_parentesco(familia_index, id1, id2)
+                    parentesco_2 = resolver_parentesco(familia_index, id2, id1)
+                    if parentesco_1 and parentesco_2:
+                        st.success(f"{nome_ID2} é {parentesco_1['parentesco']} de {nome_ID1}")
+                        st.success(f"{nome_ID1} é {parentesco_2['parentesco']} de {nome_ID2}")
+                        caminho = " → ".join(
+                            f"{buscar_nome_sobrenome_por_id(familia_index, parente_id)} ({parente_id})"
+                            for parente_id in parentesco_1['caminho']
+                        )
+                        st.caption(f"Caminho: {caminho}")
+                    else:
+                        st.warning(f"Nenhum parentesco consanguíneo encontrado entre {nome_ID1} e {nome_ID2}.")
                 except Exception as e:
                     st.error(f"Erro na comparação de IDs: {e}")
 
@@ -134,8 +123,8 @@ if "familia_df" in st.session_state and st.session_state.familia_df is not None:
                 st.subheader("🌳 Resultado da Análise de Antepassados Comuns")
                 try:
                     # Executa a função e coleta os resultados
-                    antepassados_id1 = coletar_todos_antepassados(familia_df, id1)
-                    antepassados_id2 = coletar_todos_antepassados(familia_df, id2)
+                    antepassados_id1 = coletar_todos_antepassados(familia_index, id1)
+                    antepassados_id2 = coletar_todos_antepassados(familia_index, id2)
 
                     # Encontrando antepassados comuns
                     antepassados_comuns = {
@@ -166,3 +155,9 @@ if "familia_df" in st.session_state and st.session_state.familia_df is not None:
             st.error(f"Erro geral: {e}")
 else:
     st.error("Os dados não foram carregados corretamente.")
+
+# Resumo do perfil desta execução na barra lateral (só com o perfil habilitado)
+painel_perfil(coleta_perfil)
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -1,12 +1,23 @@
 import streamlit as st
-import io
 from io import BytesIO
+from perfil import iniciar_perfil, painel_perfil
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento, rastrear_download, registrar_acao
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Ancestrais")
+
+# Perfil de desempenho desta execução (opcional: FBC_PERFIL=1, ou ?perfil=1 com FBC_PERFIL=url)
+coleta_perfil = iniciar_perfil("Ancestrais")
+
 from helpers import (
-    exibir_antepassados_comuns_ordenados_pdf,
+    pdf_primeiros_ancestrais,
     ids_lista,
-    coletar_todos_antepassados,
+    ids_referencia,
+    criar_relatorios_para_ids,
+    modelo_primeiros_ancestrais,
     geracao_para_termo,
-    obter_id_por_metodo
+    obter_id_por_metodo,
+    campo_busca_pessoa,
 )
 
 # CSS para ajustar o layout
@@ -74,11 +85,12 @@ else:
         metodo_busca = st.selectbox("Escolha o método de busca:", ["ID", "Identificador", "Nome Completo"])
 
     with col2:
-        termo_busca = st.text_input(f"Digite o {metodo_busca} de referência:")
+        termo_busca = campo_busca_pessoa(familia_df_IDs, metodo_busca, f"Digite o {metodo_busca} de referência:", key="termo_busca")
         
 
     # Botão para gerar o relatório
     if st.button("Gerar Relatório"):
+        registrar_acao("gerar_relatorio", termo_busca=termo_busca)
         try:
             # Agora a função pode ser chamada diretamente
             id_referencia = obter_id_por_metodo(metodo_busca, termo_busca, familia_df_IDs, st)
@@ -86,41 +98,20 @@ else:
             # Filtrar a lista de IDs para não incluir o ID de referência
             ids_comparacao = [id_ for id_ in ids_lista if int(id_) != int(id_referencia)]
 
-            # Coletar todos os antepassados do ID de referência
-            antepassados_referencia = coletar_todos_antepassados(familia_df_IDs, id_referencia)
-
-            # Gerar o conteúdo do relatório
-            _, texto_relatorio = exibir_antepassados_comuns_ordenados_pdf(
-                familia_df_IDs, id_referencia, ids_comparacao, retornar_texto=True
-                
-            )
+            # Modelo do relatório (calculado uma vez e reaproveitado pela tela e pelo PDF)
+            modelo = modelo_primeiros_ancestrais(familia_df_IDs, id_referencia, ids_comparacao)
 
             # Verificar se o relatório tem conteúdo
-            if texto_relatorio.strip():
-
-                 # Obter o nome da pessoa referente ao ID
-                nome_pessoa = familia_df_IDs.loc[id_referencia, "Nome Completo"] if "Nome Completo" in familia_df_IDs.columns else "Desconhecido"
-
-                st.success(f"Relatório gerado para o ID de referência: {id_referencia} | Nome: {nome_pessoa}")
-
-                # Dividir o texto em seções para processar os ancestrais
-                ancestrais = texto_relatorio.strip().split("\n\n")
-                for ancestral in ancestrais:
-                    # Dividir em linhas
-                    linhas = ancestral.split("\n")
-                    titulo = linhas[0].strip()  # O título do ancestral comum
-
-                    # Obter o ID do ancestral comum com base nos antepassados do ID de referência
-                    ancestral_id = None
-                    for id_ancestral in antepassados_referencia:
-                        if f"ID: {id_ancestral}" in titulo:
-                            ancestral_id = id_ancestral
-                            break
-
-                    # Calcular o grau de parentesco com o ID de referência
-                    grau_parentesco_referencia = antepassados_referencia.get(ancestral_id, None)
-                    if grau_parentesco_referencia is not None:
-                        grau_parentesco_termo = geracao_para_termo(grau_parentesco_referencia)
+            if modelo.grupos:
+
+                st.success(f"Relatório gerado para o ID de referência: {id_referencia} | Nome: {modelo.nome_referencia}")
+
+                for grupo in modelo.grupos:
+                    titulo = f"Ancestral Comum: {grupo.nome} ( ID: {grupo.id} | Identificador: {grupo.identificador} )"
+
+                    # Grau de parentesco com o ID de referência
+                    if grupo.grau_referencia is not None:
+                        grau_parentesco_termo = geracao_para_termo(grupo.grau_referencia)
                         titulo += f" (Parentesco com Referência: {grau_parentesco_termo})"
 
                     st.markdown(
@@ -132,50 +123,78 @@ else:
                         unsafe_allow_html=True,
                     )
 
-                    # Criar uma lista de dados para exibir como tabela
-                    dados_tabela = []
-                    for linha in linhas[1:]:
-                        partes = linha.split(", ")
-                        if len(partes) == 3:  # Verificar se a linha está no formato esperado
-                            dados_tabela.append(partes)
-
-                    # Verificar se há dados para exibir
-                    if dados_tabela:
-                        # Exibir a tabela com os dados
-                        st.table(
-                            {
-                                "ID": [row[0] for row in dados_tabela],
-                                "Nome": [row[1] for row in dados_tabela],
-                                "Grau": [row[2] for row in dados_tabela],
-                            }
-                        )
-                    # else:
-                        # st.warning("Nenhum dado encontrado para este ancestral comum.")
-                        # st.divider()  # Adicionar um divisor entre ancestrais
-
-
-                # Adicionar botão para download do PDF                
-                buffer = io.BytesIO()
-                exibir_antepassados_comuns_ordenados_pdf(
-                    familia_df_IDs, id_referencia, ids_comparacao, retornar_texto=False, output_buffer=buffer
-                )
-                buffer.seek(0)
-
-                # Obter o nome da pessoa referente ao ID
-                nome_pessoa = familia_df_IDs.loc[id_referencia, "Nome Completo"] if "Nome Completo" in familia_df_IDs.columns else "Desconhecido"
+                    # Exibir a tabela com os descendentes
+                    st.table(
+                        {
+                            "ID": [str(desc.id) for desc in grupo.descendentes],
+                            "Nome": [desc.nome for desc in grupo.descendentes],
+                            "Grau": [geracao_para_termo(desc.grau) for desc in grupo.descendentes],
+                        }
+                    )
 
+                # O PDF só é gerado quando o download é solicitado (e reaproveitado nos pedidos seguintes)
                 # Garantir que o nome está seguro para uso no nome do arquivo
-                nome_pessoa_seguro = nome_pessoa.replace(" ", "_").replace("/", "_").replace("\\", "_")
+                nome_pessoa_seguro = str(modelo.nome_referencia).replace(" ", "_").replace("/", "_").replace("\\", "_")
 
                 # Botão de download
                 st.download_button(
                     label="📄 Baixar Relatório em PDF",
-                    data=buffer,
+                    data=rastrear_download(
+                        "download_pdf",
+                        lambda: pdf_primeiros_ancestrais(familia_df_IDs, id_referencia, ids_comparacao),
+                        ids_lista=ids_comparacao,
+                    ),
                     file_name=f"Relatorio Primeiros Ancestrais - ID: {id_referencia} Nome: {nome_pessoa_seguro}.pdf",
-                    mime="application/pdf"
-                    
+                    mime="application/pdf",
+                    on_click="ignore",
                 )
             else:
                 st.warning(f"Nenhum ancestral comum encontrado para o ID de referência {id_referencia}.")
         except Exception as e:
             st.error(f"Erro ao gerar o relatório: {e}")
+
+    # Relatórios de todas as referências em um único ZIP, montado em memória quando o usuário pede
+    st.divider()
+    st.markdown("#### 📦 Relatórios de todas as referências")
+    st.caption(
+        f"Gera um PDF para cada uma das {len(ids_referencia)} referências e os reúne em um arquivo ZIP. "
+        "Os PDFs são gerados um por vez; o ZIP pronto fica em memória (uma única cópia) enquanto o botão de download estiver na tela."
+    )
+
+    if st.button("📦 Gerar ZIP"):
+        registrar_acao("gerar_zip", ids_referencia=ids_referencia, ids_lista=ids_lista)
+        try:
+            # Um PDF por vez é gerado e anexado ao ZIP; nada é gravado em disco no servidor
+            barra = st.progress(0.0, text="Gerando os relatórios...")
+            arquivo_zip = BytesIO()
+            criar_relatorios_para_ids(
+                familia_df_IDs,
+                ids_referencia,
+                ids_lista,
+                destino=arquivo_zip,
+                max_workers=1,
+                progresso=lambda feito, total: barra.progress(feito / total, text=f"Gerando os relatórios... {feito}/{total}"),
+            )
+            barra.empty()
+
+            # Entrega os bytes do ZIP ao botão sem duplicá-los: getvalue() devolve o próprio buffer do
+            # BytesIO, que é descartado em seguida, e o botão guarda só essa cópia
+            conteudo_zip = arquivo_zip.getvalue()
+            del arquivo_zip
+
+            # O download não reexecuta a página, então o botão continua disponível após o clique
+            st.download_button(
+                label="📦 Baixar Relatórios (ZIP)",
+                data=conteudo_zip,
+                file_name="Relatorios_Ancestrais.zip",
+                mime="application/zip",
+                on_click="ignore",
+            )
+        except Exception as e:
+            st.error(f"Erro ao gerar os relatórios: {e}")
+
+# Resumo do perfil desta execução na barra lateral (só com o perfil habilitado)
+painel_perfil(coleta_perfil)
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -1,9 +1,21 @@
 import streamlit as st
+from perfil import iniciar_perfil, painel_perfil
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento, rastrear_download, registrar_acao
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Lista de Ancestrais")
+
+# Perfil de desempenho desta execução (opcional: FBC_PERFIL=1, ou ?perfil=1 com FBC_PERFIL=url)
+coleta_perfil = iniciar_perfil("Lista de Ancestrais")
+
 from helpers import (
-    exibir_ancestrais_comuns_por_ocorrencia,
+    pdf_ancestrais_por_ocorrencia,
     gerar_relatorio_visualizacao,
+    modelo_ancestrais_por_ocorrencia,
+    texto_relatorio_por_ocorrencia,
     ids_lista,
-    obter_id_por_metodo  # Função para processar os métodos de busca
+    obter_id_por_metodo,  # Função para processar os métodos de busca
+    campo_busca_pessoa,
 )
 
 # CSS para ajustar o layout
@@ -58,7 +70,7 @@ else:
     with col1:
         metodo_busca = st.selectbox("Escolha o método de busca:", ["ID", "Identificador", "Nome Completo"])
     with col2:
-        termo_busca = st.text_input(f"Digite o {metodo_busca} de referência:")
+        termo_busca = campo_busca_pessoa(familia_df_IDs, metodo_busca, f"Digite o {metodo_busca} de referência:", key="termo_busca")
 
     # Escolha entre "Relatório por ID" ou "Todos os IDs"
     col3, col4 = st.columns(2)
@@ -67,39 +79,54 @@ else:
 
     # Geração do relatório
     if tipo_relatorio == "Relatório por ID" and st.button("Gerar Relatório"):
+        registrar_acao("gerar_relatorio", termo_busca=termo_busca, ids_lista=ids_lista)
         try:
             # Obter o ID de referência com base no método de busca
             id_referencia = obter_id_por_metodo(metodo_busca, termo_busca, familia_df_IDs, st)
 
             # Gerar o conteúdo visual do relatório
             st.success(f"Relatório gerado para o ID de referência: {id_referencia}")
-            relatorio_visual = gerar_relatorio_visualizacao(familia_df_IDs, ids_lista, id_referencia)
-            st.markdown(relatorio_visual, unsafe_allow_html=True)
+            gerar_relatorio_visualizacao(familia_df_IDs, ids_lista, id_referencia)
 
-            # Gerar o PDF
-            buffer = exibir_ancestrais_comuns_por_ocorrencia(familia_df_IDs, ids_lista, id_referencia)
+            # O PDF só é gerado quando o download é solicitado (a partir do mesmo modelo, já em cache)
             st.download_button(
                 label="📄 Baixar Relatório em PDF",
-                data=buffer,
+                data=rastrear_download(
+                    "download_pdf",
+                    lambda: pdf_ancestrais_por_ocorrencia(familia_df_IDs, ids_lista, id_referencia),
+                    ids_lista=ids_lista,
+                ),
                 file_name=f"Relatorio_Ancestrais_ID_{id_referencia}.pdf",
-                mime="application/pdf"
+                mime="application/pdf",
+                on_click="ignore",
             )
         except Exception as e:
             st.error(f"Erro ao gerar o relatório: {e}")
 
     elif tipo_relatorio == "Todos os IDs" and st.button("Gerar Relatório para Todos os IDs"):
+        registrar_acao("gerar_relatorio_todos", ids_lista=ids_lista)
         try:
-            # Gerar relatório para todos os IDs
-            buffer = exibir_ancestrais_comuns_por_ocorrencia(familia_df_IDs, ids_lista)
-            texto_relatorio = gerar_relatorio_visualizacao(familia_df_IDs, ids_lista)
+            # Pré-visualização agora; o PDF, a partir do mesmo modelo, só quando o download for solicitado
+            texto_relatorio = texto_relatorio_por_ocorrencia(modelo_ancestrais_por_ocorrencia(familia_df_IDs, ids_lista))
 
             st.text_area("Pré-visualização do Relatório", texto_relatorio, height=400)
 
             st.download_button(
                 label="📄 Baixar Relatório em PDF",
-                data=buffer,
+                data=rastrear_download(
+                    "download_pdf_todos",
+                    lambda: pdf_ancestrais_por_ocorrencia(familia_df_IDs, ids_lista),
+                    ids_lista=ids_lista,
+                ),
                 file_name="Relatorio_Ancestrais_Todos_IDs.pdf",
-                mime="application/pdf"
+                mime="application/pdf",
+                on_click="ignore",
             )
         except Exception as e:
             st.error(f"Erro ao gerar o relatório: {e}")
+
+# Resumo do perfil desta execução na barra lateral (só com o perfil habilitado)
+painel_perfil(coleta_perfil)
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -1,18 +1,23 @@
 import pandas as pd
-import re
 import streamlit as st
-from io import BytesIO
-from PyPDF2 import PdfReader
-from helpers import exibir_ancestrais_comuns_por_ocorrencia, buscar_nome_sobrenome_por_id, ids_lista, obter_id_por_metodo
-
-# Função para extrair IDs a partir do buffer PDF usando PyPDF2
-def extrair_ids_dos_descendentes(buffer):
-    """Extrai IDs dos descendentes do buffer PDF."""
-    buffer.seek(0)
-    pdf = PdfReader(buffer)
-    texto = "".join([page.extract_text() for page in pdf.pages if page.extract_text()])
-    ids_encontrados = set(re.findall(r"ID:\s*(\d+)", texto))
-    return set(map(int, ids_encontrados))
+from perfil import iniciar_perfil, painel_perfil
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento, rastrear_download, registrar_acao
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Ramo IDs")
+
+# Perfil de desempenho desta execução (opcional: FBC_PERFIL=1, ou ?perfil=1 com FBC_PERFIL=url)
+coleta_perfil = iniciar_perfil("Ramo IDs")
+
+from helpers import (
+    pdf_ancestrais_por_ocorrencia,
+    separar_ids_por_relacao_via_ancestrais,
+    buscar_nome_sobrenome_por_id,
+    id_valido,
+    ids_lista,
+    obter_id_por_metodo,
+    campo_busca_pessoa,
+)
 
 # Função para buscar nomes por lista de IDs
 def buscar_nomes_para_lista(df, ids):
@@ -22,29 +27,6 @@ def buscar_nomes_para_lista(df, ids):
     resultado = [{"ID": id_, "Nome Completo": buscar_nome_sobrenome_por_id(df, id_)} for id_ in ids]
     return pd.DataFrame(resultado)
 
-# Função para processar todos os IDs da lista de matches
-def processar_lista_de_matches(df, ids_lista, ids_ancestrais_ref1, ids_ancestrais_ref2):
-    """Processa todos os IDs da lista de matches e os categoriza em 4 grupos."""
-    ids_ambos = set()
-    ids_somente_id1 = set()
-    ids_somente_id2 = set()
-    ids_nenhum = set()
-
-    for id_match in ids_lista:
-        buffer_match = exibir_ancestrais_comuns_por_ocorrencia(df, ids_lista, id_match)
-        ids_ancestrais_match = extrair_ids_dos_descendentes(buffer_match)
-
-        if ids_ancestrais_match & ids_ancestrais_ref1 and ids_ancestrais_match & ids_ancestrais_ref2:
-            ids_ambos.add(id_match)
-        elif ids_ancestrais_match & ids_ancestrais_ref1:
-            ids_somente_id1.add(id_match)
-        elif ids_ancestrais_match & ids_ancestrais_ref2:
-            ids_somente_id2.add(id_match)
-        else:
-            ids_nenhum.add(id_match)
-
-    return ids_ambos, ids_somente_id1, ids_somente_id2, ids_nenhum
-
 # CSS para ajustar o layout e melhorar visualização
 st.markdown(
     """
@@ -101,12 +83,13 @@ else:
     with col1:
         metodo_busca = st.selectbox("Método de busca:", ["ID", "Identificador", "Nome Completo"], key="metodo_busca")
     with col2:
-        termo_busca1 = st.text_input(f"Digite o {metodo_busca} da Pessoa 1:", key="termo_busca1")
+        termo_busca1 = campo_busca_pessoa(familia_df, metodo_busca, f"Digite o {metodo_busca} da Pessoa 1:", key="termo_busca1")
     with col3:
-        termo_busca2 = st.text_input(f"Digite o {metodo_busca} da Pessoa 2:", key="termo_busca2")
+        termo_busca2 = campo_busca_pessoa(familia_df, metodo_busca, f"Digite o {metodo_busca} da Pessoa 2:", key="termo_busca2")
 
     # Botão para processar
     if st.button("Processar IDs da Lista de Matches"):
+        registrar_acao("processar_matches", termo_busca1=termo_busca1, termo_busca2=termo_busca2, ids_lista=ids_lista)
         try:
             # Obter IDs de referência
             id1 = obter_id_por_metodo(metodo_busca, termo_busca1, familia_df, st)
@@ -115,21 +98,18 @@ else:
             if id1 == id2:
                 st.error("Por favor, informe IDs diferentes.")
                 st.stop()
+            for id_pessoa in (id1, id2):
+                if not id_valido(familia_df, id_pessoa):
+                    st.error(f"O ID {id_pessoa} não foi encontrado na árvore.")
+                    st.stop()
 
             # Obter nomes associados aos IDs
             nome_id1 = buscar_nome_sobrenome_por_id(familia_df, id1)
             nome_id2 = buscar_nome_sobrenome_por_id(familia_df, id2)
 
-            # Buscar ancestrais dos IDs de referência
-            buffer_id1 = exibir_ancestrais_comuns_por_ocorrencia(familia_df, ids_lista, id1)
-            buffer_id2 = exibir_ancestrais_comuns_por_ocorrencia(familia_df, ids_lista, id2)
-
-            ids_ancestrais_ref1 = extrair_ids_dos_descendentes(buffer_id1)
-            ids_ancestrais_ref2 = extrair_ids_dos_descendentes(buffer_id2)
-
-            # Processar IDs da lista de matches
-            ids_ambos, ids_somente_id1, ids_somente_id2, ids_nenhum = processar_lista_de_matches(
-                familia_df, ids_lista, ids_ancestrais_ref1, ids_ancestrais_ref2
+            # Classificar os IDs da lista de matches pelos ancestrais comuns com cada referência
+            ids_ambos, ids_somente_id1, ids_somente_id2, ids_nenhum = separar_ids_por_relacao_via_ancestrais(
+                familia_df, ids_lista, id1, id2
             )
 
             # Criar tabelas
@@ -157,5 +137,38 @@ else:
                 st.dataframe(tabela_nenhum.set_index("ID"))
                 st.markdown(f"**Quantidade:** {len(tabela_nenhum)}")
 
+            # Exportação opcional: os PDFs só são gerados quando o download é solicitado
+            col_pdf1, col_pdf2 = st.columns(2)
+            with col_pdf1:
+                st.download_button(
+                    label=f"📄 Ancestrais comuns de {nome_id1} (PDF)",
+                    data=rastrear_download(
+                        "download_pdf_pessoa1",
+                        lambda: pdf_ancestrais_por_ocorrencia(familia_df, ids_lista, id1),
+                        ids_lista=ids_lista,
+                    ),
+                    file_name=f"Relatorio_Ancestrais_ID_{id1}.pdf",
+                    mime="application/pdf",
+                    on_click="ignore",
+                )
+            with col_pdf2:
+                st.download_button(
+                    label=f"📄 Ancestrais comuns de {nome_id2} (PDF)",
+                    data=rastrear_download(
+                        "download_pdf_pessoa2",
+                        lambda: pdf_ancestrais_por_ocorrencia(familia_df, ids_lista, id2),
+                        ids_lista=ids_lista,
+                    ),
+                    file_name=f"Relatorio_Ancestrais_ID_{id2}.pdf",
+                    mime="application/pdf",
+                    on_click="ignore",
+                )
+
         except Exception as e:
             st.error(f"Erro ao processar os IDs: {e}")
+
+# Resumo do perfil desta execução na barra lateral (só com o perfil habilitado)
+painel_perfil(coleta_perfil)
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
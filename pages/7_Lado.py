@@ -1,6 +1,11 @@
 import pandas as pd
 import re
 import streamlit as st
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Lado")
+
 import networkx as nx
 
 from helpers import (
@@ -156,3 +161,6 @@ st.info("ℹ️ Página em construção. Fique atento às próximas atualizaçõ
 
 #         except Exception as e:
 #             st.error(f"Erro ao classificar os ramos: {e}")
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
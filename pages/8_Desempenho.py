@@ -0,0 +1,100 @@
+import pandas as pd
+import streamlit as st
+from rastreamento import ETAPAS, finalizar_rastreamento, iniciar_rastreamento, ler_rastros, resumo_latencias
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Desempenho")
+
+# Registros mais recentes exibidos no fim da página
+MAX_REGISTROS_RECENTES = 50
+
+# Períodos de análise (None = todo o log)
+PERIODOS = {"Últimas 24 horas": pd.Timedelta(days=1), "Últimos 7 dias": pd.Timedelta(days=7), "Todo o log": None}
+
+# CSS para ajustar o layout
+st.markdown("""
+    <style>
+        .block-container {
+            padding-top: 1.3rem;
+            padding-bottom: 1rem;
+        }
+        .centered-title {
+            text-align: center;
+            font-size: 28px;
+            font-weight: bold;
+            margin-bottom: 5px;
+            color: #DAEAB5;
+        }
+        .centered-description {
+            text-align: center;
+            font-size: 16px;
+            margin-bottom: 5px;
+            color: #D9D3CC;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+# Título e descrição centralizados
+st.markdown('<h1 class="centered-title">⏱️ Desempenho das Páginas</h1>', unsafe_allow_html=True)
+st.markdown(
+    '<p class="centered-description">Latência de cada ação das páginas (p50/p95), dividida entre carga dos dados, '
+    'computação, PDF e renderização, a partir do log de rastreamento.</p>',
+    unsafe_allow_html=True,
+)
+st.divider()
+
+rastros = ler_rastros()
+
+if rastros.empty:
+    st.info("Nenhuma execução registrada ainda. Use as páginas do app e volte aqui.")
+else:
+    # Filtros
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        periodo = st.selectbox("Período:", list(PERIODOS), index=1)
+    with col2:
+        paginas = st.multiselect("Páginas:", sorted(rastros["pagina"].dropna().unique()))
+    with col3:
+        incluir_interrompidas = st.checkbox("Incluir execuções interrompidas", value=False)
+
+    filtrados = rastros
+    if PERIODOS[periodo] is not None:
+        filtrados = filtrados[filtrados["instante"] >= pd.Timestamp.now(tz="UTC") - PERIODOS[periodo]]
+    if paginas:
+        filtrados = filtrados[filtrados["pagina"].isin(paginas)]
+    if not incluir_interrompidas:
+        filtrados = filtrados[filtrados["status"] == "ok"]
+
+    if filtrados.empty:
+        st.warning("Nenhuma execução encontrada com os filtros aplicados.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Execuções", len(filtrados))
+        col2.metric("Sessões", filtrados["sessao"].nunique())
+        col3.metric("p95 geral (ms)", f"{filtrados['duracao_ms'].quantile(0.95):.0f}")
+
+        # Latência por ação
+        st.markdown("#### Latência por ação")
+        st.dataframe(resumo_latencias(filtrados), hide_index=True, width="stretch")
+
+        # p95 por versão dos dados, para comparar antes e depois de cada atualização da planilha
+        versoes = filtrados.dropna(subset=["dados"])
+        if versoes["dados"].nunique() > 1:
+            st.markdown("#### p95 (ms) por versão dos dados")
+            st.caption("Versões da planilha (início do SHA-256) da mais antiga para a mais recente.")
+            ordem = versoes.groupby("dados")["instante"].min().sort_values().index
+            por_versao = resumo_latencias(versoes, por=("pagina", "acao", "dados"))
+            tabela = por_versao.pivot_table(index=["pagina", "acao"], columns="dados", values="p95 (ms)")
+            st.dataframe(tabela[[versao for versao in ordem if versao in tabela.columns]], width="stretch")
+
+        # Registros mais recentes
+        st.markdown("#### Execuções mais recentes")
+        colunas = ["instante", "pagina", "acao", "status", "pessoas", "duracao_ms"] + [f"{etapa}_ms" for etapa in ETAPAS]
+        st.dataframe(
+            filtrados.sort_values("instante", ascending=False).head(MAX_REGISTROS_RECENTES)[colunas],
+            hide_index=True,
+            width="stretch",
+        )
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -0,0 +1,86 @@
+import streamlit as st
+from rastreamento import finalizar_rastreamento, iniciar_rastreamento
+
+# Registro desta execução no log de rastreamento (logs/rastreamento.jsonl)
+rastro = iniciar_rastreamento("Memória")
+
+from memoria import GRUPOS, itens_memoria, memoria_processo, orcamento_mb, tabela_memoria
+
+# Nomes exibidos para os grupos do relatório
+ROTULOS_GRUPOS = {"dados": "Dados", "indice": "Índices", "cache": "Caches", "sessao": "Sessões"}
+
+# CSS para ajustar o layout
+st.markdown("""
+    <style>
+        .block-container {
+            padding-top: 1.3rem;
+            padding-bottom: 1rem;
+        }
+        .centered-title {
+            text-align: center;
+            font-size: 28px;
+            font-weight: bold;
+            margin-bottom: 5px;
+            color: #DAEAB5;
+        }
+        .centered-description {
+            text-align: center;
+            font-size: 16px;
+            margin-bottom: 5px;
+            color: #D9D3CC;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+# Título e descrição centralizados
+st.markdown('<h1 class="centered-title">🧠 Diagnóstico de Memória</h1>', unsafe_allow_html=True)
+st.markdown(
+    '<p class="centered-description">Memória ocupada pelos dados carregados, pelos índices e caches derivados deles '
+    'e pelo estado de cada sessão (só o tamanho). Objetos compartilhados contam uma única vez.</p>',
+    unsafe_allow_html=True,
+)
+st.divider()
+
+st.button("🔄 Atualizar")
+
+with st.spinner("Medindo a memória..."):
+    itens = itens_memoria()
+tabela = tabela_memoria(itens)
+por_grupo = tabela.groupby("grupo")["mb"].sum()
+total_mb = float(tabela["mb"].sum())
+
+# Totais por grupo
+colunas = st.columns(len(GRUPOS) + 2)
+for coluna, grupo in zip(colunas, GRUPOS):
+    coluna.metric(ROTULOS_GRUPOS[grupo], f"{por_grupo.get(grupo, 0.0):.1f} MB")
+colunas[-2].metric("Total contabilizado", f"{total_mb:.1f} MB")
+rss = memoria_processo()
+colunas[-1].metric("Processo (RSS)", f"{rss / 2**20:.0f} MB" if rss is not None else "—")
+
+# Orçamento de memória (FBC_ORCAMENTO_MEMORIA_MB)
+try:
+    orcamento = orcamento_mb()
+except ValueError as erro:
+    st.warning(f"{erro}; o orçamento de memória foi ignorado.")
+    orcamento = None
+if orcamento:
+    uso_dados = total_mb - por_grupo.get("sessao", 0.0)
+    st.progress(min(uso_dados / orcamento, 1.0), text=f"Dados, índices e caches: {uso_dados:.1f} de {orcamento:.0f} MB")
+    if uso_dados > orcamento:
+        st.error(f"O orçamento de memória de {orcamento:.0f} MB foi ultrapassado.")
+
+if tabela.empty:
+    st.info("Nenhum dado carregado ainda. Abra a página inicial para carregar a árvore.")
+else:
+    # Detalhamento por item
+    st.markdown("#### Detalhamento")
+    exibicao = tabela.assign(
+        grupo=tabela["grupo"].map(ROTULOS_GRUPOS),
+        mb=tabela["mb"].round(2),
+        taxa_acertos=(tabela["taxa_acertos"] * 100).round(1),
+    ).drop(columns="bytes")
+    exibicao.columns = ["Grupo", "Origem", "Item", "Entradas", "Capacidade", "Acertos (%)", "MB"]
+    st.dataframe(exibicao, hide_index=True, width="stretch")
+
+# Grava o registro desta execução no log de rastreamento
+finalizar_rastreamento(rastro)
@@ -0,0 +1,171 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from instrumentacao import definir_observador, observando
+
+# Perfil de desempenho opcional das funções medidas de helpers.py, dados.py e indices.py (decoradas
+# com instrumentacao.medido). Só é ligado com a variável de ambiente FBC_PERFIL=1 ou, se ela for
+# FBC_PERFIL=url, com ?perfil=1 na URL. A coleta observa apenas a execução que a pediu: as demais
+# sessões continuam sem custo de medição.
+VARIAVEL_AMBIENTE = "FBC_PERFIL"
+PARAMETRO_URL = "perfil"
+
+# Valor de FBC_PERFIL que não mede todas as execuções, só libera o ?perfil=1 na URL
+VALOR_SO_URL = "url"
+
+# Canal do perfil na camada de instrumentação
+CANAL = "perfil"
+
+# Linhas exibidas na tabela do painel
+MAX_LINHAS_PAINEL = 15
+
+
+class ColetaPerfil:
+    """
+    Medições de uma execução: chamadas, tempo total e próprio (sem as funções medidas chamadas por ela)
+    e varreduras do DataFrame por função, além do tempo próprio por pilha de chamadas.
+    Uma varredura é uma seleção de linhas por máscara booleana ou um iterrows, registrada pela
+    função que a faz (instrumentacao.registrar_varredura).
+    """
+
+    def __init__(self, rotulo=None):
+        self.rotulo = rotulo
+        self.funcoes = {}
+        self.pilhas = defaultdict(float)
+        self.varreduras = 0
+        self.linhas_varridas = 0
+        self.inicio = time.perf_counter()
+        self.duracao = None
+        self._pilha = []
+        self._ativas = defaultdict(int)
+
+    def _entrar(self, nome, etapa):
+        self._ativas[nome] += 1
+        # [nome, início, tempo dos filhos, varreduras na entrada, varreduras dos filhos]
+        self._pilha.append([nome, time.perf_counter(), 0.0, self.varreduras, 0])
+
+    def _sair(self, nome, etapa):
+        _, inicio, tempo_filhos, varreduras_inicio, varreduras_filhos = self._pilha[-1]
+        decorrido = time.perf_counter() - inicio
+        varreduras = self.varreduras - varreduras_inicio
+
+        estatisticas = self.funcoes.setdefault(nome, [0, 0.0, 0.0, 0, 0])
+        estatisticas[0] += 1
+        estatisticas[2] += decorrido - tempo_filhos
+        estatisticas[3] += varreduras - varreduras_filhos
+        self._ativas[nome] -= 1
+        if not self._ativas[nome]:  # Em chamadas recursivas, o total conta só a mais externa
+            estatisticas[1] += decorrido
+            estatisticas[4] += varreduras
+        self.pilhas[tuple(quadro[0] for quadro in self._pilha)] += decorrido - tempo_filhos
+
+        self._pilha.pop()
+        if self._pilha:
+            self._pilha[-1][2] += decorrido
+            self._pilha[-1][4] += varreduras
+
+    def _varredura(self, linhas):
+        self.varreduras += 1
+        self.linhas_varridas += linhas
+
+    def encerrar(self):
+        """Fixa a duração da execução (chamado ao fim da coleta)."""
+        if self.duracao is None:
+            self.duracao = time.perf_counter() - self.inicio
+        return self
+
+    def tabela(self):
+        """Uma linha por função medida, da que tem mais tempo próprio para a que tem menos."""
+        linhas = [
+            {
+                "Função": nome,
+                "Chamadas": chamadas,
+                "Total (ms)": round(total * 1000, 2),
+                "Próprio (ms)": round(proprio * 1000, 2),
+                "Varreduras": varreduras_proprias,
+                "Varreduras (total)": varreduras_total,
+            }
+            for nome, (chamadas, total, proprio, varreduras_proprias, varreduras_total) in self.funcoes.items()
+        ]
+        colunas = ["Função", "Chamadas", "Total (ms)", "Próprio (ms)", "Varreduras", "Varreduras (total)"]
+        return pd.DataFrame(linhas, columns=colunas).sort_values("Próprio (ms)", ascending=False, ignore_index=True)
+
+    def pilhas_colapsadas(self):
+        """
+        Perfil no formato de pilhas colapsadas ("f1;f2;f3 microssegundos" por linha), aceito por
+        flamegraph.pl, speedscope e similares, com o tempo próprio de cada pilha.
+        """
+        raiz = self.rotulo or "execucao"
+        return "".join(
+            f"{';'.join((raiz,) + pilha)} {int(round(segundos * 1e6))}\n"
+            for pilha, segundos in sorted(self.pilhas.items())
+        )
+
+
+@contextmanager
+def coletar(rotulo=None):
+    """Mede as funções chamadas dentro do bloco e entrega a ColetaPerfil."""
+    coleta = ColetaPerfil(rotulo)
+    try:
+        with observando(CANAL, coleta):
+            yield coleta
+    finally:
+        coleta.encerrar()
+
+
+def perfil_habilitado():
+    """
+    Perfil pedido pela variável de ambiente FBC_PERFIL=1 ou, com FBC_PERFIL=url, por ?perfil=1 na URL.
+    Sem a variável, o parâmetro da URL é ignorado, para que um visitante não possa ligar o perfil.
+    """
+    modo = os.environ.get(VARIAVEL_AMBIENTE)
+    if modo == "1":
+        return True
+    if modo != VALOR_SO_URL:
+        return False
+    try:
+        return st.query_params.get(PARAMETRO_URL) == "1"
+    except Exception:  # Fora de uma execução do Streamlit
+        return False
+
+
+def iniciar_perfil(rotulo=None):
+    """
+    Começa a coleta desta execução da página, se o perfil estiver habilitado; retorna a ColetaPerfil
+    (ou None). Deve ser chamado no início da página e encerrado com painel_perfil no fim.
+    """
+    # Substitui também uma coleta interrompida (st.stop) numa execução anterior
+    coleta = ColetaPerfil(rotulo) if perfil_habilitado() else None
+    definir_observador(CANAL, coleta)
+    return coleta
+
+
+def painel_perfil(coleta):
+    """Encerra a coleta da execução e mostra o resumo na barra lateral, com o download das pilhas."""
+    if coleta is None:
+        return
+    definir_observador(CANAL, None)
+    coleta.encerrar()
+
+    with st.sidebar.expander("⏱️ Perfil de desempenho", expanded=False):
+        st.caption(
+            f"Execução: {coleta.duracao * 1000:.0f} ms | "
+            f"chamadas medidas: {sum(item[0] for item in coleta.funcoes.values())} | "
+            f"varreduras do DataFrame: {coleta.varreduras} ({coleta.linhas_varridas} linhas)"
+        )
+        if not coleta.funcoes:
+            st.write("Nenhuma função medida nesta execução.")
+            return
+        st.dataframe(coleta.tabela().head(MAX_LINHAS_PAINEL), hide_index=True, width="stretch")
+        st.download_button(
+            "Baixar perfil (pilhas colapsadas)",
+            data=coleta.pilhas_colapsadas(),
+            file_name=f"perfil_{coleta.rotulo or 'execucao'}.folded".replace(" ", "_"),
+            mime="text/plain",
+            on_click="ignore",
+        )
@@ -0,0 +1,282 @@
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+import streamlit as st
+
+from instrumentacao import definir_observador, observador, observando
+
+# Rastreamento das execuções das páginas: cada execução (clique, busca, download) vira um registro JSON
+# por linha em logs/rastreamento.jsonl, com a sessão, a página, a ação, o tamanho das entradas e o tempo
+# gasto em carga dos dados, computação, PDF e renderização. Desligado com FBC_RASTREAMENTO=0.
+VARIAVEL_AMBIENTE = "FBC_RASTREAMENTO"
+
+# Arquivo de log com rotação por tamanho (rastreamento.jsonl, rastreamento.jsonl.1, ...)
+PASTA_LOGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+ARQUIVO_LOG = "rastreamento.jsonl"
+TAMANHO_MAXIMO_LOG = 5 * 1024 * 1024
+ARQUIVOS_ANTIGOS = 5
+
+# Etapas medidas; a etapa de cada função vem do decorador instrumentacao.medido na definição dela.
+# O tempo restante da execução é a renderização (chamadas ao Streamlit e código da página)
+ETAPAS = ["carga", "computacao", "pdf", "renderizacao"]
+
+# Chaves do st.session_state usadas pelo rastreamento
+CHAVE_SESSAO = "_rastreamento_sessao"
+CHAVE_PENDENTE = "_rastreamento_pendente"
+CHAVE_WIDGETS = "_rastreamento_widgets"
+
+# Canal do rastreamento na camada de instrumentação
+CANAL = "rastreamento"
+
+
+def _tamanho(valor):
+    """Tamanho de uma entrada: comprimento do texto ou da lista, 0 se vazia e 1 para um valor simples."""
+    if valor is None:
+        return 0
+    return len(valor) if hasattr(valor, "__len__") else 1
+
+
+class RegistroExecucao:
+    """
+    Uma execução rastreada de uma página (ou a geração de um download), observadora da camada de
+    instrumentação. O tempo de cada função medida conta só para a etapa dela, descontadas as funções
+    medidas que ela chama.
+    """
+
+    def __init__(self, sessao, pagina, acao, entradas=None):
+        self.sessao = sessao
+        self.pagina = pagina
+        self.acao = acao
+        self.entradas = entradas or {}
+        self.pessoas = None
+        self.dados = None
+        self.instante = datetime.now(timezone.utc)
+        self.inicio = time.perf_counter()
+        self.ultimo = self.inicio  # Fim da última função medida (para execuções interrompidas)
+        self.etapas = dict.fromkeys(ETAPAS[:-1], 0.0)
+        self.chamadas = 0
+        self._pilha = []
+
+    def _entrar(self, nome, etapa):
+        # [etapa, início, tempo das funções medidas chamadas por esta]
+        self._pilha.append([etapa, time.perf_counter(), 0.0])
+
+    def _sair(self, nome, etapa):
+        _, inicio, tempo_filhos = self._pilha.pop()
+        self.ultimo = time.perf_counter()
+        decorrido = self.ultimo - inicio
+        self.etapas[etapa] += decorrido - tempo_filhos
+        self.chamadas += 1
+        if self._pilha:
+            self._pilha[-1][2] += decorrido
+
+    def _varredura(self, linhas):
+        pass  # Varreduras do DataFrame só interessam ao perfil
+
+    def registrar_dados(self, df):
+        """Guarda o número de pessoas e a versão dos dados usados na execução."""
+        if df is not None:
+            self.pessoas = len(df)
+            self.dados = _versao_dados(df)
+
+    def como_dict(self, status="ok", fim=None):
+        duracao = (fim if fim is not None else time.perf_counter()) - self.inicio
+        registro = {
+            "instante": self.instante.isoformat(timespec="milliseconds"),
+            "sessao": self.sessao,
+            "pagina": self.pagina,
+            "acao": self.acao,
+            "entradas": self.entradas,
+            "pessoas": self.pessoas,
+            "dados": self.dados,
+            "status": status,
+            "duracao_ms": round(duracao * 1000, 2),
+        }
+        for etapa, segundos in self.etapas.items():
+            registro[f"{etapa}_ms"] = round(segundos * 1000, 2)
+        registro["renderizacao_ms"] = round(max(duracao - sum(self.etapas.values()), 0.0) * 1000, 2)
+        registro["chamadas"] = self.chamadas
+        return registro
+
+
+def _versao_dados(df):
+    """Início do SHA-256 da planilha de onde veio o DataFrame (None se ele não veio de obter_dataset)."""
+    from dados import versao_de
+
+    versao = versao_de(df)
+    return versao[:12] if versao else None
+
+
+def _logger():
+    logger = logging.getLogger("fbc_tree.rastreamento")
+    if not logger.handlers:
+        os.makedirs(PASTA_LOGS, exist_ok=True)
+        arquivo = RotatingFileHandler(
+            os.path.join(PASTA_LOGS, ARQUIVO_LOG), maxBytes=TAMANHO_MAXIMO_LOG, backupCount=ARQUIVOS_ANTIGOS, encoding="utf-8"
+        )
+        arquivo.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(arquivo)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def gravar(registro):
+    """Acrescenta um registro (dict) ao log de rastreamento, como uma linha JSON."""
+    _logger().info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def _sessao():
+    return st.session_state.setdefault(CHAVE_SESSAO, uuid.uuid4().hex[:12])
+
+
+def _estado_widgets():
+    """Valores simples guardados no st.session_state (os widgets com key) nesta execução."""
+    estado = {}
+    for chave in list(st.session_state.keys()):
+        if not isinstance(chave, str) or chave.startswith("_"):
+            continue
+        valor = st.session_state[chave]
+        if valor is None or isinstance(valor, (str, int, float, bool)):
+            estado[chave] = valor
+        elif isinstance(valor, (list, tuple)):
+            estado[chave] = list(valor)
+    return estado
+
+
+def _inferir_acao(pagina):
+    """
+    Ação que provocou a execução, pelos widgets com key que mudaram desde o fim da execução anterior da
+    página: "abertura" na primeira execução da página na sessão e "reexecucao" quando nada mudou.
+    """
+    atual = _estado_widgets()
+    anteriores = st.session_state.setdefault(CHAVE_WIDGETS, {})
+    anterior = anteriores.get(pagina)
+    anteriores[pagina] = atual  # Substituído pelo estado do fim da execução em finalizar_rastreamento
+    if anterior is None:
+        return "abertura", {}
+    # Um botão que volta a False na execução seguinte não é uma ação
+    alterados = [chave for chave, valor in atual.items() if valor is not False and anterior.get(chave) != valor]
+    if not alterados:
+        return "reexecucao", {}
+    return alterados[0], {chave: _tamanho(atual[chave]) for chave in alterados}
+
+
+def iniciar_rastreamento(pagina):
+    """
+    Começa o registro desta execução da página e retorna o RegistroExecucao (ou None com o rastreamento
+    desligado). Deve ser chamado no início da página e encerrado com finalizar_rastreamento no fim.
+    Uma execução anterior que não chegou ao fim (st.stop ou erro) é gravada agora, com status
+    "interrompido" e a duração até a última função medida.
+    """
+    if os.environ.get(VARIAVEL_AMBIENTE) == "0":
+        return None
+
+    pendente = st.session_state.pop(CHAVE_PENDENTE, None)
+    if pendente is not None:
+        gravar(pendente.como_dict("interrompido", fim=pendente.ultimo))
+
+    acao, entradas = _inferir_acao(pagina)
+    registro = RegistroExecucao(_sessao(), pagina, acao, entradas)
+    registro.registrar_dados(st.session_state.get("familia_df"))
+    st.session_state[CHAVE_PENDENTE] = registro
+    definir_observador(CANAL, registro)
+    return registro
+
+
+def registrar_acao(acao, **entradas):
+    """Dá nome à ação da execução atual (por exemplo, o botão clicado) e registra o tamanho das entradas."""
+    registro = observador(CANAL)
+    if registro is not None:
+        registro.acao = acao
+        registro.entradas = {nome: _tamanho(valor) for nome, valor in entradas.items()}
+
+
+def rastrear_download(acao, gerar, **entradas):
+    """
+    Envolve a função que gera os bytes de um download (data=... de st.download_button) para que a geração,
+    feita só quando o usuário clica, seja gravada como uma execução à parte da mesma sessão e página.
+    """
+    origem = observador(CANAL)
+    if origem is None:
+        return gerar
+    tamanhos = {nome: _tamanho(valor) for nome, valor in entradas.items()}
+
+    def gerar_rastreado():
+        registro = RegistroExecucao(origem.sessao, origem.pagina, acao, tamanhos)
+        registro.pessoas, registro.dados = origem.pessoas, origem.dados
+        status = "erro"
+        try:
+            with observando(CANAL, registro):
+                resultado = gerar()
+            status = "ok"
+            return resultado
+        finally:
+            gravar(registro.como_dict(status))
+
+    return gerar_rastreado
+
+
+def finalizar_rastreamento(registro):
+    """Encerra e grava o registro da execução da página."""
+    if registro is None:
+        return
+    definir_observador(CANAL, None)
+    if st.session_state.get(CHAVE_PENDENTE) is registro:
+        del st.session_state[CHAVE_PENDENTE]
+    if registro.pessoas is None:  # Página inicial: os dados são carregados durante a execução
+        registro.registrar_dados(st.session_state.get("familia_df"))
+    # Widgets criados nesta execução entram com o valor inicial, para não contarem como ação na próxima
+    st.session_state.setdefault(CHAVE_WIDGETS, {})[registro.pagina] = _estado_widgets()
+    gravar(registro.como_dict())
+
+
+def ler_rastros(pasta=None):
+    """Lê o log de rastreamento (incluindo os arquivos rotacionados) como um DataFrame, do mais antigo ao mais novo."""
+    pasta = pasta or PASTA_LOGS
+    arquivos = sorted(
+        glob.glob(os.path.join(pasta, ARQUIVO_LOG + "*")),
+        key=lambda caminho: -int(caminho.rsplit(".", 1)[1]) if caminho[-1].isdigit() else 0,
+    )
+    registros = []
+    for caminho in arquivos:
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:  # Linha cortada por uma gravação interrompida
+                    continue
+    rastros = pd.DataFrame(registros)
+    if not rastros.empty:
+        rastros["instante"] = pd.to_datetime(rastros["instante"], utc=True)
+    return rastros
+
+
+def resumo_latencias(rastros, por=("pagina", "acao")):
+    """
+    Latência por ação: número de execuções, p50, p95 e máximo da duração e p50 de cada etapa (ms),
+    da ação com maior p95 para a de menor.
+    """
+    por = list(por)
+    if rastros.empty:
+        colunas = ["Execuções", "p50 (ms)", "p95 (ms)", "Máximo (ms)"] + [f"{etapa} p50 (ms)" for etapa in ETAPAS]
+        return pd.DataFrame(columns=por + colunas)
+    grupos = rastros.groupby(por, dropna=False, observed=True)
+    resumo = grupos["duracao_ms"].agg(
+        **{
+            "Execuções": "count",
+            "p50 (ms)": "median",
+            "p95 (ms)": lambda duracoes: duracoes.quantile(0.95),
+            "Máximo (ms)": "max",
+        }
+    )
+    for etapa in ETAPAS:
+        resumo[f"{etapa} p50 (ms)"] = grupos[f"{etapa}_ms"].median()
+    return resumo.round(1).sort_values("p95 (ms)", ascending=False).reset_index()